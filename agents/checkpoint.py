@@ -0,0 +1,306 @@
+import hashlib
+import json
+import zlib
+from typing import Any, Iterable
+
+import ormsgpack
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from config import settings
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+
+logger = get_logger(__name__)
+
+# A list of messages stored as the json list of the hashes of its items.
+MESSAGE_REFS_TYPE = "message-refs"
+# Prefix of the type of a payload stored zlib compressed.
+ZLIB_PREFIX = "zlib+"
+
+
+def _msgpack_skip(data: bytes, offset: int) -> int:
+    """
+    Offset right after the msgpack value starting at `offset`, found from the headers only.
+    """
+    pending = 1
+    while pending:
+        pending -= 1
+        byte = data[offset]
+        if byte <= 0x7f or byte >= 0xe0 or byte in (0xc0, 0xc2, 0xc3):
+            offset += 1
+        elif 0x80 <= byte <= 0x8f:
+            pending += 2 * (byte & 0x0f)
+            offset += 1
+        elif 0x90 <= byte <= 0x9f:
+            pending += byte & 0x0f
+            offset += 1
+        elif 0xa0 <= byte <= 0xbf:
+            offset += 1 + (byte & 0x1f)
+        elif byte in (0xc4, 0xc5, 0xc6, 0xd9, 0xda, 0xdb):
+            width = {0xc4: 1, 0xc5: 2, 0xc6: 4, 0xd9: 1, 0xda: 2, 0xdb: 4}[byte]
+            offset += 1 + width + int.from_bytes(data[offset + 1:offset + 1 + width], "big")
+        elif byte in (0xc7, 0xc8, 0xc9):
+            width = {0xc7: 1, 0xc8: 2, 0xc9: 4}[byte]
+            offset += 2 + width + int.from_bytes(data[offset + 1:offset + 1 + width], "big")
+        elif 0xca <= byte <= 0xd3:
+            offset += 1 + {0xca: 4, 0xcb: 8, 0xcc: 1, 0xcd: 2, 0xce: 4, 0xcf: 8, 0xd0: 1, 0xd1: 2, 0xd2: 4, 0xd3: 8}[byte]
+        elif 0xd4 <= byte <= 0xd8:
+            offset += 2 + (1 << (byte - 0xd4))
+        elif byte in (0xdc, 0xdd, 0xde, 0xdf):
+            width = 2 if byte in (0xdc, 0xde) else 4
+            count = int.from_bytes(data[offset + 1:offset + 1 + width], "big")
+            pending += count if byte in (0xdc, 0xdd) else 2 * count
+            offset += 1 + width
+        else:
+            raise ValueError(f"Invalid msgpack byte 0x{byte:02x} at {offset}")
+    return offset
+
+
+def msgpack_list_slice(payload: bytes, start: int = 0, end: int | None = None) -> tuple[int, bytes]:
+    """
+    (length, msgpack array of items[start:end]) of a msgpack array, the items are copied without being decoded.
+    """
+    byte = payload[0]
+    if 0x90 <= byte <= 0x9f:
+        total, offset = byte & 0x0f, 1
+    elif byte in (0xdc, 0xdd):
+        width = 2 if byte == 0xdc else 4
+        total, offset = int.from_bytes(payload[1:1 + width], "big"), 1 + width
+    else:
+        raise ValueError("Not a msgpack array")
+
+    start, end, _ = slice(start, end).indices(total)
+    for _ in range(start):
+        offset = _msgpack_skip(payload, offset)
+    first = offset
+    for _ in range(max(end - start, 0)):
+        offset = _msgpack_skip(payload, offset)
+    count = max(end - start, 0)
+    header = bytes([0x90 | count]) if count < 16 else b"\xdd" + count.to_bytes(4, "big")
+    return total, header + payload[first:offset]
+
+
+def msgpack_map_value(payload: bytes, key: str) -> bytes | None:
+    """
+    The msgpack value of `key` in a msgpack map, found without decoding the other entries. None if missing.
+    """
+    byte = payload[0]
+    if 0x80 <= byte <= 0x8f:
+        count, offset = byte & 0x0f, 1
+    elif byte in (0xde, 0xdf):
+        width = 2 if byte == 0xde else 4
+        count, offset = int.from_bytes(payload[1:1 + width], "big"), 1 + width
+    else:
+        raise ValueError("Not a msgpack map")
+
+    packed_key = ormsgpack.packb(key)
+    for _ in range(count):
+        value = _msgpack_skip(payload, offset)
+        end = _msgpack_skip(payload, value)
+        if payload[offset:value] == packed_key:
+            return payload[value:end]
+        offset = end
+    return None
+
+
+class DedupSerializer(SerializerProtocol):
+    """
+    Checkpoint serializer that stores each message once, in a content-addressed blob table.
+
+    Every step of a thread checkpoints the whole message list, so without it
+    the same (often large) tool outputs are serialized and kept again at
+    each step. Message lists are written as the hashes of their items and the
+    items go to `blobs`, compressed above `compress_min_bytes`. Everything
+    else goes through the inner serializer, compressed the same way.
+    """
+
+    def __init__(self, inner: SerializerProtocol | None = None, compress_min_bytes: int | None = None):
+        self.inner = inner or JsonPlusSerializer()
+        self.compress_min_bytes = settings.CHECKPOINT_COMPRESS_MIN_BYTES if compress_min_bytes is None else compress_min_bytes
+        self.blobs: dict[str, tuple[str, bytes]] = {}
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.inner.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        if isinstance(obj, list) and obj and all(isinstance(item, BaseMessage) for item in obj):
+            return MESSAGE_REFS_TYPE, json.dumps([self._put(item) for item in obj]).encode()
+        return self._compress(*self.inner.dumps_typed(obj))
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ == MESSAGE_REFS_TYPE:
+            return [self._get(digest) for digest in json.loads(payload)]
+        return self.inner.loads_typed(self._decompress(type_, payload))
+
+    def loads_typed_slice(self, data: tuple[str, bytes], start: int = 0, end: int | None = None) -> tuple[int, list]:
+        """
+        (length, items[start:end]) of a serialized list, only deserializing the requested items when possible.
+        """
+        type_, payload = data
+        if type_ == MESSAGE_REFS_TYPE:
+            digests = json.loads(payload)
+            return len(digests), [self._get(digest) for digest in digests[start:end]]
+        items = self.loads_typed(data)
+        return len(items), items[start:end]
+
+    def _put(self, item: Any) -> str:
+        type_, payload = self.inner.dumps_typed(item)
+        digest = hashlib.sha256(type_.encode() + b"\0" + payload).hexdigest()
+        if digest in self.blobs:
+            metrics.increment("checkpoint_blob_dedup_hits_total")
+            metrics.increment("checkpoint_blob_dedup_bytes_total", len(payload))
+        else:
+            self.blobs[digest] = self._compress(type_, payload)
+        return digest
+
+    def _get(self, digest: str) -> Any:
+        return self.inner.loads_typed(self._decompress(*self.blobs[digest]))
+
+    def _compress(self, type_: str, payload: bytes) -> tuple[str, bytes]:
+        if len(payload) < self.compress_min_bytes:
+            return type_, payload
+        compressed = zlib.compress(payload, 6)
+        if len(compressed) >= len(payload):
+            return type_, payload
+        return ZLIB_PREFIX + type_, compressed
+
+    def _decompress(self, type_: str, payload: bytes) -> tuple[str, bytes]:
+        if type_.startswith(ZLIB_PREFIX):
+            return type_.removeprefix(ZLIB_PREFIX), zlib.decompress(payload)
+        return type_, payload
+
+    def collect(self, referenced: Iterable[tuple[str, bytes]]):
+        """
+        Drop the blobs no longer referenced by any of the `referenced` serialized values.
+        """
+        live: set[str] = set()
+        for type_, payload in referenced:
+            if type_ == MESSAGE_REFS_TYPE:
+                live.update(json.loads(payload))
+        dead = [digest for digest in self.blobs if digest not in live]
+        for digest in dead:
+            del self.blobs[digest]
+        if dead:
+            logger.info(f"Dropped {len(dead)} unreferenced checkpoint blobs")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "blobs": len(self.blobs),
+            "bytes": sum(len(payload) for _, payload in self.blobs.values()),
+            "compressed": sum(1 for type_, _ in self.blobs.values() if type_.startswith(ZLIB_PREFIX)),
+        }
+
+
+class DedupInMemorySaver(InMemorySaver):
+    """
+    InMemorySaver using a DedupSerializer, whose blob table is collected when threads are deleted or checkpoints pruned.
+    """
+
+    serde: DedupSerializer
+
+    def __init__(self):
+        super().__init__(serde=DedupSerializer())
+
+    def _referenced_values(self) -> Iterable[tuple[str, bytes]]:
+        yield from self.blobs.values()
+        for writes in self.writes.values():
+            for _, _, value, _ in writes.values():
+                yield value
+
+    def collect_blobs(self):
+        self.serde.collect(self._referenced_values())
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self.collect_blobs()
+
+
+def _channel_versions(serde: SerializerProtocol, checkpoint: tuple[str, bytes]) -> dict:
+    """
+    channel_versions of a serialized checkpoint, read without deserializing the rest of it when possible.
+    """
+    type_, payload = serde._decompress(*checkpoint) if isinstance(serde, DedupSerializer) else checkpoint
+    if type_ == "msgpack":
+        value = msgpack_map_value(payload, "channel_versions")
+        if value is not None:
+            return ormsgpack.unpackb(value)
+    return serde.loads_typed(checkpoint)["channel_versions"]
+
+
+def prune_checkpoints(saver: InMemorySaver, keep: int) -> int:
+    """
+    Drop all but the newest `keep` checkpoints of every thread, with their pending writes
+    and the channel values no kept checkpoint uses. Returns the number of checkpoints dropped.
+
+    Runs synchronously, on the event loop the saver is used from, so no write interleaves.
+    """
+    channel_keys: dict[tuple[str, str], list[tuple]] = {}
+    for key in saver.blobs:
+        channel_keys.setdefault((key[0], key[1]), []).append(key)
+
+    pruned = 0
+    for thread_id, namespaces in list(saver.storage.items()):
+        for namespace, checkpoints in list(namespaces.items()):
+            if len(checkpoints) <= keep:
+                continue
+            # Checkpoint ids sort by creation time.
+            for checkpoint_id in sorted(checkpoints)[:-keep]:
+                del checkpoints[checkpoint_id]
+                saver.writes.pop((thread_id, namespace, checkpoint_id), None)
+                pruned += 1
+            live = {
+                (channel, version)
+                for checkpoint, _, _ in checkpoints.values()
+                for channel, version in _channel_versions(saver.serde, checkpoint).items()
+            }
+            for key in channel_keys.get((thread_id, namespace), []):
+                if (key[2], key[3]) not in live:
+                    del saver.blobs[key]
+
+    if pruned:
+        logger.info(f"Pruned {pruned} checkpoints, keeping the last {keep} of each thread")
+        if isinstance(saver, DedupInMemorySaver):
+            saver.collect_blobs()
+    return pruned
+
+
+def thread_sizes(saver: InMemorySaver) -> dict[str, dict[str, int]]:
+    """
+    Serialized bytes kept for each thread by an InMemorySaver: its checkpoints, pending writes and channel blobs.
+
+    With a DedupSerializer, `message_bytes` is the size of the deduplicated messages the thread
+    references. A message shared by several threads counts for each of them.
+    """
+    sizes: dict[str, dict[str, int]] = {}
+    refs: dict[str, set[str]] = {}
+
+    def add(thread_id: str, value: tuple[str, bytes]):
+        entry = sizes.setdefault(thread_id, {"checkpoints": 0, "bytes": 0, "message_bytes": 0})
+        entry["bytes"] += len(value[1])
+        if value[0] == MESSAGE_REFS_TYPE:
+            refs.setdefault(thread_id, set()).update(json.loads(value[1]))
+
+    # Copied views, the saver keeps being written to while this runs.
+    for thread_id, namespaces in list(saver.storage.items()):
+        for checkpoints in list(namespaces.values()):
+            for checkpoint, metadata, _ in list(checkpoints.values()):
+                add(thread_id, checkpoint)
+                add(thread_id, metadata)
+                sizes[thread_id]["checkpoints"] += 1
+    for (thread_id, *_), writes in list(saver.writes.items()):
+        for _, _, value, _ in list(writes.values()):
+            add(thread_id, value)
+    for (thread_id, *_), value in list(saver.blobs.items()):
+        add(thread_id, value)
+
+    blobs = getattr(saver.serde, "blobs", {})
+    for thread_id, digests in refs.items():
+        sizes[thread_id]["message_bytes"] = sum(len(blobs[digest][1]) for digest in digests if digest in blobs)
+    return sizes
@@ -0,0 +1,115 @@
+import json
+import time
+from collections import Counter
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from agents.model import RunStop
+from config import settings
+from utilities.deadline import remaining
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+from utilities.utils import convert_message_content_to_string
+
+logger = get_logger(__name__)
+
+
+class GuardTripped(Exception):
+    def __init__(self, stop: RunStop):
+        super().__init__(stop.detail)
+        self.stop = stop
+
+
+class RunGuard(AsyncCallbackHandler):
+    """
+    Run level limits of an agent run, checked from its model callbacks.
+
+    Before each model call it enforces the step budget, the token budget and
+    the time budget, which adapts to the run: the next step is only started
+    if a step of average duration still fits before the budget (or the
+    request deadline, whichever comes first). After each model call it
+    rejects a tool call the agent already made `max_repeated_tool_calls`
+    times with the same arguments. A tripped guard raises GuardTripped out
+    of the graph before any further model or tool work, so a final answer
+    is never discarded.
+    """
+
+    raise_error = True
+    run_inline = True
+
+    def __init__(
+        self,
+        max_steps: int | None = None,
+        max_tokens: int | None = None,
+        max_seconds: float | None = None,
+        max_repeated_tool_calls: int | None = None,
+    ):
+        self.max_steps = max_steps or settings.RUN_MAX_STEPS
+        self.max_tokens = max_tokens or settings.RUN_MAX_TOKENS
+        self.max_seconds = max_seconds or settings.RUN_MAX_SECONDS
+        self.max_repeated_tool_calls = settings.RUN_MAX_REPEATED_TOOL_CALLS if max_repeated_tool_calls is None else max_repeated_tool_calls
+        self.started = time.monotonic()
+        self.steps = 0
+        self.tokens = 0
+        self.tool_calls: Counter[tuple[str, str]] = Counter()
+        # Latest text the model produced, the best partial answer if the run is stopped.
+        self.last_text = ""
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def _trip(self, reason: str, detail: str):
+        stop = RunStop(
+            reason=reason,
+            detail=detail,
+            steps=self.steps,
+            tokens=self.tokens,
+            elapsed_seconds=round(self.elapsed, 3),
+        )
+        metrics.increment("agent_guard_trips_total", labels={"reason": reason})
+        logger.warning(f"Stopping agent run early: {detail}")
+        raise GuardTripped(stop)
+
+    async def on_chat_model_start(self, serialized: dict[str, Any], messages: list[list[BaseMessage]], **kwargs: Any):
+        if self.steps >= self.max_steps:
+            self._trip("step_budget", f"Reached the budget of {self.max_steps} model calls")
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            self._trip("token_budget", f"Used {self.tokens} tokens, the budget is {self.max_tokens}")
+
+        time_left = self.max_seconds - self.elapsed if self.max_seconds else None
+        deadline_left = remaining()
+        if deadline_left is not None and (time_left is None or deadline_left < time_left):
+            time_left = deadline_left
+        # A step is a model call and the tool calls it asked for.
+        average_step = self.elapsed / self.steps if self.steps else 0.0
+        if time_left is not None and time_left < average_step:
+            self._trip("time_budget", f"{time_left:.1f}s left, a step takes {average_step:.1f}s on average")
+
+        self.steps += 1
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        for generations in response.generations:
+            for generation in generations:
+                if not isinstance(generation, ChatGeneration):
+                    continue
+                message = generation.message
+                usage = getattr(message, "usage_metadata", None) or {}
+                self.tokens += usage.get("total_tokens", 0)
+                text = convert_message_content_to_string(message.content)
+                if text.strip():
+                    self.last_text = text
+                for tool_call in getattr(message, "tool_calls", []):
+                    self._count_tool_call(tool_call["name"], tool_call["args"])
+
+    def _count_tool_call(self, name: str, args: dict):
+        key = (name, json.dumps(args, sort_keys=True, default=str))
+        self.tool_calls[key] += 1
+        if self.tool_calls[key] > self.max_repeated_tool_calls:
+            self._trip(
+                "repeated_tool_call",
+                f"The agent called {name} with the same arguments {self.tool_calls[key]} times",
+            )
@@ -107,4 +107,28 @@ class ExecuteAgentInput(BaseModel):
     agent: Any
     mode: Literal["invoke", "ainvoke", "astream"]
     input: dict
-    config: Any
\ No newline at end of file
+    config: Any
+    # RunGuard of the run, see agents/guards.py.
+    guard: Any = None
+    # Extra callback handlers of the run, e.g. its flight recording.
+    callbacks: list = []
+
+class RunStop(BaseModel):
+    reason: Literal["step_budget", "token_budget", "time_budget", "repeated_tool_call"] = Field(
+        description="Guard that ended the run early."
+    )
+    detail: str = Field(
+        description="Human readable explanation."
+    )
+    steps: int = Field(
+        default=0,
+        description="Model calls made by the run."
+    )
+    tokens: int = Field(
+        default=0,
+        description="Tokens used by the run."
+    )
+    elapsed_seconds: float = Field(
+        default=0.0,
+        description="Wall clock time of the run when it was stopped."
+    )
\ No newline at end of file
@@ -1,32 +1,138 @@
-from langgraph.prebuilt import create_react_agent
-from agents.model import BuildAgent, BuildInputMessage, BuildRunnableConfig, ExecuteAgentInput
+import asyncio
+from collections import OrderedDict
+from functools import cache
+from typing import TYPE_CHECKING
+from agents.guards import GuardTripped
+from agents.model import BuildAgent, BuildInputMessage, BuildRunnableConfig, ExecuteAgentInput, RunStop
 from config import settings
 from utilities.logger import get_logger
 from utilities.model import get_model
+from utilities.singleflight import SingleFlight
 from utilities.utils import agent_name_formatter
-from langchain_core.messages import HumanMessage, AIMessage
-from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import InMemorySaver
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
 
+if TYPE_CHECKING:
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.graph.state import CompiledStateGraph
+
 logger = get_logger(__name__)
-checkpointer = InMemorySaver()
 
-async def build_agent(payload: BuildAgent) -> CompiledStateGraph:
+# Compiled agents keyed by everything that shapes the graph, least recently used first.
+_agent_cache: "OrderedDict[tuple, CompiledStateGraph]" = OrderedDict()
+# Concurrent requests missing the cache for the same key compile the agent once.
+_agent_builds = SingleFlight("agent_builds")
+
+@cache
+def get_checkpointer() -> "InMemorySaver":
+    """
+    Shared checkpointer, created on first use since langgraph.checkpoint is slow to import.
+    """
+    if settings.CHECKPOINT_DEDUP_ENABLED:
+        from agents.checkpoint import DedupInMemorySaver
+
+        return DedupInMemorySaver()
+
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    return InMemorySaver()
+
+async def prune_checkpoints_periodically():
+    """
+    Keep the last CHECKPOINT_KEEP_PER_THREAD checkpoints of each thread, every CHECKPOINT_PRUNE_INTERVAL_SECONDS.
+    """
+    while True:
+        await asyncio.sleep(settings.CHECKPOINT_PRUNE_INTERVAL_SECONDS)
+        # Nothing to prune before the first run created the checkpointer.
+        if get_checkpointer.cache_info().currsize == 0:
+            continue
+        try:
+            from agents.checkpoint import prune_checkpoints
+
+            prune_checkpoints(get_checkpointer(), settings.CHECKPOINT_KEEP_PER_THREAD)
+        except Exception as err:
+            logger.error(f"Error while pruning checkpoints: {err}")
+
+def agent_cache_stats() -> dict[str, int]:
+    return {"entries": len(_agent_cache), "max_entries": settings.AGENT_CACHE_SIZE, **_agent_builds.stats()}
+
+def latest_checkpoint_id(thread_id: str) -> str | None:
+    """
+    Id of the newest checkpoint of a thread, read without deserializing anything.
+    """
+    checkpoints = get_checkpointer().storage.get(thread_id, {}).get("")
+    return max(checkpoints) if checkpoints else None
+
+def read_thread_messages(thread_id: str, start: int = 0, end: int | None = None) -> tuple[str | None, int, list[BaseMessage]]:
+    """
+    Return (checkpoint_id, total message count, messages[start:end]) from the latest checkpoint of a thread.
+
+    Only the `messages` channel is loaded, the rest of the graph state is left serialized.
+    """
+    checkpointer = get_checkpointer()
+    checkpoint_id = latest_checkpoint_id(thread_id)
+    if checkpoint_id is None:
+        return None, 0, []
+
+    checkpoint, _, _ = checkpointer.storage[thread_id][""][checkpoint_id]
+    version = checkpointer.serde.loads_typed(checkpoint)["channel_versions"].get("messages")
+    blob = checkpointer.blobs.get((thread_id, "", "messages", version))
+    if not blob or blob[0] == "empty":
+        return checkpoint_id, 0, []
+
+    if hasattr(checkpointer.serde, "loads_typed_slice"):
+        # Only the requested page of messages is deserialized.
+        total, messages = checkpointer.serde.loads_typed_slice(blob, start, end)
+        return checkpoint_id, total, messages
+
+    if blob[0] == "msgpack":
+        from agents.checkpoint import msgpack_list_slice
+
+        # Only the requested page of messages is decoded, the others are skipped over by their headers.
+        total, page = msgpack_list_slice(blob[1], start, end)
+        return checkpoint_id, total, checkpointer.serde.loads_typed(("msgpack", page))
+
+    messages = checkpointer.serde.loads_typed(blob)
+    return checkpoint_id, len(messages), messages[start:end]
+
+def _agent_cache_key(payload: BuildAgent) -> tuple:
+    # Tool objects are long-lived (they are owned by the MCP pool), so identity is a cheap and exact key.
+    return (payload.name, payload.prompt, payload.llm_config, tuple(id(tool) for tool in payload.tools or []))
+
+async def build_agent(payload: BuildAgent) -> "CompiledStateGraph":
     try:
+        key = _agent_cache_key(payload)
+        agent = _agent_cache.get(key)
+        if agent is not None:
+            _agent_cache.move_to_end(key)
+            return agent
+
+        # The shared model and checkpointer are created here, on the loop, and
+        # only the CPU bound graph compilation runs in a worker thread.
         model = get_model(payload.llm_config)
-        agent = create_react_agent(
-            model,
-            tools=payload.tools,
-            prompt=payload.prompt,
-            name=agent_name_formatter(payload.name, "reAct"),
-            checkpointer=checkpointer
-        )
+        checkpointer = get_checkpointer()
+        agent = await _agent_builds.do(key, lambda: asyncio.to_thread(_compile_agent, payload, model, checkpointer))
+
+        _agent_cache[key] = agent
+        if len(_agent_cache) > settings.AGENT_CACHE_SIZE:
+            _agent_cache.popitem(last=False)
         
         return agent
     except Exception as e:
         logger.error(f"Error building agent: {e}")
         raise e
+
+def _compile_agent(payload: BuildAgent, model, checkpointer: "InMemorySaver") -> "CompiledStateGraph":
+    # langgraph.prebuilt pulls in the whole graph runtime, keep it off the import path.
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        model,
+        tools=payload.tools,
+        prompt=payload.prompt,
+        name=agent_name_formatter(payload.name, "reAct"),
+        checkpointer=checkpointer
+    )
     
 def build_runnable_config(payload: BuildRunnableConfig) -> RunnableConfig:
     try:
@@ -53,17 +159,70 @@ def build_input_message(payload: BuildInputMessage) -> dict:
         "messages": [HumanMessage(content=content, additional_kwargs={})]
     }
     
+def with_callbacks(config: RunnableConfig, *callbacks) -> RunnableConfig:
+    """
+    Copy of `config` with the given callback handlers (e.g. the run guard) added, None ones are skipped.
+    """
+    callbacks = [callback for callback in callbacks if callback is not None]
+    if not callbacks:
+        return config
+    return {**config, "callbacks": [*(config.get("callbacks") or []), *callbacks]}
+
+def _cancelled_tool_calls(messages: list[BaseMessage], stop: RunStop) -> list[ToolMessage]:
+    """
+    A cancelled ToolMessage for every tool call of the last model message that has no answer yet.
+    """
+    last = next((message for message in reversed(messages) if isinstance(message, AIMessage)), None)
+    if last is None or not last.tool_calls:
+        return []
+    answered = {message.tool_call_id for message in messages if isinstance(message, ToolMessage)}
+    return [
+        ToolMessage(
+            content=f"cancelled: run stopped ({stop.reason})",
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"],
+            status="error",
+        )
+        for tool_call in last.tool_calls
+        if tool_call["id"] not in answered
+    ]
+
+async def stop_run(agent: "CompiledStateGraph", config: RunnableConfig, guard, err: GuardTripped) -> tuple[AIMessage, RunStop]:
+    """
+    End a run stopped by a guard with its best partial answer.
+
+    The answer is appended to the thread, so its history stays consistent for the next turn.
+    The step budget always trips before the graph recursion limit (see Settings.check_step_budget).
+    """
+    stop = err.stop
+    partial = guard.last_text if guard and guard.last_text else ""
+    content = f"{partial}\n\n(Stopped early: {stop.detail}.)" if partial else f"I had to stop before finishing: {stop.detail}."
+    message = AIMessage(content=content, response_metadata={"stop_reason": stop.model_dump()})
+    try:
+        # The run may have stopped between a model call and its tools. Providers reject a history
+        # with unanswered tool calls, so answer them before appending the partial answer.
+        state = await agent.aget_state(config)
+        messages = _cancelled_tool_calls(state.values.get("messages", []), stop)
+        await agent.aupdate_state(config, {"messages": [*messages, message]}, as_node="agent")
+    except Exception as update_err:
+        logger.error(f"Unable to record the partial answer of a stopped run: {update_err}")
+    return message, stop
+
 async def execute_agent(payload: ExecuteAgentInput) -> list[AIMessage]:
     try:
         agent = payload.agent
         input = payload.input
-        config = payload.config
-        if payload.mode == "invoke":
-            response = agent.invoke(input=input, config=config)
-        elif payload.mode == "ainvoke":
-            response = await agent.ainvoke(input=input, config=config)
+        config = with_callbacks(payload.config, payload.guard, *payload.callbacks)
+        try:
+            if payload.mode == "invoke":
+                response = agent.invoke(input=input, config=config)
+            elif payload.mode == "ainvoke":
+                response = await agent.ainvoke(input=input, config=config)
+        except GuardTripped as err:
+            message, stop = await stop_run(agent, payload.config, payload.guard, err)
+            return {"messages": [message], "stop": stop}
             
         return response
     except Exception as e:
         logger.error(f"Error executing agent : {e}")
-        raise e
\ No newline at end of file
+        raise e
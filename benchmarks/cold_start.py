@@ -0,0 +1,136 @@
+"""
+Cold-start benchmark for the backend.
+
+Measures, in fresh interpreters:
+  * the wall time of `import main`, plus the slowest modules reported by `-X importtime`
+  * the time from spawning `uvicorn main:app` to the first successfully served request
+
+Each run appends one JSON line to the results file so the numbers can be tracked over time.
+
+    python benchmarks/cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_RESULTS = ROOT / "benchmarks" / "results" / "cold_start.jsonl"
+
+
+def measure_import(python: str) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [python, "-W", "ignore", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest_imports(python: str, top: int) -> list[dict]:
+    stderr = subprocess.run(
+        [python, "-W", "ignore", "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not cumulative_us.strip().isdigit():
+            # Header line
+            continue
+        modules.append({"module": name.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(modules, key=lambda item: item["cumulative_ms"], reverse=True)[:top]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(python: str, path: str, timeout: float) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [python, "-W", "ignore", "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.02)
+        raise TimeoutError(f"No successful response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "median_s": round(statistics.median(samples), 4),
+        "min_s": round(min(samples), 4),
+        "max_s": round(max(samples), 4),
+        "samples": [round(sample, 4) for sample in samples],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement.")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter to benchmark.")
+    parser.add_argument("--path", default="/", help="Endpoint used for the first served request.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server to answer.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to record.")
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS, help="JSON lines file to append to.")
+    parser.add_argument("--no-server", action="store_true", help="Skip the time-to-first-request measurement.")
+    args = parser.parse_args()
+
+    import_samples = [measure_import(args.python) for _ in range(args.runs)]
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "import_main": _summary(import_samples),
+        "slowest_imports": slowest_imports(args.python, args.top),
+    }
+    if not args.no_server:
+        request_samples = [measure_first_request(args.python, args.path, args.timeout) for _ in range(args.runs)]
+        record["first_request"] = {"path": args.path, **_summary(request_samples)}
+
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.results, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(json.dumps(record, indent=2))
+    print(f"Appended results to {os.path.relpath(args.results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Load test of a single backend worker, entirely local.
+
+Starts `uvicorn benchmarks.stub_app:app` (stub LLM, see stub_app.py) with an
+MCP config holding the stub MCP server (stub_mcp_server.py), then steps
+through increasing numbers of concurrent simulated users. Every user keeps
+multi-turn threads, like the Streamlit client, mixing /invoke/ and streamed
+/ainvoke/ calls, while a deployer creates and deletes MCP servers through
+/v1/tools/mcp/.
+
+For every step it reports latency p50/p95/p99, time to first token of
+streamed calls, throughput and error rate, and samples the RSS of the worker
+(and of its MCP subprocesses) over time. The concurrency knee is the last step
+that still increased throughput and met the SLO.
+
+    python benchmarks/load_test.py --users 1,2,4,8,16,32 --duration 30
+
+Each run appends one JSON line to the results file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_RESULTS = ROOT / "benchmarks" / "results" / "load_test.jsonl"
+STUB_MCP_SERVER = ROOT / "benchmarks" / "stub_mcp_server.py"
+
+QUERIES = [
+    "What is the capital of France?",
+    "Summarize the last answer in one sentence.",
+    "Give me three more details.",
+    "How does that compare to last year?",
+    "Thanks, anything else I should know?",
+]
+PROMPT = "You are a helpful assistant. Use the lookup tool when a question needs facts."
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _children(pid: int) -> list[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 4)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 4)}
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stub_server_config(python: str, tool_name: str, latency_ms: float) -> dict:
+    return {
+        "command": python,
+        "args": [str(STUB_MCP_SERVER)],
+        "env": {"STUB_MCP_LATENCY_MS": str(latency_ms), "STUB_MCP_TOOL_NAME": tool_name},
+        "transport": "stdio",
+    }
+
+
+class Recorder:
+    """
+    Outcome of every request of the current step.
+    """
+
+    def __init__(self):
+        self.samples: list[dict] = []
+
+    def add(self, kind: str, started: float, ok: bool, ttft: float | None = None, status: int | None = None):
+        self.samples.append({
+            "kind": kind,
+            "latency": time.perf_counter() - started,
+            "ttft": ttft,
+            "ok": ok,
+            "status": status,
+        })
+
+    def summary(self, elapsed: float) -> dict:
+        result = {}
+        for kind in sorted({sample["kind"] for sample in self.samples}):
+            samples = [sample for sample in self.samples if sample["kind"] == kind]
+            ok = [sample for sample in samples if sample["ok"]]
+            errors: dict[str, int] = {}
+            for sample in samples:
+                if not sample["ok"]:
+                    errors[str(sample["status"])] = errors.get(str(sample["status"]), 0) + 1
+            result[kind] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(ok) / elapsed, 3),
+                "error_rate": round(1 - len(ok) / len(samples), 4),
+                "errors": errors,
+                "latency_s": _percentiles([sample["latency"] for sample in ok]),
+            }
+            ttfts = [sample["ttft"] for sample in ok if sample["ttft"] is not None]
+            if ttfts:
+                result[kind]["ttft_s"] = _percentiles(ttfts)
+        return result
+
+
+class LoadTest:
+
+    def __init__(self, args: argparse.Namespace, base_url: str):
+        self.args = args
+        self.base_url = base_url
+        self.recorder = Recorder()
+        self.stopping = asyncio.Event()
+
+    async def invoke(self, client: httpx.AsyncClient, thread_id: str | None, query: str) -> str | None:
+        started = time.perf_counter()
+        payload = {"query": query, "prompt": PROMPT, "thread_id": thread_id, "model": self.args.model}
+        try:
+            response = await client.post("/v1/chat_service/invoke/", json=payload)
+        except httpx.HTTPError:
+            self.recorder.add("invoke", started, ok=False)
+            return thread_id
+        self.recorder.add("invoke", started, ok=response.status_code == 200, status=response.status_code)
+        if response.status_code == 200:
+            return response.json().get("thread_id") or thread_id
+        return thread_id
+
+    async def ainvoke(self, client: httpx.AsyncClient, thread_id: str | None, query: str) -> str | None:
+        started = time.perf_counter()
+        payload = {"query": query, "prompt": PROMPT, "thread_id": thread_id, "model": self.args.model, "stream": True}
+        ttft = None
+        ok = False
+        status = None
+        try:
+            async with client.stream("POST", "/v1/chat_service/ainvoke/", json=payload) as response:
+                status = response.status_code
+                thread_id = response.headers.get("X-Thread-Id", thread_id)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event["type"] == "token" and ttft is None:
+                        ttft = time.perf_counter() - started
+                    elif event["type"] == "message" and event["content"].get("type") == "ai" and event["content"].get("content") and ttft is None:
+                        # Non token streamed answers count their first message.
+                        ttft = time.perf_counter() - started
+                    elif event["type"] in ("error", "cancelled"):
+                        status = event["type"]
+                        break
+                else:
+                    status = "truncated"
+                ok = response.status_code == 200 and status == 200
+        except httpx.HTTPError as err:
+            status = type(err).__name__
+        self.recorder.add("ainvoke", started, ok=ok, ttft=ttft, status=status)
+        return thread_id
+
+    async def user(self, index: int, client: httpx.AsyncClient):
+        rng = random.Random(index)
+        while not self.stopping.is_set():
+            thread_id = None
+            for turn in range(self.args.turns):
+                if self.stopping.is_set():
+                    return
+                query = QUERIES[turn % len(QUERIES)]
+                if rng.random() < self.args.stream_ratio:
+                    thread_id = await self.ainvoke(client, thread_id, query)
+                else:
+                    thread_id = await self.invoke(client, thread_id, query)
+                await asyncio.sleep(rng.uniform(0, 2 * self.args.think_time))
+
+    async def deployer(self, client: httpx.AsyncClient):
+        count = 0
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=self.args.deploy_interval)
+                return
+            except TimeoutError:
+                pass
+            name = f"load-test-{count}"
+            count += 1
+            server = _stub_server_config(self.args.python, "lookup_deployed", self.args.tool_latency_ms)
+            for mode in ("create", "delete"):
+                started = time.perf_counter()
+                # allowedTools is pinned so deploys never change the tools of the chat users.
+                payload = {"mcpServers": {name: server}, "mode": mode, "allowedTools": ["lookup"]}
+                try:
+                    response = await client.post("/v1/tools/mcp/", json=payload)
+                    self.recorder.add("deploy", started, ok=response.status_code == 200, status=response.status_code)
+                except httpx.HTTPError as err:
+                    self.recorder.add("deploy", started, ok=False, status=type(err).__name__)
+
+    async def step(self, users: int, server_pid: int, rss: list[dict], started_at: float) -> dict:
+        self.recorder = Recorder()
+        self.stopping = asyncio.Event()
+        limits = httpx.Limits(max_connections=users + 2, max_keepalive_connections=users + 2)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.request_timeout, limits=limits) as client:
+            tasks = [asyncio.create_task(self.user(index, client)) for index in range(users)]
+            if self.args.deploy_interval > 0:
+                tasks.append(asyncio.create_task(self.deployer(client)))
+
+            step_started = time.perf_counter()
+            step_rss: list[float] = []
+            while time.perf_counter() - step_started < self.args.duration:
+                await asyncio.sleep(self.args.sample_interval)
+                worker = _rss_mb(server_pid)
+                children = sum(filter(None, (_rss_mb(child) for child in _children(server_pid))))
+                if worker is not None:
+                    step_rss.append(worker)
+                    rss.append({
+                        "t": round(time.perf_counter() - started_at, 2),
+                        "users": users,
+                        "worker_mb": round(worker, 1),
+                        "children_mb": round(children, 1),
+                    })
+            self.stopping.set()
+            # In flight requests finish, so their latency is recorded.
+            await asyncio.gather(*tasks, return_exceptions=True)
+            elapsed = time.perf_counter() - step_started
+
+        summary = self.recorder.summary(elapsed)
+        chat = [sample for sample in self.recorder.samples if sample["kind"] != "deploy"]
+        chat_ok = [sample for sample in chat if sample["ok"]]
+        return {
+            "users": users,
+            "elapsed_s": round(elapsed, 2),
+            "chat_throughput_rps": round(len(chat_ok) / elapsed, 3),
+            "chat_error_rate": round(1 - len(chat_ok) / len(chat), 4) if chat else None,
+            "chat_latency_s": _percentiles([sample["latency"] for sample in chat_ok]),
+            "rss_max_mb": round(max(step_rss), 1) if step_rss else None,
+            "by_kind": summary,
+        }
+
+
+def find_knee(steps: list[dict], slo_p95: float, slo_error_rate: float, min_gain: float) -> dict:
+    """
+    Last step meeting the SLO whose throughput still grew by at least `min_gain` over the previous one.
+    """
+    knee = None
+    previous = None
+    for step in steps:
+        within_slo = (
+            step["chat_error_rate"] is not None
+            and step["chat_error_rate"] <= slo_error_rate
+            and step["chat_latency_s"]["p95"] is not None
+            and step["chat_latency_s"]["p95"] <= slo_p95
+        )
+        step["within_slo"] = within_slo
+        if not within_slo:
+            break
+        if previous is not None and step["chat_throughput_rps"] < previous["chat_throughput_rps"] * (1 + min_gain):
+            break
+        knee = step["users"]
+        previous = step
+    return {"users": knee, "slo_p95_s": slo_p95, "slo_error_rate": slo_error_rate}
+
+
+def start_server(args: argparse.Namespace, workdir: Path, port: int) -> subprocess.Popen:
+    config_file = workdir / "mcp.json"
+    with open(config_file, "w") as f:
+        json.dump({
+            "mcpServers": {"stub": _stub_server_config(args.python, "lookup", args.tool_latency_ms)},
+            "allowedTools": ["lookup"],
+        }, f, indent=4)
+
+    unlimited = {"rps": 10_000, "burst": 10_000, "max_concurrency": 10_000}
+    env = {
+        **os.environ,
+        "MCP_CONFIG_FILE": str(config_file),
+        "TENANT_CONFIG_DIR": str(workdir / "tenants"),
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "stub"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "stub"),
+        "LOG_LEVEL": args.log_level,
+        "STUB_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "STUB_LLM_TOKEN_MS": str(args.token_ms),
+        "STUB_MCP_LATENCY_MS": str(args.tool_latency_ms),
+    }
+    if not args.keep_limits:
+        # Provider and tenant quotas would hide the capacity of the worker itself.
+        env["LLM_RATE_LIMIT_OVERRIDES"] = json.dumps({"google": unlimited, "openai": unlimited})
+        env["TENANT_QUOTA_OVERRIDES"] = json.dumps({"default": {
+            "max_concurrent_tool_calls": 10_000, "tool_calls_per_second": 10_000, "tool_call_burst": 10_000,
+        }})
+        env["TOOL_MAX_CONCURRENCY"] = "10000"
+
+    return subprocess.Popen(
+        [args.python, "-W", "ignore", "-m", "uvicorn", "benchmarks.stub_app:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=None if args.server_logs else subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float):
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=1) as client:
+        while time.perf_counter() - started < timeout:
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"{base_url} not ready within {timeout}s")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="load-test-") as workdir:
+        server = start_server(args, Path(workdir), port)
+        try:
+            await wait_ready(base_url, args.startup_timeout)
+            load_test = LoadTest(args, base_url)
+            rss: list[dict] = []
+            started_at = time.perf_counter()
+            steps = []
+            for users in args.users:
+                step = await load_test.step(users, server.pid, rss, started_at)
+                print(
+                    f"{users:>4} users: {step['chat_throughput_rps']:>7.2f} req/s, "
+                    f"p95 {step['chat_latency_s']['p95']}s, errors {step['chat_error_rate']}, "
+                    f"rss {step['rss_max_mb']} MB",
+                    file=sys.stderr,
+                )
+                steps.append(step)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "duration_s": args.duration,
+            "turns": args.turns,
+            "stream_ratio": args.stream_ratio,
+            "think_time_s": args.think_time,
+            "deploy_interval_s": args.deploy_interval,
+            "llm_latency_ms": args.llm_latency_ms,
+            "token_ms": args.token_ms,
+            "tool_latency_ms": args.tool_latency_ms,
+            "limits": "kept" if args.keep_limits else "lifted",
+        },
+        "knee": find_knee(steps, args.slo_p95, args.slo_error_rate, args.min_gain),
+        "steps": steps,
+        "rss": rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=lambda value: [int(item) for item in value.split(",")], default=[1, 2, 4, 8, 16], help="Concurrent users of each step, comma separated.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per step.")
+    parser.add_argument("--turns", type=int, default=4, help="Turns per thread before a user starts a new one.")
+    parser.add_argument("--stream-ratio", type=float, default=0.7, help="Share of turns sent to /ainvoke/.")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds between two turns of a user.")
+    parser.add_argument("--deploy-interval", type=float, default=5.0, help="Seconds between MCP deploys, 0 to disable.")
+    parser.add_argument("--model", default="gemini-2.5-flash", help="Model requested, served by the stub.")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="Stub LLM time to first token.")
+    parser.add_argument("--token-ms", type=float, default=10, help="Stub LLM time between tokens.")
+    parser.add_argument("--tool-latency-ms", type=float, default=20, help="Stub MCP tool call time.")
+    parser.add_argument("--slo-p95", type=float, default=5.0, help="p95 chat latency SLO in seconds.")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="Chat error rate SLO.")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Throughput gain a step needs to move the knee.")
+    parser.add_argument("--keep-limits", action="store_true", help="Keep the LLM and tenant rate limits of the settings.")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples.")
+    parser.add_argument("--request-timeout", type=float, default=120.0, help="Client timeout of a request.")
+    parser.add_argument("--startup-timeout", type=float, default=60.0, help="Seconds to wait for the server.")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter running the server.")
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL of the server.")
+    parser.add_argument("--server-logs", action="store_true", help="Show the server stderr.")
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS, help="JSON lines file to append to.")
+    args = parser.parse_args()
+
+    record = asyncio.run(run(args))
+
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.results, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(json.dumps({key: value for key, value in record.items() if key != "rss"}, indent=2))
+    print(f"Appended results to {os.path.relpath(args.results)}")
+
+
+if __name__ == "__main__":
+    main()
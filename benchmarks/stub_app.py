@@ -0,0 +1,99 @@
+"""
+The backend app with every provider model replaced by a local stub, for load tests.
+
+    uvicorn benchmarks.stub_app:app
+
+The stub calls the first bound tool once per user turn, then streams a short
+answer token by token. STUB_LLM_LATENCY_MS is the time to first token and
+STUB_LLM_TOKEN_MS the time between tokens. Everything else (agents, MCP pool,
+checkpointer, governors) is the real code path.
+"""
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Sequence
+from uuid import uuid4
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+import utilities.model
+
+FIRST_TOKEN_SECONDS = float(os.environ.get("STUB_LLM_LATENCY_MS", "200")) / 1000
+TOKEN_SECONDS = float(os.environ.get("STUB_LLM_TOKEN_MS", "10")) / 1000
+ANSWER_TOKENS = int(os.environ.get("STUB_LLM_ANSWER_TOKENS", "40"))
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic chat model: one tool call per user turn, then a canned answer.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    model: str = "stub"
+    tools: list[dict] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs) -> "StubChatModel":
+        return self.model_copy(update={"tools": [convert_to_openai_tool(tool) for tool in tools]})
+
+    def _next_message(self, messages: list[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and self.tools:
+            tool = self.tools[0]["function"]
+            properties = tool.get("parameters", {}).get("properties", {})
+            args = {name: str(last.content)[:40] for name in properties}
+            return AIMessage(content="", tool_calls=[{"name": tool["name"], "args": args, "id": f"call_{uuid4().hex}"}])
+
+        context = last.content if isinstance(last, ToolMessage) else ""
+        words = (f"Stub answer based on: {context} " * ANSWER_TOKENS).split()[:ANSWER_TOKENS]
+        return AIMessage(content=" ".join(words))
+
+    def _usage(self, messages: list[BaseMessage], reply: AIMessage) -> dict[str, int]:
+        input_tokens = sum(len(str(message.content).split()) for message in messages)
+        output_tokens = len(str(reply.content).split()) or 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        reply = self._next_message(messages)
+        reply.usage_metadata = self._usage(messages, reply)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        reply = self._next_message(messages)
+        await asyncio.sleep(FIRST_TOKEN_SECONDS + TOKEN_SECONDS * len(str(reply.content).split()))
+        reply.usage_metadata = self._usage(messages, reply)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        reply = self._next_message(messages)
+        await asyncio.sleep(FIRST_TOKEN_SECONDS)
+        if reply.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}
+                    for call in reply.tool_calls
+                ],
+            ))
+        else:
+            for index, word in enumerate(str(reply.content).split()):
+                if index:
+                    await asyncio.sleep(TOKEN_SECONDS)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=("" if index == 0 else " ") + word))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, reply)))
+
+
+utilities.model._load_model_class = lambda provider: StubChatModel
+
+from main import app  # noqa: E402
@@ -0,0 +1,26 @@
+"""
+Stub MCP server used by the load test, over stdio.
+
+    python benchmarks/stub_mcp_server.py
+
+STUB_MCP_LATENCY_MS sets the time every tool call takes, STUB_MCP_TOOL_NAME the name of its tool.
+"""
+import asyncio
+import os
+
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("stub-mcp")
+
+LATENCY_SECONDS = float(os.environ.get("STUB_MCP_LATENCY_MS", "20")) / 1000
+TOOL_NAME = os.environ.get("STUB_MCP_TOOL_NAME", "lookup")
+
+
+@mcp.tool(name=TOOL_NAME, description="Look up a short fact about a topic.")
+async def lookup(topic: str) -> str:
+    await asyncio.sleep(LATENCY_SECONDS)
+    return f"{topic} is a topic the stub knows {len(topic)} facts about."
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
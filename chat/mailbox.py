@@ -0,0 +1,178 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Hashable
+
+from config import settings
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+
+logger = get_logger(__name__)
+
+
+class MailboxFull(Exception):
+    pass
+
+
+class Message:
+    """
+    One request waiting for (or taking part in) a run of its thread.
+    """
+
+    def __init__(self, item: Any, fold_key: Hashable, run: Callable[[list[Any]], Awaitable[Any]]):
+        self.item = item
+        self.fold_key = fold_key
+        self.run = run
+        # The run of a batch uses the request context (tenant, deadline, priority) of its first message.
+        self.context = contextvars.copy_context()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.abandoned = False
+
+
+class Mailbox:
+    """
+    Runs the messages of one thread one turn at a time.
+
+    Messages arriving while a turn runs are queued. When the turn ends, the
+    queued messages that can share a run (same `fold_key`, in arrival order)
+    are folded into the next turn and all of their callers get its result.
+    """
+
+    def __init__(self, thread_id: str, registry: "MailboxRegistry"):
+        self.thread_id = thread_id
+        self.registry = registry
+        self.pending: list[Message] = []
+        self.batch: list[Message] = []
+        self.run_task: asyncio.Task | None = None
+        self.actor: asyncio.Task | None = None
+
+    @property
+    def busy(self) -> bool:
+        return self.actor is not None and not self.actor.done()
+
+    async def _drain(self):
+        try:
+            while self.pending:
+                first = self.pending[0]
+                size = 1
+                while (
+                    size < len(self.pending)
+                    and size < settings.THREAD_MAILBOX_MAX_BATCH
+                    and self.pending[size].fold_key == first.fold_key
+                ):
+                    size += 1
+                self.batch, self.pending = self.pending[:size], self.pending[size:]
+                if len(self.batch) > 1:
+                    metrics.increment("thread_messages_folded_total", len(self.batch) - 1)
+                    logger.info(f"Folding {len(self.batch)} messages into one turn of thread {self.thread_id}")
+
+                self.run_task = asyncio.create_task(
+                    first.run([message.item for message in self.batch]),
+                    context=first.context,
+                )
+                try:
+                    result = await asyncio.shield(self.run_task)
+                except asyncio.CancelledError:
+                    if not self.run_task.cancelled():
+                        # The actor itself is cancelled (shutdown), stop the run too.
+                        self.run_task.cancel()
+                        raise
+                    self._settle(cancelled=True)
+                except BaseException as err:
+                    self._settle(exception=err)
+                else:
+                    self._settle(result=result)
+        finally:
+            # Callers of the interrupted turn must not wait forever on its futures.
+            self._settle(cancelled=True)
+            self.run_task = None
+            for message in self.pending:
+                if not message.future.done():
+                    message.future.cancel()
+            self.registry._forget(self)
+
+    def _settle(self, result: Any = None, exception: BaseException | None = None, cancelled: bool = False):
+        for message in self.batch:
+            if message.abandoned or message.future.done():
+                continue
+            if cancelled:
+                message.future.cancel()
+            elif exception is not None:
+                message.future.set_exception(exception)
+            else:
+                message.future.set_result(result)
+        self.batch = []
+
+    def _abandon(self, message: Message):
+        message.abandoned = True
+        if message in self.pending:
+            self.pending.remove(message)
+        elif message in self.batch and all(other.abandoned for other in self.batch):
+            # Nobody is left waiting for the turn.
+            if self.run_task is not None:
+                self.run_task.cancel()
+
+
+class MailboxRegistry:
+    """
+    Mailboxes of the threads with a run in progress, created on demand and dropped once drained.
+    """
+
+    def __init__(self):
+        self.mailboxes: dict[str, Mailbox] = {}
+
+    async def submit(
+        self,
+        thread_id: str,
+        item: Any,
+        fold_key: Hashable,
+        run: Callable[[list[Any]], Awaitable[Any]],
+        on_queued: Callable[[int], Awaitable[None]] | None = None,
+    ) -> Any:
+        """
+        Run `item` on its thread, folded with the other queued items of the same `fold_key`.
+
+        `run` receives the items of the turn and its result is returned to every
+        one of their callers. Cancelling the caller drops a queued item, or
+        cancels the turn once all of its callers have gone.
+        """
+        mailbox = self.mailboxes.get(thread_id)
+        if mailbox is None:
+            mailbox = self.mailboxes[thread_id] = Mailbox(thread_id, self)
+        if len(mailbox.pending) >= settings.THREAD_MAILBOX_MAX_PENDING:
+            metrics.increment("thread_messages_rejected_total")
+            raise MailboxFull(f"Too many messages queued for thread {thread_id}")
+
+        message = Message(item, fold_key, run)
+        mailbox.pending.append(message)
+        queued = mailbox.busy
+        if queued:
+            metrics.increment("thread_messages_queued_total")
+        else:
+            mailbox.actor = asyncio.create_task(mailbox._drain(), name=f"thread-mailbox:{thread_id}")
+
+        try:
+            if queued and on_queued is not None:
+                await on_queued(len(mailbox.pending))
+            return await asyncio.shield(message.future)
+        except asyncio.CancelledError:
+            mailbox._abandon(message)
+            raise
+
+    def _forget(self, mailbox: Mailbox):
+        if self.mailboxes.get(mailbox.thread_id) is mailbox:
+            del self.mailboxes[mailbox.thread_id]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "active_threads": len(self.mailboxes),
+            "queued_messages": sum(len(mailbox.pending) for mailbox in self.mailboxes.values()),
+        }
+
+    async def close(self):
+        actors = [mailbox.actor for mailbox in self.mailboxes.values() if mailbox.actor is not None]
+        for actor in actors:
+            actor.cancel()
+        await asyncio.gather(*actors, return_exceptions=True)
+
+
+mailboxes = MailboxRegistry()
@@ -1,6 +1,8 @@
 from typing import Any, List, Literal, NotRequired, TypedDict
 from pydantic import BaseModel, Field
+from agents.model import RunStop
 from config import settings
+from tools.model import TENANT_ID_PATTERN
 
 class ToolCall(TypedDict):
     """Represents a request to call a tool."""
@@ -98,6 +100,37 @@ class ChatInput(BaseModel):
     stream: bool = Field(
         default=False
     )
+    priority: Literal["interactive", "batch"] = Field(
+        default="interactive",
+        description="Scheduling priority of the model calls made for this request. Interactive requests are served before batch ones when the provider is saturated.",
+    )
+    tenant_id: str | None = Field(
+        default=None,
+        pattern=TENANT_ID_PATTERN,
+        description="Tenant the request runs for. Selects its MCP servers, tools and quotas. Defaults to DEFAULT_TENANT_ID. Unknown tenants are rejected with 404, they are created by adding MCP servers for them.",
+    )
+    timeout: float | None = Field(
+        default=None,
+        gt=0,
+        description="Deadline of the request in seconds, shared by every model and tool call of the run. Defaults to REQUEST_TIMEOUT_SECONDS.",
+    )
+    max_steps: int | None = Field(
+        default=None,
+        gt=0,
+        # Each model call with tools takes two graph steps, the step budget trips before the recursion limit.
+        le=(settings.GRAPH_RECURSION_LIMIT - 1) // 2,
+        description="Model calls the run may make before it is stopped with a partial answer. Defaults to RUN_MAX_STEPS.",
+    )
+    token_budget: int | None = Field(
+        default=None,
+        gt=0,
+        description="Tokens the run may use before it is stopped with a partial answer. Defaults to RUN_MAX_TOKENS.",
+    )
+    time_budget: float | None = Field(
+        default=None,
+        gt=0,
+        description="Seconds the run may take before it is stopped with a partial answer. Defaults to RUN_MAX_SECONDS.",
+    )
     
 class ChatResponse(BaseModel):
     thread_id: str | None = Field(
@@ -119,4 +152,8 @@ class ChatResponse(BaseModel):
         description="The model's response to the user's query. This is the output message generated by the model based on the input query.",
         examples=["The weather today is sunny with a high of 75°F.", "Why did the scarecrow win an award? Because he was outstanding in his field!"],
         default=""
+    )
+    stop: RunStop | None = Field(
+        description="Set when a run guard ended the run early, `reply` then holds its best partial answer.",
+        default=None,
     )
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from chat.service import chat_service, stream_chat_service
+from chat.service import chat_service, resume_stream_chat_service, stream_chat_service
 from utilities.utils import sse_response_example
 
 router = APIRouter(
@@ -11,4 +11,5 @@ router = APIRouter(
 )
 
 router.post("/invoke/", responses={403: {"description": "Operation forbidden"}})(chat_service)
-router.post("/ainvoke/", responses=sse_response_example())(stream_chat_service)
\ No newline at end of file
+router.post("/ainvoke/", responses=sse_response_example())(stream_chat_service)
+router.get("/ainvoke/{run_id}/", responses=sse_response_example())(resume_stream_chat_service)
\ No newline at end of file
@@ -1,24 +1,145 @@
-from typing import AsyncGenerator
+import asyncio
+import time
 from uuid import uuid4
 
+from fastapi import Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolMessage
 from agents.model import BuildAgent, BuildInputMessage, BuildRunnableConfig, ExecuteAgentInput, LLMConfig
-from agents.service import build_agent, build_input_message, build_runnable_config, execute_agent
+from agents.guards import GuardTripped, RunGuard
+from agents.service import build_agent, build_input_message, build_runnable_config, execute_agent, stop_run, with_callbacks
+from chat.mailbox import MailboxFull, mailboxes
 from chat.model import ChatInput, ChatResponse
+from chat.stream import RunStream, StreamGroup, create_stream, get_stream
 from config import settings
+from debug.recorder import flight_recorder
+from tools.progress import ToolProgress, tool_progress
 from tools.service import load_tools_from_mcp_json
+from tools.tenants import current_tenant, tenants
+from utilities.deadline import resolve_timeout, set_deadline, within_deadline
 from utilities.logger import get_logger
-from utilities.utils import langchain_to_chat_message
+from utilities.metrics import metrics
+from utilities.model import llm_priority
+from utilities.utils import convert_message_content_to_string, langchain_to_chat_message, remove_tool_calls
 
 logger = get_logger(__name__)
 
-async def chat_service(payload: ChatInput) -> ChatResponse:
+# Strong references to detached streaming runs, so they are not garbage collected mid-run.
+_background_runs: set[asyncio.Task] = set()
+
+class ClientDisconnected(Exception):
+    pass
+
+def _record_outcome(run_id, outcome: str):
+    metrics.increment("agent_runs_total", labels={"outcome": outcome})
+    if outcome != "completed":
+        logger.warning(f"Run {run_id} ended as {outcome}")
+
+async def _run_until_disconnected(request: Request, awaitable):
+    """
+    Await `awaitable`, cancelling it (and every LLM and tool call under it) if the client goes away.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def chat_service(
+    payload: ChatInput,
+    request: Request,
+    x_request_timeout: float | None = Header(default=None, description="Deadline of the request in seconds."),
+) -> ChatResponse:
     try:
-        logger.info(f"Received chat payload: {payload}")
+        logger.info("Received chat payload: thread_id=%s model=%s query=%s", payload.thread_id, payload.model, payload.query)
+        logger.debug("Chat payload: %s", payload)
         
         thread_id = payload.thread_id or str(uuid4())
         run_id = uuid4()
+        llm_priority.set(payload.priority)
+        _set_tenant(payload)
+        set_deadline(resolve_timeout(payload.timeout, x_request_timeout))
+
+        try:
+            run_id, output = await _run_until_disconnected(request, _invoke_in_mailbox(payload, thread_id, run_id))
+        except MailboxFull as err:
+            raise HTTPException(status_code=429, detail=str(err))
+        except ClientDisconnected:
+            _record_outcome(run_id, "cancelled")
+            raise HTTPException(status_code=499, detail="Client disconnected")
+        except TimeoutError:
+            _record_outcome(run_id, "timeout")
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+        stop = output.get("stop")
+        _record_outcome(run_id, "stopped" if stop else "completed")
+
+        output = langchain_to_chat_message(output["messages"][-1])
         
+        logger.info("Output for run %s: %s", run_id, output.content)
+
+        return ChatResponse(
+            thread_id=thread_id,
+            run_id=str(run_id),
+            query=payload.query,
+            reply=output.content,
+            stop=stop,
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in chat service: {e}")
+        raise e
+
+def _set_tenant(payload: ChatInput):
+    tenant_id = payload.tenant_id or settings.DEFAULT_TENANT_ID
+    current_tenant.set(tenant_id)
+    # Chat never creates tenants, they are provisioned through the MCP config endpoint.
+    if tenants.lookup(tenant_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant_id}")
+
+def _fold_key(payload: ChatInput, mode: str) -> tuple:
+    # Messages only share a turn when they would have built the same agent and run it with the same limits.
+    return (
+        mode, payload.tenant_id, payload.prompt, payload.model, payload.temperature, payload.stream, payload.priority,
+        payload.max_steps, payload.token_budget, payload.time_budget,
+    )
+
+def _run_guard(payload: ChatInput) -> RunGuard:
+    return RunGuard(
+        max_steps=payload.max_steps or settings.RUN_MAX_STEPS,
+        max_tokens=payload.token_budget or settings.RUN_MAX_TOKENS,
+        max_seconds=payload.time_budget or settings.RUN_MAX_SECONDS,
+    )
+
+def _fold(payloads: list[ChatInput]) -> ChatInput:
+    """
+    One payload whose query holds the queries of every message folded into the turn.
+    """
+    if len(payloads) == 1:
+        return payloads[0]
+    return payloads[0].model_copy(update={"query": "\n\n".join(payload.query for payload in payloads)})
+
+async def _invoke_in_mailbox(payload: ChatInput, thread_id: str, run_id) -> tuple:
+    """
+    Run the turn on the thread's mailbox, once the runs already in progress on it are done.
+    """
+    async def run(payloads: list[ChatInput]) -> tuple:
+        return run_id, await _invoke_agent(_fold(payloads), thread_id, run_id)
+
+    # Waiting in the mailbox counts against the deadline too.
+    async with within_deadline():
+        return await mailboxes.submit(thread_id, payload, _fold_key(payload, "invoke"), run)
+
+async def _invoke_agent(payload: ChatInput, thread_id: str, run_id) -> dict:
+    async with within_deadline():
         tools = await load_tools_from_mcp_json()
         
         agent = await build_agent(BuildAgent(
@@ -41,34 +162,33 @@ async def chat_service(payload: ChatInput) -> ChatResponse:
             query=payload.query
         ))
         
-        output = await execute_agent(ExecuteAgentInput(
-            agent=agent,
-            input=input,
-            config=config,
-            mode="ainvoke"
-        ))
-
-        output = langchain_to_chat_message(output["messages"][-1])
-        
-        logger.info(f'Output : {output}')
-
-        return ChatResponse(
-            thread_id=thread_id,
-            run_id=str(run_id),
-            query=payload.query,
-            reply=output.content,
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in chat service: {e}")
-        raise e
+        async with flight_recorder.run(config, model=payload.model) as recording:
+            output = await execute_agent(ExecuteAgentInput(
+                agent=agent,
+                input=input,
+                config=config,
+                mode="ainvoke",
+                guard=_run_guard(payload),
+                callbacks=[recording]
+            ))
+            if output.get("stop"):
+                recording.outcome = "stopped"
+                recording.stop_reason = output["stop"].reason
+            return output
     
-async def stream_chat_service(payload: ChatInput) -> ChatResponse:
+async def stream_chat_service(
+    payload: ChatInput,
+    x_request_timeout: float | None = Header(default=None, description="Deadline of the request in seconds."),
+) -> StreamingResponse:
     try:
-        logger.info(f"Received chat payload: {payload}")
+        logger.info("Received chat payload: thread_id=%s model=%s query=%s", payload.thread_id, payload.model, payload.query)
+        logger.debug("Chat payload: %s", payload)
         
         thread_id = payload.thread_id or str(uuid4())
         run_id = uuid4()
+        llm_priority.set(payload.priority)
+        _set_tenant(payload)
+        set_deadline(resolve_timeout(payload.timeout, x_request_timeout))
         
         tools = await load_tools_from_mcp_json()
         
@@ -89,171 +209,153 @@ async def stream_chat_service(payload: ChatInput) -> ChatResponse:
             model=payload.model
         ))
         
-        input = build_input_message(BuildInputMessage(
-            query=payload.query
-        ))
-        
-        async def stream_generator() -> AsyncGenerator[str, None]:
-            # Await the astream() call to get the async iterator
-            async for chunk in agent.astream(input=input, config=config):
-                # Check for a specific key in the chunk
-                # In a real LangGraph setup, you might check for "messages" or "output"
-                # and extract the relevant text
-                if "__end__" in chunk and "generator" in chunk["__end__"]:
-                    # The generator node is the one producing the text, so we yield its output.
-                    # The `chunk["__end__"]["generator"]` will be the text yielded from the node.
-                    yield chunk["__end__"]["generator"]
-
-        # Return a StreamingResponse with the async generator
-        return StreamingResponse(stream_generator(), media_type="text/event-stream")
-        
-        # output = await execute_agent(ExecuteAgentInput(
-        #     agent=agent,
-        #     input=input,
-        #     config=config,
-        #     mode="ainvoke"
-        # ))
-
-        # output = langchain_to_chat_message(output["messages"][-1])
-        
-        # logger.info(f'Output : {output}')
+        # The run is decoupled from the HTTP connection so clients can resume it.
+        stream = create_stream(run_id=str(run_id), thread_id=thread_id)
+        task = asyncio.create_task(_stream_in_mailbox(agent, config, payload, stream))
+        stream.task = task
+        _background_runs.add(task)
+        task.add_done_callback(_background_runs.discard)
 
-        # return ChatResponse(
-        #     thread_id=thread_id,
-        #     run_id=str(run_id),
-        #     query=payload.query,
-        #     reply=output.content,
-        # )
+        return StreamingResponse(
+            stream.subscribe(),
+            media_type="text/event-stream",
+            headers={"X-Run-Id": stream.run_id, "X-Thread-Id": thread_id}
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat service: {e}")
         raise e
     
-# async def stream_chat_service(payload: ChatInput):
-#     try:
-#         logger.info(f"Received chat payload: {payload}")
-        
-#         thread_id = payload.thread_id or str(uuid4())
-#         run_id = uuid4()
-        
-#         tools = await load_tools_from_mcp_json()
-        
-#         agent = await build_agent(BuildAgent(
-#             name=settings.DEFAULT_AGENT_NAME,
-#             prompt=payload.prompt,
-#             tools=tools,
-#             llm_config=LLMConfig(
-#                 model=payload.model,
-#                 temperature=payload.temperature,
-#                 streaming=payload.stream
-#             )
-#         ))
-        
-#         config = build_runnable_config(BuildRunnableConfig(
-#             thread_id=thread_id,
-#             run_id=run_id,
-#             model=payload.model
-#         ))
-        
-#         input = build_input_message(BuildInputMessage(
-#             query=payload.query
-#         ))
-        
-#         # Process streamed events from the graph and yield messages over the SSE stream.
-#         async for stream_event in agent.astream(
-#             input=input, config=config, stream_mode=["updates", "messages", "custom"], subgraphs=True
-#         ):
-#             if not isinstance(stream_event, tuple):
-#                 continue
-#             # Handle different stream event structures based on subgraphs
-#             if len(stream_event) == 3:
-#                 # With subgraphs=True: (node_path, stream_mode, event)
-#                 _, stream_mode, event = stream_event
-#             else:
-#                 # Without subgraphs: (stream_mode, event)
-#                 stream_mode, event = stream_event
-#             new_messages = []
-#             if stream_mode == "updates":
-#                 for node, updates in event.items():
-#                     # A simple approach to handle agent interrupts.
-#                     # In a more sophisticated implementation, we could add
-#                     # some structured ChatMessage type to return the interrupt value.
-#                     if node == "__interrupt__":
-#                         interrupt: Interrupt
-#                         for interrupt in updates:
-#                             new_messages.append(AIMessage(content=interrupt.value))
-#                         continue
-#                     updates = updates or {}
-#                     update_messages = updates.get("messages", [])
-#                     # special cases for using langgraph-supervisor library
-#                     if node == "supervisor":
-#                         # Get only the last ToolMessage since is it added by the
-#                         # langgraph lib and not actual AI output so it won't be an
-#                         # independent event
-#                         if isinstance(update_messages[-1], ToolMessage):
-#                             update_messages = [update_messages[-1]]
-#                         else:
-#                             update_messages = []
+async def resume_stream_chat_service(run_id: str, last_event_id: int = Header(default=-1)) -> StreamingResponse:
+    """
+    Reconnect to a running (or recently finished) streamed run, replaying events after `Last-Event-ID`.
+    """
+    stream = get_stream(run_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Run stream not found or expired")
+
+    return StreamingResponse(
+        stream.subscribe(last_event_id),
+        media_type="text/event-stream",
+        headers={"X-Run-Id": stream.run_id, "X-Thread-Id": stream.thread_id}
+    )
 
-#                     if node in ("research_expert", "math_expert"):
-#                         update_messages = []
-#                     new_messages.extend(update_messages)
+async def _stream_in_mailbox(agent, config, payload: ChatInput, stream: RunStream):
+    """
+    Stream the turn once the thread is free, folded with the other streamed messages queued on it.
+    """
+    async def run(items: list[tuple[ChatInput, RunStream]]):
+        for _, item_stream in items:
+            item_stream.started = True
+        folded = _fold([item_payload for item_payload, _ in items])
+        input = build_input_message(BuildInputMessage(query=folded.query))
+        await _stream_agent_run(agent, input, config, folded, StreamGroup([item_stream for _, item_stream in items]))
 
-#             if stream_mode == "custom":
-#                 new_messages = [event]
+    async def on_queued(position: int):
+        await stream.publish({"type": "queued", "content": {"position": position}})
 
-#             # LangGraph streaming may emit tuples: (field_name, field_value)
-#             # e.g. ('content', <str>), ('tool_calls', [ToolCall,...]), ('additional_kwargs', {...}), etc.
-#             # We accumulate only supported fields into `parts` and skip unsupported metadata.
-#             # More info at: https://langchain-ai.github.io/langgraph/cloud/how-tos/stream_messages/
-#             processed_messages = []
-#             current_message: dict[str, Any] = {}
-#             for message in new_messages:
-#                 if isinstance(message, tuple):
-#                     key, value = message
-#                     # Store parts in temporary dict
-#                     current_message[key] = value
-#                 else:
-#                     # Add complete message if we have one in progress
-#                     if current_message:
-#                         processed_messages.append(_create_ai_message(current_message))
-#                         current_message = {}
-#                     processed_messages.append(message)
+    try:
+        await mailboxes.submit(stream.thread_id, (payload, stream), _fold_key(payload, "stream"), run, on_queued)
+    except asyncio.CancelledError:
+        if not stream.started:
+            # Left the queue before its turn, which would have closed the stream.
+            _record_outcome(stream.run_id, "cancelled")
+            await stream.publish({"type": "cancelled", "content": "Run cancelled"})
+            await stream.close("cancelled")
+        raise
+    except MailboxFull as err:
+        _record_outcome(stream.run_id, "rejected")
+        await stream.publish({"type": "error", "content": str(err)})
+        await stream.close("rejected")
 
-#             # Add any remaining message parts
-#             if current_message:
-#                 processed_messages.append(_create_ai_message(current_message))
+async def _stream_agent_run(agent, input: dict, config, payload: ChatInput, stream: RunStream | StreamGroup):
+    await stream.publish({"type": "run", "content": {"run_id": stream.run_id, "thread_id": stream.thread_id}})
+    tool_started: dict[str, float] = {}
+    guard = _run_guard(payload)
+    # Progress of the tool calls, published to the stream by the tool middleware.
+    progress = ToolProgress(stream.publish)
+    progress_token = tool_progress.set(progress)
+    status = "completed"
+    async with flight_recorder.run(config, model=payload.model) as recording:
+        try:
+            async with within_deadline():
+                try:
+                    await _stream_agent_events(agent, input, with_callbacks(config, guard, recording, progress), payload, stream, tool_started)
+                except GuardTripped as err:
+                    status = "stopped"
+                    message, stop = await stop_run(agent, config, guard, err)
+                    recording.stop_reason = stop.reason
+                    await _publish_message(stream, message, payload, tool_started)
+                    await stream.publish({"type": "stopped", "content": stop.model_dump()})
 
-#             for message in processed_messages:
-#                 try:
-#                     chat_message = langchain_to_chat_message(message)
-#                     chat_message.run_id = str(run_id)
-#                 except Exception as e:
-#                     logger.error(f"Error parsing message: {e}")
-#                     yield f"data: {json.dumps({'type': 'error', 'content': 'Unexpected error'})}\n\n"
-#                     continue
-#                 # LangGraph re-sends the input message, which feels weird, so drop it
-#                 if chat_message.type == "human" and chat_message.content == payload.query:
-#                     continue
-#                 yield f"data: {json.dumps({'type': 'message', 'content': chat_message.model_dump()})}\n\n"
+        except asyncio.CancelledError:
+            status = "cancelled"
+            await stream.publish({"type": "cancelled", "content": "Run cancelled"})
+            raise
+        except TimeoutError:
+            status = "timeout"
+            await stream.publish({"type": "error", "content": "Request deadline exceeded"})
+        except Exception as e:
+            status = "failed"
+            logger.error(f"Error in streamed run {stream.run_id}: {e}")
+            await stream.publish({"type": "error", "content": "Unexpected error"})
+        finally:
+            tool_progress.reset(progress_token)
+            recording.outcome = status
+            _record_outcome(stream.run_id, status)
+            await stream.close(status)
 
-#             if stream_mode == "messages":
-#                 if not payload.stream:
-#                     continue
-#                 msg, metadata = event
-#                 if "skip_stream" in metadata.get("tags", []):
-#                     continue
-#                 # For some reason, astream("messages") causes non-LLM nodes to send extra messages.
-#                 # Drop them.
-#                 if not isinstance(msg, AIMessageChunk):
-#                     continue
-#                 content = remove_tool_calls(msg.content)
-#                 if content:
-#                     # Empty content in the context of OpenAI usually means
-#                     # that the model is asking for a tool to be invoked.
-#                     # So we only print non-empty content.
-#                     yield f"data: {json.dumps({'type': 'token', 'content': convert_message_content_to_string(content)})}\n\n"
-        
-#     except Exception as e:
-#         logger.error(f"Error in chat service: {e}")
-#         raise e
\ No newline at end of file
+async def _stream_agent_events(agent, input: dict, config, payload: ChatInput, stream: RunStream | StreamGroup, tool_started: dict[str, float]):
+    async for stream_mode, event in agent.astream(input=input, config=config, stream_mode=["updates", "messages"]):
+        if stream_mode == "updates":
+            for updates in event.values():
+                for message in (updates or {}).get("messages", []):
+                    await _publish_message(stream, message, payload, tool_started)
+
+        elif stream_mode == "messages":
+            if not payload.stream:
+                continue
+            msg, metadata = event
+            if "skip_stream" in metadata.get("tags", []):
+                continue
+            # Non-LLM nodes also emit messages in this mode, drop them.
+            if not isinstance(msg, AIMessageChunk):
+                continue
+            content = remove_tool_calls(msg.content)
+            if content:
+                # Empty content usually means the model is asking for a tool call.
+                await stream.publish({"type": "token", "content": convert_message_content_to_string(content)})
+
+async def _publish_message(stream: RunStream | StreamGroup, message: BaseMessage, payload: ChatInput, tool_started: dict[str, float]):
+    chat_message = langchain_to_chat_message(message)
+    if chat_message is None:
+        await stream.publish({"type": "error", "content": "Unexpected error"})
+        return
+    # LangGraph re-sends the input message, drop it
+    if chat_message.type == "human" and chat_message.content == payload.query:
+        return
+
+    chat_message.run_id = stream.run_id
+    chat_message.thread_id = stream.thread_id
+
+    for tool_call in chat_message.tool_calls:
+        tool_started[tool_call["id"]] = time.monotonic()
+        await stream.publish({"type": "tool", "content": {
+            "status": "start",
+            "name": tool_call["name"],
+            "tool_call_id": tool_call["id"],
+            "args": tool_call["args"],
+        }})
+
+    if isinstance(message, ToolMessage):
+        started = tool_started.pop(message.tool_call_id, None)
+        await stream.publish({"type": "tool", "content": {
+            "status": "error" if message.status == "error" else "end",
+            "name": message.name,
+            "tool_call_id": message.tool_call_id,
+            "elapsed": round(time.monotonic() - started, 3) if started else None,
+        }})
+
+    await stream.publish({"type": "message", "content": chat_message.model_dump()})
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator
+
+from config import settings
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RunStream:
+    """
+    Replayable buffer of the SSE events produced by one agent run.
+
+    The run publishes into the buffer independently of any HTTP connection, so
+    a client that drops can reconnect with `Last-Event-ID` and resume from the
+    next event instead of re-submitting its query.
+    """
+
+    def __init__(self, run_id: str, thread_id: str):
+        self.run_id = run_id
+        self.thread_id = thread_id
+        self.events: list[str] = []
+        self.done = False
+        self.status = "running"
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        # Whether the agent turn publishing into this stream has started (it may wait on its thread first).
+        self.started = False
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: dict[str, Any]):
+        async with self._changed:
+            event_id = len(self.events)
+            self.events.append(f"id: {event_id}\ndata: {json.dumps(event, default=str)}\n\n")
+            self._changed.notify_all()
+
+    async def close(self, status: str = "completed"):
+        async with self._changed:
+            if self.done:
+                return
+            self.status = status
+            self.events.append(f"id: {len(self.events)}\ndata: [DONE]\n\n")
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    async def subscribe(self, last_event_id: int = -1) -> AsyncGenerator[str, None]:
+        """
+        Yield every event after `last_event_id`, then follow the run until it is done.
+        """
+        position = last_event_id + 1
+        self.subscribers += 1
+        try:
+            async for frame in self._follow(position):
+                yield frame
+        finally:
+            self._unsubscribe()
+
+    async def _follow(self, position: int) -> AsyncGenerator[str, None]:
+        while True:
+            async with self._changed:
+                if position >= len(self.events) and not self.done:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                pending = self.events[position:]
+                done = self.done
+
+            if not pending and not done:
+                # SSE comment, keeps proxies and client read timeouts from closing an idle stream.
+                yield ": keep-alive\n\n"
+                continue
+
+            for frame in pending:
+                yield frame
+            position += len(pending)
+
+            if done and position >= len(self.events):
+                return
+
+    def _unsubscribe(self):
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            # Give a dropped client time to reconnect before the run is abandoned.
+            asyncio.get_running_loop().call_later(settings.STREAM_RECONNECT_GRACE_SECONDS, self._cancel_if_abandoned)
+
+    def _cancel_if_abandoned(self):
+        if self.subscribers == 0 and not self.done and self.task is not None and not self.task.done():
+            logger.info(f"No client reconnected to run {self.run_id}, cancelling it")
+            self.task.cancel("client disconnected")
+
+
+class StreamGroup:
+    """
+    Publishes the events of one agent turn to the streams of every message folded into it.
+    """
+
+    def __init__(self, streams: list[RunStream]):
+        self.streams = streams
+        self.run_id = streams[0].run_id
+        self.thread_id = streams[0].thread_id
+
+    async def publish(self, event: dict[str, Any]):
+        for stream in self.streams:
+            await stream.publish(event)
+
+    async def close(self, status: str = "completed"):
+        for stream in self.streams:
+            await stream.close(status)
+
+
+_streams: dict[str, RunStream] = {}
+
+
+def create_stream(run_id: str, thread_id: str) -> RunStream:
+    _evict_finished_streams()
+    stream = RunStream(run_id=run_id, thread_id=thread_id)
+    _streams[run_id] = stream
+    return stream
+
+
+def get_stream(run_id: str) -> RunStream | None:
+    _evict_finished_streams()
+    return _streams.get(run_id)
+
+
+def _evict_finished_streams():
+    now = time.monotonic()
+    expired = [
+        run_id for run_id, stream in _streams.items()
+        if stream.done and now - stream.finished_at > settings.STREAM_RETENTION_SECONDS
+    ]
+    for run_id in expired:
+        del _streams[run_id]
+    if expired:
+        logger.info(f"Evicted {len(expired)} finished run streams")
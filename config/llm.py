@@ -11,6 +11,7 @@ class Provider(StrEnum):
     GROQ = auto()
     AWS = auto()
     OLLAMA = auto()
+    OPENAI_COMPATIBLE = auto()
     FAKE = auto()
 
 class OpenAIModelName(StrEnum):
@@ -74,6 +75,11 @@ class OllamaModelName(StrEnum):
 
     OLLAMA_GENERIC = "ollama"
 
+class OpenAICompatibleModelName(StrEnum):
+    """Any server speaking the OpenAI chat completions API (vLLM, llama.cpp, LM Studio, ...)"""
+
+    OPENAI_COMPATIBLE = "openai-compatible"
+
 class FakeModelName(StrEnum):
     """Fake model for testing."""
 
@@ -87,6 +93,8 @@ AllModelEnum: TypeAlias = (
     | GoogleModelName
     | GroqModelName
     | AWSModelName
+    | OllamaModelName
+    | OpenAICompatibleModelName
     | FakeModelName
 )
 
@@ -100,6 +108,8 @@ _MODEL_TABLE = {
     OpenAIModelName.GPT_5: "gpt-5",
     OpenAIModelName.GPT_5_MINI: "gpt-5-mini",
     OpenAIModelName.GPT_5_NANO: "gpt-5-nano",
+    AzureOpenAIModelName.AZURE_GPT_4O: "gpt-4o",
+    AzureOpenAIModelName.AZURE_GPT_4O_MINI: "gpt-4o-mini",
     DeepseekModelName.DEEPSEEK_CHAT: "deepseek-chat",
     AnthropicModelName.HAIKU_3: "claude-3-haiku-20240307",
     AnthropicModelName.HAIKU_35: "claude-3-5-haiku-latest",
@@ -117,5 +127,6 @@ _MODEL_TABLE = {
     AWSModelName.BEDROCK_HAIKU: "anthropic.claude-3-5-haiku-20241022-v1:0",
     AWSModelName.BEDROCK_SONNET: "anthropic.claude-3-5-sonnet-20240620-v1:0",
     OllamaModelName.OLLAMA_GENERIC: "ollama",
+    OpenAICompatibleModelName.OPENAI_COMPATIBLE: "openai-compatible",
     FakeModelName.FAKE: "fake",
 }
\ No newline at end of file
@@ -1,3 +1,4 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -13,8 +14,127 @@ class Settings(BaseSettings):
     DEFAULT_MODEL: str = "gemini-2.5-flash"
     DEFAULT_TEMPERATURE: float = 0.5
     GRAPH_RECURSION_LIMIT: int = 40
+    # Run guards, a tripped guard ends the run early with its best partial answer (see agents/guards.py).
+    RUN_MAX_STEPS: int = 15
+    RUN_MAX_TOKENS: int = 200000
+    RUN_MAX_SECONDS: float = 300.0
+    RUN_MAX_REPEATED_TOOL_CALLS: int = 2
+    # Flight recorder of agent runs, the step timeline is only kept for runs slower than the threshold.
+    RUN_RECORDER_ENABLED: bool = True
+    RUN_RECORDER_PATH: str = "./.runs/runs.sqlite3"
+    RUN_RECORDER_RETENTION_SECONDS: float = 7 * 24 * 3600
+    RUN_RECORDER_MAX_RUNS: int = 100000
+    RUN_RECORDER_DETAIL_THRESHOLD_SECONDS: float = 10.0
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False
+    LOG_FIELD_MAX_CHARS: int = 2000
+    LOG_MESSAGE_MAX_CHARS: int = 8000
+    LOG_QUEUE_SIZE: int = 10000
+    # Fraction of sub-WARNING records kept per logger (prefix match), e.g. {"tools.pool": 0.1}
+    LOG_SAMPLE_RATES: dict[str, float] = {}
     MCP_CONFIG_FILE: str = "./mcp.json"
+    DEFAULT_TENANT_ID: str = "default"
+    # Configs (mcp.json and manifest) of every tenant but the default one, which uses MCP_CONFIG_FILE.
+    TENANT_CONFIG_DIR: str = "./tenants"
+    # Tenants kept loaded (pool, watcher, scheduler share), the least recently used idle ones are unloaded beyond it.
+    TENANT_MAX_LOADED: int = 100
+    TENANT_MAX_SERVERS: int = 10
+    TENANT_MAX_CONCURRENT_TOOL_CALLS: int = 4
+    TENANT_TOOL_CALLS_PER_SECOND: float = 5.0
+    TENANT_TOOL_CALL_BURST: int = 10
+    # Per tenant overrides of the quotas above (and its fair-share "weight"), e.g. {"acme": {"max_servers": 20, "weight": 2}}
+    TENANT_QUOTA_OVERRIDES: dict[str, dict[str, float]] = {}
+    # Tool calls running at once in this process, shared fairly between tenants.
+    TOOL_MAX_CONCURRENCY: int = 16
+    # Identical concurrent calls of read-only tools (MCP readOnlyHint) share one execution, plus these tools.
+    TOOL_COALESCE_ENABLED: bool = True
+    TOOL_COALESCE_EXTRA_TOOLS: list[str] = []
+    # Interval of the heartbeat events of a tool call still running in a streamed run.
+    TOOL_PROGRESS_HEARTBEAT_SECONDS: float = 5.0
+    MCP_CONFIG_WATCH: bool = True
+    # The entry of mcp.json pointing at mcp_server.py, whose tools are served in process when enabled.
+    MCP_MANAGEMENT_SERVER_NAME: str = "deploy-mcp"
+    MCP_MANAGEMENT_IN_PROCESS: bool = True
+    # Defaults of `python mcp_server.py`, see its --help.
+    MCP_MANAGER_TRANSPORT: str = "stdio"
+    MCP_MANAGER_HOST: str = "127.0.0.1"
+    MCP_MANAGER_PORT: int = 8765
+    MCP_MANAGER_UDS: str = ""
+    MCP_MANAGER_MAX_CONCURRENCY: int = 8
+    MCP_MANAGER_REQUEST_TIMEOUT_SECONDS: float = 300.0
+    # deploy-mcp runs arbitrary commands and the server has no auth, it only binds a non-loopback host with this set.
+    MCP_MANAGER_ALLOW_REMOTE: bool = False
+    # `npx <package>` servers are installed once at deploy time and spawned from the package cache.
+    MCP_LAUNCH_RESOLVE_ENABLED: bool = True
+    MCP_LAUNCH_CACHE_DIR: str = "./.mcp-packages"
+    MCP_LAUNCH_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    MCP_LAUNCH_RESOLVE_TIMEOUT_SECONDS: float = 180.0
+    # Local index behind search-mcp-registry, (re)imported from the dump file whenever it changes.
+    MCP_REGISTRY_PATH: str = "./.registry/mcp_registry.sqlite3"
+    MCP_REGISTRY_DUMP_FILE: str = "./mcp_registry.json"
+    MCP_CONFIG_POLL_SECONDS: float = 2.0
+    MCP_CONNECT_TIMEOUT_SECONDS: float = 60.0
+    MCP_BREAKER_FAILURE_THRESHOLD: int = 2
+    MCP_BREAKER_RESET_SECONDS: float = 30.0
+    MCP_BREAKER_MAX_RESET_SECONDS: float = 600.0
+    ARTIFACT_STORE_ENABLED: bool = True
+    ARTIFACT_DIR: str = "./.artifacts"
+    ARTIFACT_STORE_MAX_BYTES: int = 512 * 1024 * 1024
+    ARTIFACT_THRESHOLD_CHARS: int = 8000
+    ARTIFACT_PREVIEW_CHARS: int = 2000
+    ARTIFACT_PAGE_MAX_CHARS: int = 8000
+    AGENT_CACHE_SIZE: int = 32
+    # Store checkpointed messages once, by content hash, and compress payloads above the threshold.
+    CHECKPOINT_DEDUP_ENABLED: bool = True
+    CHECKPOINT_COMPRESS_MIN_BYTES: int = 2048
+    # Checkpoints kept per thread, older ones (and the stored messages only they used) are pruned periodically. 0 keeps all.
+    CHECKPOINT_KEEP_PER_THREAD: int = 10
+    CHECKPOINT_PRUNE_INTERVAL_SECONDS: float = 300.0
+    WARMUP_ON_STARTUP: bool = False
     OPENAI_API_KEY: str = ""
     GOOGLE_API_KEY: str = ""
+    ANTHROPIC_API_KEY: str = ""
+    GROQ_API_KEY: str = ""
+    DEEPSEEK_API_KEY: str = ""
+    DEEPSEEK_BASE_URL: str = "https://api.deepseek.com"
+    AZURE_OPENAI_API_KEY: str = ""
+    AZURE_OPENAI_ENDPOINT: str = ""
+    AZURE_OPENAI_API_VERSION: str = "2024-10-21"
+    # Deployment name of each Azure model, e.g. {"gpt-4o": "my-gpt-4o-deployment"}
+    AZURE_OPENAI_DEPLOYMENT_MAP: dict[str, str] = {}
+    AWS_BEDROCK_REGION: str = ""
+    # Local models: "ollama" serves OLLAMA_MODEL, "openai-compatible" serves COMPATIBLE_MODEL from COMPATIBLE_BASE_URL.
+    OLLAMA_MODEL: str = "llama3.2"
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    COMPATIBLE_MODEL: str = ""
+    COMPATIBLE_BASE_URL: str = ""
+    COMPATIBLE_API_KEY: str = ""
+    REQUEST_TIMEOUT_SECONDS: float = 600.0
+    DISCONNECT_POLL_SECONDS: float = 0.5
+    STREAM_RECONNECT_GRACE_SECONDS: float = 15.0
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+    STREAM_RETENTION_SECONDS: float = 300.0
+    # Messages queued on a busy thread, and how many of them are folded into its next turn.
+    THREAD_MAILBOX_MAX_PENDING: int = 32
+    THREAD_MAILBOX_MAX_BATCH: int = 8
+    LLM_RATE_LIMIT_RPS: float = 2.0
+    LLM_RATE_LIMIT_BURST: int = 5
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_RATE_LIMIT_RETRIES: int = 3
+    LLM_RETRY_AFTER_DEFAULT: float = 5.0
+    LLM_SDK_MAX_RETRIES: int = 0
+    # Per "provider" or "provider:model" overrides, e.g. {"google:gemini-2.5-pro": {"rps": 0.5, "max_concurrency": 2}}
+    LLM_RATE_LIMIT_OVERRIDES: dict[str, dict[str, float]] = {}
+
+    @model_validator(mode="after")
+    def check_step_budget(self):
+        # Each model call with tools takes two graph steps. The step budget has to trip before the
+        # agent runs out of remaining steps, which ends the run with a canned "need more steps" reply.
+        if self.RUN_MAX_STEPS > (self.GRAPH_RECURSION_LIMIT - 1) // 2:
+            raise ValueError(
+                f"RUN_MAX_STEPS ({self.RUN_MAX_STEPS}) must be at most (GRAPH_RECURSION_LIMIT - 1) // 2 "
+                f"({(self.GRAPH_RECURSION_LIMIT - 1) // 2})"
+            )
+        return self
     
 settings = Settings()
\ No newline at end of file
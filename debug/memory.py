@@ -0,0 +1,173 @@
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROC = Path("/proc")
+
+
+def _status(pid: int | str) -> dict[str, int]:
+    """
+    Memory lines of /proc/<pid>/status in bytes, e.g. VmRSS and VmHWM.
+    """
+    values = {}
+    try:
+        with open(PROC / str(pid) / "status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.startswith("Vm") and value.strip().endswith("kB"):
+                    values[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+def _cmdline(pid: int) -> list[str]:
+    try:
+        with open(PROC / str(pid) / "cmdline", "rb") as f:
+            return [part.decode(errors="replace") for part in f.read().split(b"\0") if part]
+    except OSError:
+        return []
+
+
+def _children(pid: int) -> list[int]:
+    """
+    Direct children of a process, whichever of its threads spawned them.
+    """
+    children = []
+    try:
+        for task in (PROC / str(pid) / "task").iterdir():
+            try:
+                children.extend(int(child) for child in (task / "children").read_text().split())
+            except OSError:
+                pass
+    except OSError:
+        pass
+    return children
+
+
+def _subtree(pid: int) -> list[int]:
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        pending.extend(_children(current))
+    return pids
+
+
+def _matches(cmdline: list[str], connection: dict[str, Any]) -> bool:
+    """
+    Whether a process runs the stdio server `connection`, also when started through an interpreter (node, python).
+    """
+    command = connection.get("command")
+    args = list(connection.get("args") or [])
+    if not command or len(cmdline) <= len(args):
+        return False
+    if args and cmdline[-len(args):] != args:
+        return False
+    head = cmdline[:len(cmdline) - len(args)] if args else cmdline
+    return os.path.basename(command) in {os.path.basename(part) for part in head}
+
+
+def _location(traceback: tracemalloc.Traceback) -> str:
+    return " <- ".join(str(frame) for frame in traceback)
+
+
+def process_memory() -> dict[str, int]:
+    status = _status("self")
+    return {"rss_bytes": status.get("VmRSS", 0), "peak_rss_bytes": status.get("VmHWM", 0)}
+
+
+def mcp_process_memory(servers: dict[str, list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    """
+    RSS of every subprocess of this process (and of its own children), attributed to the MCP server it runs.
+
+    `servers` maps "tenant/server" to the commands the server may have been launched with.
+    Processes no server matches are reported with a null server.
+    """
+    if not PROC.exists():
+        return []
+    processes = []
+    for child in _children(os.getpid()):
+        cmdline = _cmdline(child)
+        pids = _subtree(child)
+        server = next(
+            (name for name, connections in servers.items() if any(_matches(cmdline, connection) for connection in connections)),
+            None,
+        )
+        processes.append({
+            "server": server,
+            "pid": child,
+            "command": " ".join(cmdline)[:200],
+            "processes": len(pids),
+            "rss_bytes": sum(_status(pid).get("VmRSS", 0) for pid in pids),
+        })
+    return sorted(processes, key=lambda process: process["rss_bytes"], reverse=True)
+
+
+class HeapSnapshots:
+    """
+    On-demand tracemalloc snapshots, each compared to the previous one.
+
+    Tracing starts with the first snapshot (it slows allocations down, so it is
+    off until asked for) and runs until stop() is called.
+    """
+
+    def __init__(self):
+        self.previous: tracemalloc.Snapshot | None = None
+        self.taken_at: float | None = None
+
+    def take(self, top: int = 20, group_by: str = "lineno", frames: int = 1) -> dict[str, Any]:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+            self.previous = None
+            logger.info(f"Started tracemalloc with {frames} frames per allocation")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        now = time.time()
+        result: dict[str, Any] = {
+            "tracing_started": started,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "since_previous_seconds": round(now - self.taken_at, 3) if self.previous is not None else None,
+        }
+        if self.previous is None:
+            result["top"] = [
+                {"location": _location(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics(group_by)[:top]
+            ]
+        else:
+            result["top_growth"] = [
+                {
+                    "location": _location(stat.traceback),
+                    "size_bytes": stat.size,
+                    "size_diff_bytes": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in snapshot.compare_to(self.previous, group_by)[:top]
+            ]
+        self.previous = snapshot
+        self.taken_at = now
+        return result
+
+    def stop(self) -> bool:
+        tracing = tracemalloc.is_tracing()
+        tracemalloc.stop()
+        self.previous = None
+        self.taken_at = None
+        return tracing
+
+
+heap_snapshots = HeapSnapshots()
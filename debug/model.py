@@ -0,0 +1,39 @@
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+class RecordedRun(BaseModel):
+    run_id: str
+    thread_id: str | None = None
+    tenant_id: str | None = None
+    model: str | None = None
+    started_at: float = Field(
+        description="Start of the run, epoch seconds.",
+    )
+    duration: float = Field(
+        description="Wall clock duration of the run in seconds.",
+    )
+    outcome: str = Field(
+        description="completed, stopped, cancelled, timeout or failed.",
+    )
+    stop_reason: str | None = Field(
+        default=None,
+        description="Guard that ended the run early, if any.",
+    )
+    model_calls: int = 0
+    tool_calls: int = 0
+    tool_errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    tool_output_bytes: int = 0
+    has_detail: bool = Field(
+        default=False,
+        description="Whether the step timeline was kept, only for runs slower than RUN_RECORDER_DETAIL_THRESHOLD_SECONDS.",
+    )
+
+class RecordedRunDetail(RecordedRun):
+    detail: list[dict[str, Any]] | None = Field(
+        default=None,
+        description="Model steps and tool calls of the run, with their start offset and duration in seconds.",
+    )
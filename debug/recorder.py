@@ -0,0 +1,287 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from config import settings
+from tools.tenants import current_tenant
+from utilities.deadline import remaining
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    tenant_id TEXT,
+    model TEXT,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    stop_reason TEXT,
+    model_calls INTEGER NOT NULL,
+    tool_calls INTEGER NOT NULL,
+    tool_errors INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    tool_output_bytes INTEGER NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+"""
+
+COLUMNS = (
+    "run_id", "thread_id", "tenant_id", "model", "started_at", "duration", "outcome", "stop_reason",
+    "model_calls", "tool_calls", "tool_errors", "input_tokens", "output_tokens", "total_tokens",
+    "tool_output_bytes", "detail",
+)
+
+ORDER_COLUMNS = {"duration": "duration", "tokens": "total_tokens", "started_at": "started_at", "tool_calls": "tool_calls"}
+
+
+def _size(value: Any) -> int:
+    content = getattr(value, "content", value)
+    return len(content if isinstance(content, (str, bytes)) else json.dumps(content, default=str))
+
+
+class RunRecording(AsyncCallbackHandler):
+    """
+    Collects the model steps and tool calls of one agent run from its callbacks.
+    """
+
+    def __init__(self, run_id: str, thread_id: str | None, tenant_id: str | None, model: str | None):
+        self.run_id = run_id
+        self.thread_id = thread_id
+        self.tenant_id = tenant_id
+        self.model = model
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.steps: list[dict[str, Any]] = []
+        self.outcome: str | None = None
+        self.stop_reason: str | None = None
+        self._open: dict[UUID, dict[str, Any]] = {}
+
+    def _offset(self) -> float:
+        return round(time.monotonic() - self._started, 4)
+
+    def _begin(self, callback_run_id: UUID, step: dict[str, Any]):
+        step["start"] = self._offset()
+        self._open[callback_run_id] = step
+        self.steps.append(step)
+
+    def _end(self, callback_run_id: UUID) -> dict[str, Any] | None:
+        step = self._open.pop(callback_run_id, None)
+        if step is not None:
+            step["duration"] = round(self._offset() - step["start"], 4)
+        return step
+
+    async def on_chat_model_start(self, serialized: dict[str, Any], messages: list, *, run_id: UUID, **kwargs: Any):
+        self._begin(run_id, {"type": "model", "messages": sum(len(batch) for batch in messages)})
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        step = self._end(run_id)
+        if step is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                if not isinstance(generation, ChatGeneration):
+                    continue
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                for key in ("input_tokens", "output_tokens", "total_tokens"):
+                    step[key] = step.get(key, 0) + usage.get(key, 0)
+                step["tool_calls"] = [call["name"] for call in getattr(generation.message, "tool_calls", [])]
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        step = self._end(run_id)
+        if step is not None:
+            step["error"] = type(error).__name__
+
+    async def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._begin(run_id, {"type": "tool", "name": serialized.get("name"), "input_bytes": len(input_str or "")})
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        step = self._end(run_id)
+        if step is not None:
+            step["output_bytes"] = _size(output)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        step = self._end(run_id)
+        if step is not None:
+            step["error"] = type(error).__name__
+
+    def row(self, keep_detail: bool) -> dict[str, Any]:
+        models = [step for step in self.steps if step["type"] == "model"]
+        tools = [step for step in self.steps if step["type"] == "tool"]
+        return {
+            "run_id": self.run_id,
+            "thread_id": self.thread_id,
+            "tenant_id": self.tenant_id,
+            "model": self.model,
+            "started_at": self.started_at,
+            "duration": round(time.monotonic() - self._started, 4),
+            "outcome": self.outcome or "completed",
+            "stop_reason": self.stop_reason,
+            "model_calls": len(models),
+            "tool_calls": len(tools),
+            "tool_errors": sum(1 for step in tools if "error" in step),
+            "input_tokens": sum(step.get("input_tokens", 0) for step in models),
+            "output_tokens": sum(step.get("output_tokens", 0) for step in models),
+            "total_tokens": sum(step.get("total_tokens", 0) for step in models),
+            "tool_output_bytes": sum(step.get("output_bytes", 0) for step in tools),
+            "detail": json.dumps(self.steps) if keep_detail else None,
+        }
+
+
+class FlightRecorder:
+    """
+    Local SQLite store of every agent run.
+
+    A summary row (ids, model, outcome, duration, token usage, tool call counts
+    and sizes) is kept for every run, the per-step timeline only for runs
+    slower than `detail_threshold` seconds. Runs older than `retention_seconds`
+    and beyond the newest `max_runs` are pruned. Writes happen in a worker
+    thread, off the event loop.
+    """
+
+    def __init__(self, path: str, retention_seconds: float, max_runs: int, detail_threshold: float):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.max_runs = max_runs
+        self.detail_threshold = detail_threshold
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._pending: set[asyncio.Task] = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    @asynccontextmanager
+    async def run(self, config: dict[str, Any], model: str | None = None):
+        """
+        Record the run using `config` (from build_runnable_config), yielding the callback handler to attach.
+
+        The outcome is taken from `recording.outcome` when set, otherwise from how the block exits.
+        """
+        recording = RunRecording(
+            run_id=str(config.get("run_id")),
+            thread_id=(config.get("configurable") or {}).get("thread_id"),
+            tenant_id=current_tenant.get(),
+            model=model,
+        )
+        try:
+            yield recording
+        except asyncio.CancelledError:
+            # The request deadline cancels the run before it surfaces as a TimeoutError.
+            recording.outcome = recording.outcome or ("timeout" if remaining() == 0 else "cancelled")
+            raise
+        except TimeoutError:
+            recording.outcome = recording.outcome or "timeout"
+            raise
+        except Exception:
+            recording.outcome = recording.outcome or "failed"
+            raise
+        finally:
+            if settings.RUN_RECORDER_ENABLED:
+                self._save(recording)
+
+    def _save(self, recording: RunRecording):
+        row = recording.row(keep_detail=time.monotonic() - recording._started >= self.detail_threshold)
+        task = asyncio.create_task(asyncio.to_thread(self._insert, row))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _insert(self, row: dict[str, Any]):
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        f"INSERT OR REPLACE INTO runs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                        [row[column] for column in COLUMNS],
+                    )
+                self._writes += 1
+                if self._writes % 100 == 1:
+                    self._prune(connection)
+            metrics.increment("flight_recorder_runs_total", labels={"detail": row["detail"] is not None})
+        except sqlite3.Error as err:
+            logger.error(f"Unable to record run {row['run_id']}: {err}")
+
+    def _prune(self, connection: sqlite3.Connection):
+        with connection:
+            connection.execute("DELETE FROM runs WHERE started_at < ?", (time.time() - self.retention_seconds,))
+            connection.execute(
+                "DELETE FROM runs WHERE run_id NOT IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?)",
+                (self.max_runs,),
+            )
+
+    def query(
+        self,
+        since: float,
+        order_by: str = "duration",
+        limit: int = 20,
+        outcome: str | None = None,
+        model: str | None = None,
+        thread_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Runs started after `since` (epoch seconds), largest `order_by` first, without their detail.
+        """
+        column = ORDER_COLUMNS[order_by]
+        clauses, params = ["started_at >= ?"], [since]
+        for name, value in (("outcome", outcome), ("model", model), ("thread_id", thread_id)):
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        summary_columns = [name for name in COLUMNS if name != "detail"]
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(summary_columns)}, detail IS NOT NULL AS has_detail FROM runs "
+                f"WHERE {' AND '.join(clauses)} ORDER BY {column} DESC LIMIT ?",
+                [*params, limit],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, run_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["has_detail"] = run["detail"] is not None
+        run["detail"] = json.loads(run["detail"]) if run["detail"] else None
+        return run
+
+    async def close(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+flight_recorder = FlightRecorder(
+    path=settings.RUN_RECORDER_PATH,
+    retention_seconds=settings.RUN_RECORDER_RETENTION_SECONDS,
+    max_runs=settings.RUN_RECORDER_MAX_RUNS,
+    detail_threshold=settings.RUN_RECORDER_DETAIL_THRESHOLD_SECONDS,
+)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from debug.service import get_memory, get_recorded_run, list_recorded_runs, stop_heap_snapshots, take_heap_snapshot
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[],
+    responses={404: {"description": "Not found"}},
+)
+
+router.get("/runs")(list_recorded_runs)
+router.get("/runs/{run_id}")(get_recorded_run)
+router.get("/memory")(get_memory)
+router.post("/memory/snapshots")(take_heap_snapshot)
+router.delete("/memory/snapshots")(stop_heap_snapshots)
@@ -0,0 +1,132 @@
+import asyncio
+import time
+import tracemalloc
+from typing import Literal
+
+from fastapi import HTTPException, Query
+
+from debug.memory import heap_snapshots, mcp_process_memory, process_memory
+from debug.model import RecordedRun, RecordedRunDetail
+from debug.recorder import flight_recorder
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+async def list_recorded_runs(
+    window: float = Query(default=3600, gt=0, description="Only runs started in the last `window` seconds."),
+    order_by: Literal["duration", "tokens", "tool_calls", "started_at"] = Query(default="duration", description="Slowest, most expensive, busiest or latest runs first."),
+    limit: int = Query(default=20, ge=1, le=500),
+    outcome: str | None = Query(default=None, description="Only runs with this outcome."),
+    model: str | None = Query(default=None, description="Only runs of this model."),
+    thread_id: str | None = Query(default=None, description="Only runs of this thread."),
+) -> list[RecordedRun]:
+    try:
+        rows = await asyncio.to_thread(
+            flight_recorder.query,
+            since=time.time() - window,
+            order_by=order_by,
+            limit=limit,
+            outcome=outcome,
+            model=model,
+            thread_id=thread_id,
+        )
+        return [RecordedRun(**row) for row in rows]
+    except Exception as e:
+        logger.error(f"Error while querying recorded runs: {e}")
+        raise e
+
+async def get_recorded_run(run_id: str) -> RecordedRunDetail:
+    try:
+        row = await asyncio.to_thread(flight_recorder.get, run_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Run not recorded or already pruned")
+        return RecordedRunDetail(**row)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error while reading recorded run: {e}")
+        raise e
+
+def _checkpointer_memory(top: int) -> dict:
+    from agents.checkpoint import thread_sizes
+    from agents.service import get_checkpointer
+
+    checkpointer = get_checkpointer()
+    sizes = thread_sizes(checkpointer)
+    serde_stats = checkpointer.serde.stats() if hasattr(checkpointer.serde, "stats") else {}
+    threads = sorted(sizes.items(), key=lambda item: item[1]["bytes"] + item[1]["message_bytes"], reverse=True)
+    return {
+        "threads": len(sizes),
+        "checkpoint_bytes": sum(size["bytes"] for size in sizes.values()),
+        # Deduplicated messages, stored once however many threads and checkpoints reference them.
+        "message_blobs": serde_stats.get("blobs", 0),
+        "message_blob_bytes": serde_stats.get("bytes", 0),
+        "top_threads": [{"thread_id": thread_id, **size} for thread_id, size in threads[:top]],
+    }
+
+def _cache_memory() -> dict:
+    from agents.service import agent_cache_stats
+    from tools.service import tool_loads
+    from tools.tenants import tenants
+    from utilities.model import get_model
+
+    return {
+        "models": get_model.cache_info()._asdict(),
+        "agents": agent_cache_stats(),
+        "tool_loads": tool_loads.stats(),
+        "tools": {tenant_id: tenant.pool.cache_stats() for tenant_id, tenant in tenants.tenants.items()},
+    }
+
+def _mcp_servers() -> dict[str, list[dict]]:
+    from tools.tenants import tenants
+
+    servers = {}
+    for tenant_id, tenant in tenants.tenants.items():
+        for name, server in tenant.pool.servers.items():
+            connection = server.connection
+            launch = connection.get("launch")
+            # Spawned from the pinned package when it is still valid, from the configured command otherwise.
+            servers[f"{tenant_id}/{name}"] = [connection, launch] if launch else [connection]
+    return servers
+
+async def get_memory(
+    top: int = Query(default=20, ge=1, le=500, description="Number of threads to list, largest first."),
+):
+    """
+    Memory of this worker by owner: checkpointed threads, in-process caches and the MCP subprocesses.
+    """
+    try:
+        memory = {
+            "process": process_memory(),
+            "checkpointer": _checkpointer_memory(top),
+            "caches": _cache_memory(),
+            "tracemalloc": {"tracing": tracemalloc.is_tracing()},
+        }
+        memory["mcp_processes"] = await asyncio.to_thread(mcp_process_memory, _mcp_servers())
+        memory["mcp_processes_rss_bytes"] = sum(process["rss_bytes"] for process in memory["mcp_processes"])
+        return memory
+    except Exception as e:
+        logger.error(f"Error while reporting memory: {e}")
+        raise e
+
+async def take_heap_snapshot(
+    top: int = Query(default=20, ge=1, le=500, description="Number of allocation sites to list."),
+    group_by: Literal["lineno", "filename", "traceback"] = Query(default="lineno"),
+    frames: int = Query(default=1, ge=1, le=50, description="Frames kept per allocation, when this call starts tracing."),
+):
+    """
+    Take a tracemalloc snapshot and list the allocation sites that grew the most since the previous one.
+
+    The first call starts tracing, which slows the worker down until DELETE /debug/memory/snapshots.
+    """
+    try:
+        return await asyncio.to_thread(heap_snapshots.take, top, group_by, frames)
+    except Exception as e:
+        logger.error(f"Error while taking a heap snapshot: {e}")
+        raise e
+
+async def stop_heap_snapshots():
+    """
+    Stop tracemalloc and drop the previous snapshot.
+    """
+    return {"stopped": heap_snapshots.stop()}
@@ -1,12 +1,23 @@
-
-import uvicorn
+import asyncio
 from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from utilities.logger import get_logger
 from config import settings
+from agents.service import prune_checkpoints_periodically
+from chat.mailbox import mailboxes
 from chat.route import router as ChatRouter
+from debug.recorder import flight_recorder
+from debug.route import router as DebugRouter
+from tools.launcher import launch_cache
+from tools.registry import mcp_registry
 from tools.route import router as ToolsRouter
+from threads.route import router as ThreadsRouter
+from utilities.metrics import metrics
+from utilities.model import governor_stats
+from utilities.warmup import warmup, warmup_state
+from tools.tenants import tenants, tool_scheduler
 from dotenv import load_dotenv
 
 logger = get_logger(__name__)
@@ -15,8 +26,31 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Server has started successfully!")
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        # Runs in the background so /healthz answers while /readyz holds traffic back.
+        warmup_task = asyncio.create_task(warmup())
+    else:
+        warmup_state.status = "ready"
+    # Creating the default tenant starts watching its MCP config.
+    tenants.get(settings.DEFAULT_TENANT_ID)
+    prune_task = None
+    if settings.CHECKPOINT_KEEP_PER_THREAD > 0:
+        prune_task = asyncio.create_task(prune_checkpoints_periodically())
+    try:
+        await asyncio.to_thread(mcp_registry.refresh)
+    except Exception as err:
+        logger.error(f"Unable to import the MCP registry dump: {err}")
     yield
     logger.info("🛑 Server is shutting down...")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if prune_task is not None:
+        prune_task.cancel()
+    await mailboxes.close()
+    await tenants.close()
+    await flight_recorder.close()
+    mcp_registry.close()
 
 app = FastAPI(
     title=settings.TITLE,
@@ -50,12 +84,40 @@ def read_root():
         "openapi": settings.OPENAPI_URL
     }
 
+@app.get("/healthz", tags=["Root"])
+def liveness():
+    """Liveness probe, the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Root"])
+def readiness():
+    """Readiness probe, fails until the startup warm-up has completed."""
+    return JSONResponse(
+        status_code=200 if warmup_state.ready else 503,
+        content=warmup_state.report()
+    )
+
+@app.get("/metrics", tags=["Root"])
+def read_metrics():
+    """In-process metrics, including LLM governor and tool scheduler queue state."""
+    return {
+        **metrics.snapshot(),
+        "llm_governors": governor_stats(),
+        "tool_scheduler": tool_scheduler.stats(),
+        "thread_mailboxes": mailboxes.stats(),
+        "mcp_launch_cache": launch_cache.stats(),
+        "tenants": tenants.stats()
+    }
 
 router = APIRouter(prefix="/v1")
 router.include_router(ChatRouter)
 router.include_router(ToolsRouter)
+router.include_router(ThreadsRouter)
+router.include_router(DebugRouter)
 
 app.include_router(router)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, reload=settings.DEVELOPMENT)
\ No newline at end of file
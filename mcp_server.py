@@ -1,86 +1,110 @@
+import argparse
+import asyncio
 import json
-from mcp.server.fastmcp import FastMCP
-from pydantic import BaseModel, Field
+from typing import Awaitable
 
-from tools.model import ManageMCPConfig
-from tools.service import list_mcp_servers, manage_mcp_config
+from mcp.server.fastmcp import Context, FastMCP
 
+from config import settings
+from tools import management
+from tools.model import DeleteMCP, DeployMCP, SearchMCPRegistry
+from tools.progress import progress_reporter
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
 mcp = FastMCP("MCP-Manager")
 
-class DeployMCP(BaseModel):
-    server_name: str = Field(
-        description="Name of the server",
-        examples=["travily-mcp", "web-search"]
-    )
-    server_config: dict = Field(
-        # description="The server configuration json of type {{ command: npx, args: [] }}",
-        examples=[{ "command": "npx", "args": ["mcp-remote", "https://remote.mcp.server/sse"] }]
-    )
-    
-class DeleteMCP(BaseModel):
-    server_name: str = Field(
-        description="Name of the server",
-        examples=["travily-mcp", "web-search"]
-    )
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
 
-@mcp.tool(name="deploy-mcp", title="Deploy MCP", description="send the mcp server configuration")
-async def deploy_mcp(payload: DeployMCP):
+# Bounds the tool calls running at once across every connected client.
+_slots = asyncio.Semaphore(settings.MCP_MANAGER_MAX_CONCURRENCY)
+_request_timeout = settings.MCP_MANAGER_REQUEST_TIMEOUT_SECONDS
+
+# The backend serves these tools in process (see tools/management.py), this
+# server exposes the same implementations to external MCP clients. Config
+# mutations are serialized by manage_mcp_config itself.
+
+async def _bounded(name: str, call: Awaitable[str]) -> str:
     try:
-        if payload.server_name and payload.server_config:
-            mcp_server = {}
-            mcp_server[payload.server_name] = payload.server_config
-            await manage_mcp_config(ManageMCPConfig(
-                mcpServers=mcp_server,
-                mode="update"
-            ))
-            return json.dumps({
-                "success": True
-            })
-    except Exception as e:
+        # The time waiting for a slot counts against the timeout too.
+        async with asyncio.timeout(_request_timeout or None):
+            async with _slots:
+                return await call
+    except TimeoutError:
+        logger.error(f"{name} timed out after {_request_timeout}s")
         return json.dumps({
             "error": True,
-            "message": f"Error while deploying mcp : {e}"
+            "message": f"{name} timed out after {_request_timeout}s"
         })
-        
+
+@mcp.tool(name="deploy-mcp", title="Deploy MCP", description="send the mcp server configuration")
+async def deploy_mcp(payload: DeployMCP, ctx: Context):
+    # The validation stages are reported to clients that sent a progress token.
+    token = progress_reporter.set(ctx.report_progress)
+    try:
+        return await _bounded("deploy-mcp", management.deploy_mcp(payload.server_name, payload.server_config))
+    finally:
+        progress_reporter.reset(token)
+
 @mcp.tool(name="delete-mcp", title="Delete MCP", description="send the mcp server name")
 async def delete_mcp(payload: DeleteMCP):
-    try:
-        NOT_ALLOWED = ["deploy-mcp"]
-        if payload.server_name and payload.server_name not in NOT_ALLOWED:
-            mcp_server = {}
-            mcp_server[payload.server_name] = {}
-            await manage_mcp_config(ManageMCPConfig(
-                mcpServers=mcp_server,
-                mode="delete"
-            ))
-            return json.dumps({
-                "success": True
-            })
-        else:
-            return json.dumps({
-                "error": True,
-                "message": "Invalid server name"
-            })
-    except Exception as e:
-        return json.dumps({
-            "error": True,
-            "message": f"Error while deleting mcp : {e}"
-        })
-        
-@mcp.tool(name="list-mcp", title="List MCP", description="List all the avilable mcp servers")
+    return await _bounded("delete-mcp", management.delete_mcp(payload.server_name))
+
+@mcp.tool(name="list-mcp", title="List MCP", description="List all the avilable mcp servers and their tools")
 async def list_mcp():
-    try:
-        servers = list_mcp_servers()
-        print("servers : ", servers)
-        return json.dumps({
-            "success": True,
-            "servers": servers
-        })
-    except Exception as e:
-        return json.dumps({
-            "error": True,
-            "message": f"Error while listing mcp : {e}"
-        })
-        
+    # stdout carries the stdio transport, never print() here
+    return await _bounded("list-mcp", management.list_mcp())
+
+@mcp.tool(name="search-mcp-registry", title="Search MCP registry", description=management.SEARCH_REGISTRY_DESCRIPTION)
+async def search_mcp_registry(payload: SearchMCPRegistry):
+    return await _bounded("search-mcp-registry", management.search_mcp_registry(payload.query, payload.limit))
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="MCP-Manager server (deploy-mcp, delete-mcp, list-mcp, search-mcp-registry).")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default=settings.MCP_MANAGER_TRANSPORT)
+    parser.add_argument("--host", default=settings.MCP_MANAGER_HOST)
+    parser.add_argument("--port", type=int, default=settings.MCP_MANAGER_PORT)
+    parser.add_argument("--uds", default=settings.MCP_MANAGER_UDS or None, help="Listen on this unix socket instead of host/port.")
+    parser.add_argument("--max-concurrency", type=int, default=settings.MCP_MANAGER_MAX_CONCURRENCY, help="Tool calls running at once.")
+    parser.add_argument("--allow-remote", action="store_true", default=settings.MCP_MANAGER_ALLOW_REMOTE, help="Allow binding a non-loopback host. The server has no authentication.")
+    parser.add_argument("--request-timeout", type=float, default=settings.MCP_MANAGER_REQUEST_TIMEOUT_SECONDS, help="Seconds before a tool call is abandoned, 0 to disable.")
+    return parser.parse_args()
+
+def main():
+    global _slots, _request_timeout
+
+    args = parse_args()
+    _slots = asyncio.Semaphore(max(args.max_concurrency, 1))
+    _request_timeout = args.request_timeout
+
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+        return
+
+    import uvicorn
+
+    remote = not args.uds and args.host not in LOOPBACK_HOSTS
+    if remote and not args.allow_remote:
+        # deploy-mcp starts arbitrary commands, nothing but the loopback interface may reach it by default.
+        raise SystemExit(f"Refusing to serve MCP-Manager on {args.host} without --allow-remote (MCP_MANAGER_ALLOW_REMOTE)")
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    if args.uds or remote:
+        # DNS rebinding protection is set up for loopback TCP only, it would reject every other Host header.
+        mcp.settings.transport_security = None
+    if remote:
+        logger.warning(f"MCP-Manager is reachable on {args.host} without authentication, restrict access to it")
+
+    app = mcp.sse_app() if args.transport == "sse" else mcp.streamable_http_app()
+    logger.info(f"Serving MCP-Manager over {args.transport} on {args.uds or f'{args.host}:{args.port}'}")
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        uds=args.uds,
+        log_level=settings.LOG_LEVEL.lower(),
+    )
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    main()
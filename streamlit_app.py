@@ -1,10 +1,84 @@
+import json
+import time
 import streamlit as st
 import requests
 import uuid
 
+API_URL = "http://127.0.0.1:8000/v1/chat_service"
+# (connect, read) timeouts. The server sends keep-alive comments while a run is busy,
+# so the read timeout only trips on a dead connection.
+REQUEST_TIMEOUT = (5, 60)
+MAX_RECONNECTS = 5
+
 # Set the page configuration
 st.set_page_config(page_title="Lumif-ai", layout="wide")
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Pooled HTTP session shared across reruns of the script."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def read_sse(response: requests.Response):
+    """Yield (event_id, data) pairs from a server-sent event stream."""
+    event_id, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event_id, "\n".join(data)
+            event_id, data = None, []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("id:"):
+            event_id = int(line[3:].strip())
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+def stream_chat(payload: dict):
+    """
+    Submit the query once to /ainvoke/ and yield its events as they arrive.
+
+    Dropped connections are resumed through /ainvoke/{run_id}/ with Last-Event-ID,
+    so the query is never re-submitted.
+    """
+    session = get_http_session()
+    run_id, last_event_id, reconnects = None, -1, 0
+
+    while True:
+        try:
+            if run_id is None:
+                response = session.post(f"{API_URL}/ainvoke/", json=payload, stream=True, timeout=REQUEST_TIMEOUT)
+                run_id = response.headers.get("X-Run-Id")
+            else:
+                response = session.get(
+                    f"{API_URL}/ainvoke/{run_id}/",
+                    headers={"Last-Event-ID": str(last_event_id)},
+                    stream=True,
+                    timeout=REQUEST_TIMEOUT
+                )
+            response.raise_for_status()
+
+            with response:
+                for event_id, data in read_sse(response):
+                    if event_id is not None:
+                        last_event_id = event_id
+                    if data == "[DONE]":
+                        return
+                    yield json.loads(data)
+            return
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.ReadTimeout):
+            # Without a run id the submission itself failed and there is nothing to resume.
+            if run_id is None or reconnects >= MAX_RECONNECTS:
+                raise
+            reconnects += 1
+            time.sleep(min(2 ** reconnects, 10))
+
 # Use st.session_state for persistent variables
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -41,15 +115,18 @@ Search for and deploy an MCP server based on the user's request.
 </task>
 
 <instructions>
-1. Begin by using the `scrape_as_markdown` tool to search for MCP servers.
-2. Construct the URL for the search query by replacing `<searchable_query>` with the user's input.
-3. If the user specifies a particular server, use the `scrape_as_markdown` tool again with the specific server's page link to get its configuration.
+1. Begin by using the `search-mcp-registry` tool to find MCP servers matching the user's request, it returns their configuration.
+2. Only if the registry has no suitable server, use the `scrape_as_markdown` tool to search for MCP servers, constructing the URL by replacing `<searchable_query>` with the user's input.
+3. If the user specifies a particular server missing from the registry, use the `scrape_as_markdown` tool again with the specific server's page link to get its configuration.
 4. If the server configuration includes environmental variables, prompt the user for their values before deployment.
 5. After obtaining a valid configuration and any necessary environment variables, deploy the server using the `deploy-mcp` tool.
 6. Once the server has been deployed, you can start using that tool to serve the user's request.
 </instructions>
 
 <tools>
+<tool name="search-mcp-registry">
+    <description>Searches the local registry of known MCP servers and returns their configuration and required environment variables.</description>
+</tool>
 <tool name="scrape_as_markdown">
     <description>Searches and scrapes web content from a given URL and returns it in Markdown format.</description>
     <url>https://glama.ai/mcp/servers?query=<searchable_query>&sort=search-relevance%3Adesc&attributes=hosting%3Aremote-capable</url>
@@ -100,31 +177,48 @@ if user_query := st.chat_input("What is your message?"):
         "temperature": temperature,
         "prompt": system_instructions,
         "query": user_query,
+        "stream": True,
     }
 
-    try:
-        # Make the API call
-        response = requests.post(
-            "http://127.0.0.1:8000/v1/chat_service/invoke/",
-            json=payload,
-            timeout=30  # Add a timeout for the request
-        )
-        
-        # Check for successful response
-        response.raise_for_status()
-
-        # Get the AI's response from the JSON
-        print("Response : ", response.json())
-        ai_response = response.json().get("reply")
-        
-        # Display the AI's response
-        with st.chat_message("assistant"):
-            st.write(ai_response)
-        
-        # Add assistant's message to chat history
-        st.session_state.messages.append({"role": "assistant", "content": ai_response})
-
-    except requests.exceptions.RequestException as e:
-        error_message = f"An error occurred: {e}"
-        st.error(error_message)
-        st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I was unable to connect to the server. Details: {e}"})
+    with st.chat_message("assistant"):
+        tool_status = st.empty()
+        placeholder = st.empty()
+        ai_response = ""
+
+        try:
+            for event in stream_chat(payload):
+                if event["type"] == "token":
+                    ai_response += event["content"]
+                    placeholder.markdown(ai_response + "▌")
+                elif event["type"] == "tool":
+                    tool = event["content"]
+                    if tool["status"] == "start":
+                        tool_status.info(f"Running `{tool['name']}`...")
+                    else:
+                        elapsed = f" in {tool['elapsed']}s" if tool.get("elapsed") else ""
+                        tool_status.info(f"`{tool['name']}` finished{elapsed}")
+                elif event["type"] == "tool_progress":
+                    tool = event["content"]
+                    if tool["status"] in ("progress", "heartbeat", "log"):
+                        done = f" {tool['progress']:.0%}" if tool.get("progress") is not None else ""
+                        detail = f": {tool['message']}" if tool.get("message") else ""
+                        tool_status.info(f"Running `{tool['name']}`{done} ({tool['elapsed']:.0f}s){detail}")
+                elif event["type"] == "message" and event["content"]["type"] == "ai":
+                    content = event["content"]["content"]
+                    if content:
+                        # Final text of the turn, replaces any partially streamed tokens.
+                        ai_response = content
+                        placeholder.markdown(ai_response)
+                elif event["type"] == "error":
+                    st.error(event["content"])
+
+            tool_status.empty()
+            placeholder.markdown(ai_response)
+
+            # Add assistant's message to chat history
+            st.session_state.messages.append({"role": "assistant", "content": ai_response})
+
+        except requests.exceptions.RequestException as e:
+            error_message = f"An error occurred: {e}"
+            st.error(error_message)
+            st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I was unable to connect to the server. Details: {e}"})
@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+import pytest
+
+from config import settings
+from tools import artifacts
+from tools.artifacts import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "ARTIFACT_INDEX_STRIDE", 4)
+    return ArtifactStore(str(tmp_path), max_bytes=1000)
+
+
+@pytest.mark.parametrize("content", ["0123456789abcdef", "zażółć gęślą jaźń ✓✓"])
+def test_pages_match_the_content(store, content):
+    artifact_id = store.put(content)
+    for offset in range(len(content) + 2):
+        for length in (1, 3, 4, 5, 100):
+            assert store.read(artifact_id, offset, length) == (content[offset:offset + length], len(content))
+    assert store.read(artifact_id) == (content, len(content))
+
+
+def test_unknown_artifact(store):
+    with pytest.raises(KeyError):
+        store.read("0" * 64)
+    with pytest.raises(ValueError):
+        store.read("../secret")
+
+
+def test_size_is_kept_without_rescanning(store):
+    store.put("a" * 100)
+    store.put("a" * 100)
+    store.put("b" * 200)
+    assert store.size() == (2, 300)
+
+
+def test_least_recently_written_artifacts_are_evicted(store):
+    first = store.put("a" * 400)
+    second = store.put("b" * 400)
+    os.utime(store._path(first), (1, 1))
+    store.put("c" * 400)
+    assert store.size() == (2, 800)
+    with pytest.raises(KeyError):
+        store.read(first)
+    assert store.read(second, 0, 1) == ("b", 400)
+
+
+def test_large_output_is_offloaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "artifact_store", ArtifactStore(str(tmp_path), max_bytes=10_000_000))
+    text = "x" * (settings.ARTIFACT_THRESHOLD_CHARS + 1)
+
+    preview = asyncio.run(artifacts.offload_large_output(text))
+
+    assert preview.startswith("x" * settings.ARTIFACT_PREVIEW_CHARS + "\n...\n")
+    assert asyncio.run(artifacts.offload_large_output("short")) == "short"
@@ -0,0 +1,75 @@
+import ormsgpack
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import START, MessagesState, StateGraph
+
+from agents.checkpoint import (
+    DedupInMemorySaver,
+    DedupSerializer,
+    _channel_versions,
+    msgpack_list_slice,
+    msgpack_map_value,
+    prune_checkpoints,
+)
+
+
+def test_msgpack_map_value():
+    payload = ormsgpack.packb({"v": 4, "id": "x" * 40, "channel_versions": {"messages": "0003.1"}, "tail": [1, 2]})
+
+    assert ormsgpack.unpackb(msgpack_map_value(payload, "channel_versions")) == {"messages": "0003.1"}
+    assert ormsgpack.unpackb(msgpack_map_value(payload, "tail")) == [1, 2]
+    assert msgpack_map_value(payload, "missing") is None
+    with pytest.raises(ValueError):
+        msgpack_map_value(ormsgpack.packb([1]), "v")
+
+
+def test_msgpack_map_value_of_a_large_map():
+    items = {f"key{index}": {"nested": [index] * index} for index in range(40)}
+
+    assert ormsgpack.unpackb(msgpack_map_value(ormsgpack.packb(items), "key33")) == {"nested": [33] * 33}
+
+
+def test_msgpack_list_slice():
+    items = [{"index": index, "text": "y" * index} for index in range(20)]
+
+    total, page = msgpack_list_slice(ormsgpack.packb(items), 5, 18)
+
+    assert total == 20
+    assert ormsgpack.unpackb(page) == items[5:18]
+
+
+@pytest.mark.parametrize("compress_min_bytes", [0, 1 << 20])
+def test_channel_versions_match_the_full_checkpoint(compress_min_bytes):
+    serde = DedupSerializer(compress_min_bytes=compress_min_bytes)
+    checkpoint = {"v": 4, "id": "1", "channel_versions": {"messages": "0002." + "1" * 200}, "versions_seen": {}}
+
+    assert _channel_versions(serde, serde.dumps_typed(checkpoint)) == checkpoint["channel_versions"]
+
+
+def _graph(saver):
+    def reply(state: MessagesState):
+        return {"messages": [AIMessage("answer " + "z" * 2000)]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    return builder.compile(checkpointer=saver)
+
+
+@pytest.mark.parametrize("saver_class", [InMemorySaver, DedupInMemorySaver])
+def test_prune_keeps_the_newest_checkpoints_and_their_values(saver_class):
+    saver = saver_class()
+    graph = _graph(saver)
+    for thread_id in ("a", "b"):
+        for turn in range(4):
+            graph.invoke({"messages": [HumanMessage(f"question {turn}")]}, {"configurable": {"thread_id": thread_id}})
+
+    pruned = prune_checkpoints(saver, keep=2)
+
+    assert pruned == 2 * (12 - 2)
+    assert all(len(checkpoints) == 2 for namespaces in saver.storage.values() for checkpoints in namespaces.values())
+    state = graph.get_state({"configurable": {"thread_id": "a"}})
+    assert len(state.values["messages"]) == 8
+    result = graph.invoke({"messages": [HumanMessage("again")]}, {"configurable": {"thread_id": "a"}})
+    assert len(result["messages"]) == 10
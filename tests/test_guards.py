@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Sequence
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+from pydantic import ValidationError
+
+from agents.guards import GuardTripped, RunGuard
+from agents.service import stop_run, with_callbacks
+from config import settings
+from config.settings import Settings
+
+
+class LoopingModel(GenericFakeChatModel):
+    """
+    Asks for a new tool call on every turn, the run only ends when it is stopped.
+    """
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self
+
+
+def _looping_model() -> LoopingModel:
+    def replies():
+        turn = 0
+        while True:
+            turn += 1
+            yield AIMessage("", tool_calls=[{"name": "lookup", "args": {"topic": f"topic {turn}"}, "id": f"call-{turn}"}])
+
+    return LoopingModel(messages=replies())
+
+
+@tool
+def lookup(topic: str) -> str:
+    """Look a topic up."""
+    return f"facts about {topic}"
+
+
+def test_step_budget_above_the_recursion_limit_is_rejected():
+    with pytest.raises(ValidationError, match="RUN_MAX_STEPS"):
+        Settings(GRAPH_RECURSION_LIMIT=40, RUN_MAX_STEPS=20)
+    assert Settings(GRAPH_RECURSION_LIMIT=40, RUN_MAX_STEPS=19).RUN_MAX_STEPS == 19
+
+
+def test_largest_step_budget_trips_before_the_agent_runs_out_of_steps():
+    max_steps = (settings.GRAPH_RECURSION_LIMIT - 1) // 2
+
+    async def scenario():
+        agent = create_react_agent(_looping_model(), [lookup], checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "loop"}, "recursion_limit": settings.GRAPH_RECURSION_LIMIT}
+        guard = RunGuard(max_steps=max_steps, max_repeated_tool_calls=max_steps)
+        with pytest.raises(GuardTripped) as tripped:
+            await agent.ainvoke({"messages": [HumanMessage("go")]}, with_callbacks(config, guard))
+        assert tripped.value.stop.reason == "step_budget"
+        assert guard.steps == max_steps
+
+        message, stop = await stop_run(agent, config, guard, tripped.value)
+        state = await agent.aget_state(config)
+        assert state.values["messages"][-1].content == message.content
+        assert not any("need more steps" in str(item.content) for item in state.values["messages"])
+
+    asyncio.run(scenario())
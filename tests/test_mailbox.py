@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from chat.mailbox import MailboxFull, MailboxRegistry
+from config import settings
+
+
+class Turns:
+    """
+    Records the items of every turn, each turn runs until `release` lets it end.
+    """
+
+    def __init__(self):
+        self.turns: list[list] = []
+        self.cancelled = 0
+        self.gate = asyncio.Semaphore(0)
+
+    def release(self, turns: int = 1):
+        for _ in range(turns):
+            self.gate.release()
+
+    async def __call__(self, items: list):
+        self.turns.append(items)
+        try:
+            await self.gate.acquire()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return "+".join(items)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_queued_messages_of_one_fold_key_share_the_next_turn():
+    async def scenario():
+        registry, run = MailboxRegistry(), Turns()
+        first = asyncio.create_task(registry.submit("thread", "a", "invoke", run))
+        await _settle()
+        queued = [asyncio.create_task(registry.submit("thread", item, "invoke", run)) for item in ("b", "c")]
+        other = asyncio.create_task(registry.submit("thread", "d", "stream", run))
+        await _settle()
+        assert registry.stats() == {"active_threads": 1, "queued_messages": 3}
+
+        run.release(3)
+        assert await first == "a"
+        assert await asyncio.gather(*queued) == ["b+c", "b+c"]
+        assert await other == "d"
+        assert run.turns == [["a"], ["b", "c"], ["d"]]
+        assert registry.stats() == {"active_threads": 0, "queued_messages": 0}
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_queued_message_is_dropped():
+    async def scenario():
+        registry, run = MailboxRegistry(), Turns()
+        first = asyncio.create_task(registry.submit("thread", "a", "invoke", run))
+        await _settle()
+        leaving = asyncio.create_task(registry.submit("thread", "b", "invoke", run))
+        staying = asyncio.create_task(registry.submit("thread", "c", "invoke", run))
+        await _settle()
+
+        leaving.cancel()
+        await asyncio.gather(leaving, return_exceptions=True)
+        run.release(2)
+        assert await first == "a"
+        assert await staying == "c"
+        assert run.turns == [["a"], ["c"]]
+
+    asyncio.run(scenario())
+
+
+def test_turn_is_cancelled_once_all_of_its_callers_are_gone():
+    async def scenario():
+        registry, run = MailboxRegistry(), Turns()
+        first = asyncio.create_task(registry.submit("thread", "a", "invoke", run))
+        await _settle()
+        batch = [asyncio.create_task(registry.submit("thread", item, "invoke", run)) for item in ("b", "c")]
+        await _settle()
+        # "a" ends, "b" and "c" are folded into the running turn.
+        run.release()
+        await first
+        await _settle()
+        assert run.turns == [["a"], ["b", "c"]]
+
+        batch[0].cancel()
+        await _settle()
+        assert run.cancelled == 0
+        batch[1].cancel()
+        await asyncio.gather(*batch, return_exceptions=True)
+        await _settle()
+        assert run.cancelled == 1
+        assert registry.stats() == {"active_threads": 0, "queued_messages": 0}
+
+    asyncio.run(scenario())
+
+
+def test_full_mailbox_rejects_new_messages(monkeypatch):
+    monkeypatch.setattr(settings, "THREAD_MAILBOX_MAX_PENDING", 1)
+
+    async def scenario():
+        registry, run = MailboxRegistry(), Turns()
+        first = asyncio.create_task(registry.submit("thread", "a", "invoke", run))
+        await _settle()
+        queued = asyncio.create_task(registry.submit("thread", "b", "invoke", run))
+        await _settle()
+
+        with pytest.raises(MailboxFull):
+            await registry.submit("thread", "c", "invoke", run)
+
+        run.release(2)
+        assert await asyncio.gather(first, queued) == ["a", "b"]
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_running_and_queued_callers():
+    async def scenario():
+        registry, run = MailboxRegistry(), Turns()
+        running = asyncio.create_task(registry.submit("thread", "a", "invoke", run))
+        await _settle()
+        queued = asyncio.create_task(registry.submit("thread", "b", "invoke", run))
+        await _settle()
+
+        await asyncio.wait_for(registry.close(), 1)
+        results = await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert run.cancelled == 1
+
+    asyncio.run(scenario())
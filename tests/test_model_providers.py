@@ -0,0 +1,139 @@
+import importlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agents.model import LLMConfig
+from config import settings
+from config.llm import Provider
+from utilities import model as model_module
+from utilities.model import PROVIDERS, _load_model_class, get_llm_provider, get_model
+
+
+class ChatCompletionsStub(BaseHTTPRequestHandler):
+    """
+    Answers POST /v1/chat/completions with a fixed OpenAI style reply and records the requests.
+    """
+
+    requests: list[dict] = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append({"path": self.path, "body": body})
+        if self.path != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        reply = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "pong"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    ChatCompletionsStub.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionsStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_models():
+    get_model.cache_clear()
+    yield
+    get_model.cache_clear()
+
+
+def test_openai_compatible_model_calls_the_configured_server(stub_url, monkeypatch):
+    monkeypatch.setattr(settings, "COMPATIBLE_BASE_URL", f"{stub_url}/v1")
+    monkeypatch.setattr(settings, "COMPATIBLE_MODEL", "qwen2.5-7b-instruct")
+
+    reply = get_model(LLMConfig(model="openai-compatible", temperature=0.2)).invoke("ping")
+
+    assert reply.content == "pong"
+    assert reply.usage_metadata["total_tokens"] == 4
+    [request] = ChatCompletionsStub.requests
+    assert request["path"] == "/v1/chat/completions"
+    assert request["body"]["model"] == "qwen2.5-7b-instruct"
+    assert request["body"]["temperature"] == 0.2
+    assert request["body"]["messages"] == [{"role": "user", "content": "ping"}]
+
+
+def test_openai_compatible_model_requires_base_url_and_model(monkeypatch):
+    monkeypatch.setattr(settings, "COMPATIBLE_BASE_URL", "")
+
+    with pytest.raises(ValueError, match="COMPATIBLE_BASE_URL and COMPATIBLE_MODEL"):
+        get_model(LLMConfig(model="openai-compatible"))
+
+
+def test_ollama_model_calls_the_v1_api(stub_url, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URL", f"{stub_url}/")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "llama3.2")
+
+    reply = get_model(LLMConfig(model="ollama")).invoke("ping")
+
+    assert reply.content == "pong"
+    [request] = ChatCompletionsStub.requests
+    assert request["path"] == "/v1/chat/completions"
+    assert request["body"]["model"] == "llama3.2"
+    assert request["body"]["messages"] == [{"role": "user", "content": "ping"}]
+
+
+@pytest.mark.parametrize(("model_name", "provider"), [
+    ("gpt-4o", Provider.OPENAI),
+    ("azure-gpt-4o", Provider.AZURE_OPENAI),
+    ("deepseek-chat", Provider.DEEPSEEK),
+    ("claude-3.5-haiku", Provider.ANTHROPIC),
+    ("gemini-2.5-flash", Provider.GOOGLE),
+    ("groq-llama-3.3-70b", Provider.GROQ),
+    ("bedrock-3.5-sonnet", Provider.AWS),
+    ("ollama", Provider.OLLAMA),
+    ("openai-compatible", Provider.OPENAI_COMPATIBLE),
+    ("fake", Provider.FAKE),
+])
+def test_get_llm_provider(model_name, provider):
+    assert get_llm_provider(model_name) == provider
+
+
+def test_every_provider_is_covered():
+    assert set(PROVIDERS) == set(Provider)
+
+
+def test_get_llm_provider_rejects_unknown_models():
+    with pytest.raises(ValueError, match="Unsupported model: gpt-2"):
+        get_llm_provider("gpt-2")
+
+
+def test_missing_sdk_names_the_package(monkeypatch):
+    import_module = importlib.import_module
+
+    def without_groq(name, *args):
+        if name == "langchain_groq":
+            raise ModuleNotFoundError(f"No module named '{name}'")
+        return import_module(name, *args)
+
+    monkeypatch.setattr(model_module.importlib, "import_module", without_groq)
+
+    with pytest.raises(ImportError, match="The groq provider needs the langchain-groq package: pip install langchain-groq"):
+        _load_model_class(Provider.GROQ)
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from utilities.singleflight import SingleFlight
+
+
+class Work:
+    """
+    Counts its executions and runs until released.
+    """
+
+    def __init__(self, result="done", error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def _settle():
+    # Lets the started callers reach their await on the shared work.
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_execution():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+        await _settle()
+        assert flight.stats() == {"in_flight": 1, "waiters": 5}
+
+        work.release.set()
+        assert await asyncio.gather(*callers) == ["done"] * 5
+        assert work.calls == 1
+        assert flight.stats() == {"in_flight": 0, "waiters": 0}
+
+    asyncio.run(scenario())
+
+
+def test_other_keys_run_separately():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flight.do(key, work)) for key in ("a", "b")]
+        await _settle()
+        work.release.set()
+        await asyncio.gather(*callers)
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work(error=RuntimeError("boom"))
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+        await _settle()
+        work.release.set()
+
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert [str(result) for result in results] == ["boom"] * 3
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert work.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_others_served():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        leaving, staying = (asyncio.create_task(flight.do("key", work)) for _ in range(2))
+        await _settle()
+
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        assert flight.stats() == {"in_flight": 1, "waiters": 1}
+
+        work.release.set()
+        assert await staying == "done"
+        assert work.cancelled == 0
+
+    asyncio.run(scenario())
+
+
+def test_work_is_cancelled_when_the_last_waiter_leaves():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await _settle()
+
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await _settle()
+        assert work.cancelled == 1
+        assert flight.stats() == {"in_flight": 0, "waiters": 0}
+
+    asyncio.run(scenario())
+
+
+def test_later_call_starts_fresh_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        first, second = Work("first"), Work("second")
+        first.release.set()
+        second.release.set()
+
+        assert await flight.do("key", first) == "first"
+        assert await flight.do("key", second) == "second"
+        assert (first.calls, second.calls) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_call_after_cancelled_work_starts_fresh_work():
+    async def scenario():
+        flight, abandoned, fresh = SingleFlight("test"), Work(), Work("fresh")
+        caller = asyncio.create_task(flight.do("key", abandoned))
+        await _settle()
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+
+        fresh.release.set()
+        assert await flight.do("key", fresh) == "fresh"
+        assert fresh.calls == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+
+from tools.watcher import MCPConfigWatcher, diff_servers
+
+
+class RecordingPool:
+    def __init__(self):
+        self.calls: list[tuple[str, str]] = []
+
+    async def remove_server(self, name: str):
+        self.calls.append(("remove", name))
+
+    async def restart_server(self, name: str, connection: dict):
+        self.calls.append(("restart", name))
+
+
+def _write(path, servers: dict, mtime: int):
+    path.write_text(json.dumps({"mcpServers": servers}))
+    # Distinct mtimes, writes within one clock tick would look unchanged.
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_diff_servers():
+    old = {"a": {"command": "a"}, "b": {"command": "b"}, "c": {"command": "c"}}
+    new = {"a": {"command": "a"}, "b": {"command": "b2"}, "d": {"command": "d"}}
+
+    assert diff_servers(old, new) == {"added": ["d"], "removed": ["c"], "changed": ["b"]}
+
+
+def test_first_reload_applies_changes_made_after_creation(tmp_path):
+    path = tmp_path / "mcp.json"
+    _write(path, {"kept": {"command": "k"}, "changed": {"command": "v1"}, "removed": {"command": "r"}}, 1_000_000_000)
+    pool = RecordingPool()
+    watcher = MCPConfigWatcher(str(path), pool)
+
+    _write(path, {"kept": {"command": "k"}, "changed": {"command": "v2"}, "added": {"command": "a"}}, 2_000_000_000)
+    diff = asyncio.run(watcher.reload())
+
+    assert diff == {"added": ["added"], "removed": ["removed"], "changed": ["changed"]}
+    assert sorted(pool.calls) == [("remove", "removed"), ("restart", "changed")]
+
+
+def test_unchanged_file_is_not_reloaded(tmp_path):
+    path = tmp_path / "mcp.json"
+    _write(path, {"kept": {"command": "k"}}, 1_000_000_000)
+    pool = RecordingPool()
+    watcher = MCPConfigWatcher(str(path), pool)
+
+    assert asyncio.run(watcher.reload()) is None
+    assert pool.calls == []
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+
+from chat.model import ChatMessage
+
+class ThreadMessages(BaseModel):
+    thread_id: str = Field(
+        description="Thread ID of the session.",
+        examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
+    )
+    checkpoint_id: str = Field(
+        description="Checkpoint the page was read from, also returned as the ETag.",
+    )
+    total: int = Field(
+        description="Total number of messages in the thread.",
+    )
+    messages: list[ChatMessage] = Field(
+        description="Messages of this page, oldest first.",
+        default=[],
+    )
+    next_cursor: str | None = Field(
+        description="Cursor of the next page. Once the last page is reached it is still returned, so it can be used to poll for new messages.",
+        default=None,
+    )
+    has_more: bool = Field(
+        description="Whether more messages are available after this page.",
+        default=False,
+    )
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from threads.model import ThreadMessages
+from threads.service import get_thread_messages
+
+router = APIRouter(
+    prefix="/threads",
+    tags=["Threads"],
+    dependencies=[],
+    responses={404: {"description": "Not found"}},
+)
+
+router.get(
+    "/{thread_id}/messages",
+    response_model=ThreadMessages,
+    responses={304: {"description": "Not modified since the checkpoint given in If-None-Match"}}
+)(get_thread_messages)
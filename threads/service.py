@@ -0,0 +1,70 @@
+from fastapi import Header, HTTPException, Query, Response
+
+from agents.service import latest_checkpoint_id, read_thread_messages
+from threads.model import ThreadMessages
+from utilities.logger import get_logger
+from utilities.utils import langchain_to_chat_message
+
+logger = get_logger(__name__)
+
+TRUNCATION_MARKER = "...[truncated {} chars]"
+
+def _parse_cursor(cursor: str | None) -> int:
+    if not cursor:
+        return 0
+    if not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return int(cursor)
+
+def _etag(checkpoint_id: str, cursor: str | None, limit: int, max_content_chars: int | None) -> str:
+    return f'W/"{checkpoint_id}:{cursor or 0}:{limit}:{max_content_chars or 0}"'
+
+async def get_thread_messages(
+    thread_id: str,
+    response: Response,
+    cursor: str | None = Query(default=None, description="Cursor returned as next_cursor by the previous page. Omit to start from the first message."),
+    limit: int = Query(default=50, ge=1, le=200, description="Maximum number of messages to return."),
+    max_content_chars: int | None = Query(default=None, ge=1, description="Truncate each message content to this many characters."),
+    if_none_match: str | None = Header(default=None),
+):
+    try:
+        checkpoint_id = latest_checkpoint_id(thread_id)
+        if checkpoint_id is None:
+            raise HTTPException(status_code=404, detail="Thread not found")
+
+        # The checkpoint id changes with every step, so an unchanged one means nothing new to send.
+        # The page parameters are part of it, another page of the same checkpoint is not the same response.
+        etag = _etag(checkpoint_id, cursor, limit, max_content_chars)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        start = _parse_cursor(cursor)
+        checkpoint_id, total, page = read_thread_messages(thread_id, start, start + limit)
+
+        messages = []
+        for message in page:
+            chat_message = langchain_to_chat_message(message)
+            if chat_message is None:
+                continue
+            if max_content_chars and len(chat_message.content) > max_content_chars:
+                cut = len(chat_message.content) - max_content_chars
+                chat_message.content = chat_message.content[:max_content_chars] + TRUNCATION_MARKER.format(cut)
+            chat_message.thread_id = thread_id
+            messages.append(chat_message)
+
+        end = min(start + limit, total)
+        response.headers["ETag"] = _etag(checkpoint_id, cursor, limit, max_content_chars)
+        return ThreadMessages(
+            thread_id=thread_id,
+            checkpoint_id=checkpoint_id,
+            total=total,
+            messages=messages,
+            next_cursor=str(max(end, start)),
+            has_more=end < total,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error while reading thread messages: {e}")
+        raise e
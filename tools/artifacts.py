@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from pydantic import BaseModel, Field
+
+from config import settings
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+
+logger = get_logger(__name__)
+
+READ_ARTIFACT_TOOL_NAME = "read_artifact"
+ARTIFACT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# Characters between two entries of the byte offset index of a non ASCII artifact.
+ARTIFACT_INDEX_STRIDE = 65536
+
+
+class ArtifactStore:
+    """
+    Local content-addressed store for oversized tool outputs.
+
+    Artifacts are keyed by the sha256 of their content, so the same output
+    produced again (or by another thread) is stored once. The store keeps a
+    running total of its size, the directory is only scanned once and when
+    artifacts have to be evicted. Its methods do blocking disk I/O, async
+    callers run them in a thread.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._count: int | None = None
+        self._bytes = 0
+
+    def _path(self, artifact_id: str) -> Path:
+        if not ARTIFACT_ID_PATTERN.match(artifact_id):
+            raise ValueError(f"Invalid artifact id: {artifact_id}")
+        return self.root / artifact_id[:2] / f"{artifact_id}.txt"
+
+    def _scan(self):
+        if self._count is None:
+            files = [file.stat().st_size for file in self.root.glob("*/*.txt")]
+            indexes = [file.stat().st_size for file in self.root.glob("*/*.idx")]
+            self._count, self._bytes = len(files), sum(files) + sum(indexes)
+
+    def put(self, content: str) -> str:
+        data = content.encode("utf-8")
+        artifact_id = hashlib.sha256(data).hexdigest()
+        path = self._path(artifact_id)
+        with self._lock:
+            self._scan()
+        if path.exists():
+            # Refresh the mtime, eviction is least recently written first.
+            path.touch()
+            return artifact_id
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = len(data)
+        if size != len(content):
+            # Pages are read by character offset, non ASCII artifacts get an index of their byte offsets.
+            index = json.dumps(_byte_offsets(content)).encode()
+            path.with_suffix(".idx").write_bytes(index)
+            size += len(index)
+        # Unique per writer, concurrent puts of the same output must not share it.
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        metrics.increment("artifact_bytes_written_total", len(data))
+        with self._lock:
+            self._count += 1
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+        return artifact_id
+
+    def read(self, artifact_id: str, offset: int = 0, length: int | None = None) -> tuple[str, int]:
+        """
+        Return the characters [offset, offset + length) of an artifact and its total length.
+        """
+        path = self._path(artifact_id)
+        try:
+            index = json.loads(path.with_suffix(".idx").read_bytes())
+        except FileNotFoundError:
+            index = None
+        try:
+            with open(path, "rb") as f:
+                if index is None:
+                    # ASCII, characters are bytes.
+                    total = os.fstat(f.fileno()).st_size
+                    f.seek(offset)
+                    data = f.read(-1 if length is None else length)
+                    return data.decode("utf-8"), total
+                total, offsets = index["chars"], index["offsets"]
+                if offset >= total:
+                    return "", total
+                stride = offset // ARTIFACT_INDEX_STRIDE
+                f.seek(offsets[stride])
+                end = total if length is None else min(offset + length, total)
+                last = min((end - 1) // ARTIFACT_INDEX_STRIDE + 1, len(offsets) - 1)
+                text = f.read(offsets[last] - offsets[stride]).decode("utf-8")
+                skip = offset - stride * ARTIFACT_INDEX_STRIDE
+                return text[skip:skip + end - offset], total
+        except FileNotFoundError:
+            raise KeyError(artifact_id)
+
+    def size(self) -> tuple[int, int]:
+        with self._lock:
+            self._scan()
+            return self._count, self._bytes
+
+    def _evict(self):
+        files = sorted(((file.stat(), file) for file in self.root.glob("*/*.txt")), key=lambda item: item[0].st_mtime)
+        for stat, file in files:
+            index = file.with_suffix(".idx")
+            size = stat.st_size + (index.stat().st_size if index.exists() else 0)
+            file.unlink(missing_ok=True)
+            index.unlink(missing_ok=True)
+            self._count -= 1
+            self._bytes -= size
+            logger.info("Evicted artifact %s", file.stem)
+            if self._bytes <= self.max_bytes:
+                return
+
+
+def _byte_offsets(content: str) -> dict:
+    offsets = [0]
+    for start in range(0, len(content), ARTIFACT_INDEX_STRIDE):
+        offsets.append(offsets[-1] + len(content[start:start + ARTIFACT_INDEX_STRIDE].encode("utf-8")))
+    return {"chars": len(content), "offsets": offsets}
+
+
+artifact_store = ArtifactStore(settings.ARTIFACT_DIR, settings.ARTIFACT_STORE_MAX_BYTES)
+
+
+async def offload_large_output(content: Any) -> Any:
+    """
+    Replace text output above ARTIFACT_THRESHOLD_CHARS with a preview that references the stored artifact.
+    """
+    # Without the store the agent has no read_artifact tool, the output is returned whole.
+    if not settings.ARTIFACT_STORE_ENABLED:
+        return content
+
+    if isinstance(content, list) and all(isinstance(item, str) for item in content):
+        text = "\n".join(content)
+    elif isinstance(content, str):
+        text = content
+    else:
+        return content
+
+    if len(text) <= settings.ARTIFACT_THRESHOLD_CHARS:
+        return content
+
+    artifact_id = await asyncio.to_thread(artifact_store.put, text)
+    preview_chars = settings.ARTIFACT_PREVIEW_CHARS
+    metrics.increment("artifact_offloaded_chars_total", len(text) - preview_chars)
+    return (
+        f"{text[:preview_chars]}\n...\n"
+        f"[Output truncated: {len(text)} characters in total, showing the first {preview_chars}. "
+        f"The full output is stored as artifact `{artifact_id}`. "
+        f"Call {READ_ARTIFACT_TOOL_NAME}(artifact_id=\"{artifact_id}\", offset={preview_chars}, length={settings.ARTIFACT_PAGE_MAX_CHARS}) to read more.]"
+    )
+
+
+async def artifact_middleware(tool: BaseTool, arguments: dict, call_next):
+    result = await call_next(arguments)
+    if tool.response_format == "content_and_artifact" and isinstance(result, tuple):
+        content, artifact = result
+        return await offload_large_output(content), artifact
+    return await offload_large_output(result)
+
+
+class ReadArtifact(BaseModel):
+    artifact_id: str = Field(description="Artifact id from a truncated tool output.")
+    offset: int = Field(default=0, ge=0, description="Character offset to start reading from.")
+    length: int = Field(
+        default=settings.ARTIFACT_PAGE_MAX_CHARS,
+        gt=0,
+        le=settings.ARTIFACT_PAGE_MAX_CHARS,
+        description="Number of characters to read."
+    )
+
+
+async def read_artifact(artifact_id: str, offset: int = 0, length: int = settings.ARTIFACT_PAGE_MAX_CHARS) -> str:
+    try:
+        page, total = await asyncio.to_thread(artifact_store.read, artifact_id, offset, length)
+    except (KeyError, ValueError):
+        raise ToolException(f"Unknown artifact: {artifact_id}")
+
+    end = offset + len(page)
+    footer = (
+        f"\n[Artifact {artifact_id}: characters {offset}-{end} of {total}."
+        + (f" Call {READ_ARTIFACT_TOOL_NAME} with offset={end} for the next page.]" if end < total else " End of artifact.]")
+    )
+    return page + footer
+
+
+def build_read_artifact_tool() -> BaseTool:
+    return StructuredTool.from_function(
+        coroutine=read_artifact,
+        name=READ_ARTIFACT_TOOL_NAME,
+        description="Read a page of a large tool output that was truncated and stored as an artifact.",
+        args_schema=ReadArtifact,
+        handle_tool_error=True,
+    )
@@ -0,0 +1,297 @@
+import asyncio
+import copy
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from config import settings
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+from utilities.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+# npx flags that only skip prompts or output, anything else (-p, -c, ...) is left to npx.
+NPX_PASSTHROUGH_FLAGS = ("-y", "--yes", "-q", "--quiet")
+EXACT_VERSION = re.compile(r"^\d+\.\d+\.\d+(-[0-9A-Za-z.-]+)?$")
+
+
+def _command_key(connection: dict[str, Any]) -> str:
+    return json.dumps([connection.get("command"), connection.get("args") or []])
+
+
+def parse_npx(connection: dict[str, Any]) -> tuple[str, list[str]] | None:
+    """
+    Package spec and server arguments of an `npx` server entry, None if it is not one we can pin.
+    """
+    if connection.get("transport", "stdio") != "stdio" or Path(str(connection.get("command", ""))).name not in ("npx", "npx.cmd"):
+        return None
+    args = list(connection.get("args") or [])
+    while args and args[0] in NPX_PASSTHROUGH_FLAGS:
+        args.pop(0)
+    if not args or args[0].startswith("-"):
+        return None
+    return args[0], args[1:]
+
+
+def _split_spec(spec: str) -> tuple[str, str | None]:
+    """
+    "@scope/pkg@1.2.3" -> ("@scope/pkg", "1.2.3"), "pkg" -> ("pkg", None).
+    """
+    name, _, version = spec[1:].partition("@") if spec.startswith("@") else spec.partition("@")
+    return ("@" + name if spec.startswith("@") else name), (version or None)
+
+
+def _dir_name(package: str, version: str) -> str:
+    return f"{package.replace('/', '+')}@{version}"
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class LaunchCache:
+    """
+    Pins `npx <package>` server entries to a locally installed executable.
+
+    At deploy time the package is resolved once (npm view for the version,
+    npm install into a per package@version directory of the cache) and the
+    resulting invocation is stored in the server entry under `launch`.
+    Servers are then spawned from it, skipping npx resolution and the
+    network. Least recently launched packages are evicted beyond
+    `max_bytes`, except the ones running servers use; an entry whose
+    package was evicted falls back to npx.
+    """
+
+    def __init__(self, root: str, max_bytes: int, timeout: float):
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._resolutions = SingleFlight("launch_resolutions")
+        self._sizes: dict[str, int] | None = None
+        # Package directories live servers run from, never evicted.
+        self._in_use: Counter[str] = Counter()
+        self.counts = {"resolved": 0, "cached": 0, "failed": 0, "fallbacks": 0, "evicted": 0}
+
+    async def _npm(self, *args: str, cwd: str | None = None) -> str:
+        npm = shutil.which("npm")
+        if npm is None:
+            raise FileNotFoundError("npm is not installed")
+        process = await asyncio.create_subprocess_exec(
+            npm, *args,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            async with asyncio.timeout(self.timeout):
+                stdout, stderr = await process.communicate()
+        except BaseException:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f"npm {args[0]} failed: {stderr.decode(errors='replace').strip()[-500:]}")
+        return stdout.decode()
+
+    async def _latest_version(self, spec: str) -> str | None:
+        try:
+            output = await self._npm("view", spec, "version", "--json")
+        except (RuntimeError, TimeoutError) as err:
+            logger.warning(f"Unable to look up the version of {spec}: {err}")
+            return None
+        version = json.loads(output or "null")
+        # A range matching several versions lists all of them, the last one is what npx would pick.
+        return version[-1] if isinstance(version, list) else version
+
+    async def _install(self, spec: str) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".install-", dir=self.root))
+        try:
+            await self._npm("install", "--no-audit", "--no-fund", "--omit=dev", spec, cwd=str(staging))
+            with open(staging / "package.json") as f:
+                package = next(iter(json.load(f)["dependencies"]))
+            with open(staging / "node_modules" / package / "package.json") as f:
+                version = json.load(f)["version"]
+            target = self.root / _dir_name(package, version)
+            if target.exists():
+                shutil.rmtree(staging)
+            else:
+                try:
+                    os.rename(staging, target)
+                except OSError:
+                    # Another spec resolving to the same package@version installed it first.
+                    if not target.exists():
+                        raise
+                    shutil.rmtree(staging)
+            return target
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _find(self, package: str, version: str | None) -> Path | None:
+        if version is not None:
+            path = self.root / _dir_name(package, version)
+            return path if path.exists() else None
+        # Offline, the most recently installed version of the package.
+        candidates = sorted(self.root.glob(f"{_dir_name(package, '*')}"), key=lambda path: path.stat().st_mtime)
+        return candidates[-1] if candidates else None
+
+    @staticmethod
+    def _executable(directory: Path) -> tuple[str, str, str]:
+        with open(directory / "package.json") as f:
+            package = next(iter(json.load(f)["dependencies"]))
+        with open(directory / "node_modules" / package / "package.json") as f:
+            manifest = json.load(f)
+        bins = manifest.get("bin") or {}
+        if isinstance(bins, str):
+            bins = {package.rsplit("/", 1)[-1]: bins}
+        if not bins:
+            raise ValueError(f"{package} has no executable")
+        # npx runs the bin named after the package, or the only one.
+        name = package.rsplit("/", 1)[-1]
+        bin_name = name if name in bins else next(iter(bins))
+        return str(directory / "node_modules" / ".bin" / bin_name), package, manifest["version"]
+
+    async def _resolve(self, spec: str) -> dict[str, Any]:
+        package, version = _split_spec(spec)
+        directory = None
+        if version is not None and EXACT_VERSION.match(version):
+            directory = self._find(package, version)
+        elif not spec.startswith((".", "/", "file:")) and not spec.endswith(".tgz"):
+            latest = await self._latest_version(spec)
+            # Without the registry, the last installed version is the best guess of what npx would run.
+            directory = self._find(package, latest)
+        outcome = "cached"
+        if directory is None:
+            directory = await self._install(spec)
+            outcome = "resolved"
+        executable, package, version = self._executable(directory)
+        os.utime(directory)
+        self.counts[outcome] += 1
+        metrics.increment("mcp_launch_resolutions_total", labels={"outcome": outcome})
+        if outcome == "resolved":
+            await asyncio.to_thread(self.enforce_limit, keep=directory.name)
+        return {"command": executable, "package": package, "version": version, "resolved_at": time.time()}
+
+    async def resolve(self, connection: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        The pinned `launch` entry of an npx server entry, None if it is not an npx entry or can not be resolved.
+        """
+        if not settings.MCP_LAUNCH_RESOLVE_ENABLED:
+            return None
+        parsed = parse_npx(connection)
+        if parsed is None:
+            return None
+        spec, server_args = parsed
+        started = time.perf_counter()
+        try:
+            launch = await self._resolutions.do(spec, lambda: self._resolve(spec))
+        except Exception as err:
+            self.counts["failed"] += 1
+            metrics.increment("mcp_launch_resolutions_total", labels={"outcome": "failed"})
+            logger.warning(f"Unable to pin {spec}, the server will be launched through npx: {err}")
+            return None
+        finally:
+            metrics.observe("mcp_launch_resolve_seconds", time.perf_counter() - started)
+        logger.info(f"Pinned {spec} to {launch['package']}@{launch['version']}")
+        return {**launch, "args": server_args, "for": _command_key(connection)}
+
+    def launch_connection(self, connection: dict[str, Any]) -> dict[str, Any]:
+        """
+        The connection to spawn: the pinned invocation when it is still valid, the entry as configured otherwise.
+        """
+        connection = copy.deepcopy(connection)
+        launch = connection.pop("launch", None)
+        if not launch:
+            return connection
+        directory = Path(launch["command"]).parents[2]
+        if launch.get("for") != _command_key(connection) or not os.path.exists(launch["command"]):
+            # Evicted from the cache, or the entry was edited after it was pinned.
+            self.counts["fallbacks"] += 1
+            metrics.increment("mcp_launch_fallbacks_total")
+            logger.warning(f"Pinned launch of {launch.get('package')} is stale, launching through {connection.get('command')}")
+            return connection
+        try:
+            os.utime(directory)
+        except OSError:
+            pass
+        connection["command"] = launch["command"]
+        connection["args"] = list(launch.get("args") or [])
+        return connection
+
+    @contextmanager
+    def launched(self, connection: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """
+        The connection to spawn (see launch_connection), its package is kept in the cache while the context is open.
+        """
+        connection = self.launch_connection(connection)
+        command = Path(str(connection.get("command", "")))
+        name = command.relative_to(self.root).parts[0] if command.is_relative_to(self.root) else None
+        if name is not None:
+            self._in_use[name] += 1
+        try:
+            yield connection
+        finally:
+            if name is not None:
+                self._in_use[name] -= 1
+                if self._in_use[name] <= 0:
+                    del self._in_use[name]
+
+    def scan(self) -> dict[str, int]:
+        if not self.root.exists():
+            self._sizes = {}
+        else:
+            self._sizes = {
+                path.name: _dir_size(path)
+                for path in self.root.iterdir()
+                if path.is_dir() and not path.name.startswith(".")
+            }
+        return self._sizes
+
+    def enforce_limit(self, keep: str | None = None):
+        """
+        Evict the least recently launched packages until the cache fits in `max_bytes`.
+        """
+        sizes = self.scan()
+        total = sum(sizes.values())
+        in_use = set(self._in_use)
+        for name in sorted(sizes, key=lambda name: (self.root / name).stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if name == keep or name in in_use:
+                continue
+            shutil.rmtree(self.root / name, ignore_errors=True)
+            total -= sizes.pop(name)
+            self.counts["evicted"] += 1
+            logger.info(f"Evicted {name} from the MCP launch cache")
+
+    def stats(self) -> dict[str, Any]:
+        sizes = self._sizes or {}
+        return {
+            **self.counts,
+            "packages": len(sizes),
+            "bytes": sum(sizes.values()),
+            "max_bytes": self.max_bytes,
+        }
+
+
+launch_cache = LaunchCache(
+    root=settings.MCP_LAUNCH_CACHE_DIR,
+    max_bytes=settings.MCP_LAUNCH_CACHE_MAX_BYTES,
+    timeout=settings.MCP_LAUNCH_RESOLVE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,135 @@
+import json
+from functools import cache
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from config import settings
+from tools.middleware import apply_middleware, default_middleware
+from tools.model import DeleteMCP, DeployMCP, ManageMCPConfig, SearchMCPRegistry
+from tools.service import list_mcp_server_tools, list_mcp_servers, manage_mcp_config, search_mcp_registry as search_registry
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Servers that can not be removed through delete-mcp.
+NOT_ALLOWED = [settings.MCP_MANAGEMENT_SERVER_NAME]
+
+SEARCH_REGISTRY_DESCRIPTION = (
+    "Search the local registry of known MCP servers. Returns for each match its description, "
+    "the config to pass to deploy-mcp and the env vars the user has to provide. "
+    "Use it before searching the web for a server."
+)
+
+
+async def deploy_mcp(server_name: str, server_config: dict) -> str:
+    try:
+        if server_name and server_config:
+            await manage_mcp_config(ManageMCPConfig(
+                mcpServers={server_name: server_config},
+                mode="update"
+            ))
+            return json.dumps({
+                "success": True
+            })
+        return json.dumps({
+            "error": True,
+            "message": "Missing server name or configuration"
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": True,
+            "message": f"Error while deploying mcp : {e}"
+        })
+
+
+async def delete_mcp(server_name: str) -> str:
+    try:
+        if server_name and server_name not in NOT_ALLOWED:
+            await manage_mcp_config(ManageMCPConfig(
+                mcpServers={server_name: {}},
+                mode="delete"
+            ))
+            return json.dumps({
+                "success": True
+            })
+        return json.dumps({
+            "error": True,
+            "message": "Invalid server name"
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": True,
+            "message": f"Error while deleting mcp : {e}"
+        })
+
+
+async def list_mcp() -> str:
+    try:
+        servers = list_mcp_servers()
+        logger.debug("servers : %s", servers)
+        return json.dumps({
+            "success": True,
+            "servers": servers,
+            "tools": list_mcp_server_tools()
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": True,
+            "message": f"Error while listing mcp : {e}"
+        })
+
+
+async def search_mcp_registry(query: str, limit: int = 5) -> str:
+    try:
+        servers = await search_registry(query, limit)
+        if not servers:
+            return json.dumps({
+                "success": True,
+                "servers": [],
+                "message": "No match in the local registry, search the web for a server instead"
+            })
+        return json.dumps({
+            "success": True,
+            "servers": servers
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": True,
+            "message": f"Error while searching the mcp registry : {e}"
+        })
+
+
+@cache
+def get_management_tools() -> tuple[BaseTool, ...]:
+    """
+    deploy-mcp, delete-mcp, list-mcp and search-mcp-registry as in-process tools, sharing this process's config and MCP pool.
+
+    Built once, so agents keyed on tool identity keep hitting the agent cache.
+    """
+    middleware = default_middleware()
+    tools = [
+        StructuredTool.from_function(
+            coroutine=deploy_mcp,
+            name="deploy-mcp",
+            description="send the mcp server configuration",
+            args_schema=DeployMCP,
+        ),
+        StructuredTool.from_function(
+            coroutine=delete_mcp,
+            name="delete-mcp",
+            description="send the mcp server name",
+            args_schema=DeleteMCP,
+        ),
+        StructuredTool.from_function(
+            coroutine=list_mcp,
+            name="list-mcp",
+            description="List all the avilable mcp servers and their tools",
+        ),
+        StructuredTool.from_function(
+            coroutine=search_mcp_registry,
+            name="search-mcp-registry",
+            description=SEARCH_REGISTRY_DESCRIPTION,
+            args_schema=SearchMCPRegistry,
+        ),
+    ]
+    return tuple(apply_middleware(tool, middleware) for tool in tools)
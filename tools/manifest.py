@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from utilities.logger import get_logger
+
+if TYPE_CHECKING:
+    from mcp.types import Implementation, Tool as MCPTool
+
+logger = get_logger(__name__)
+
+
+def manifest_path(config_file: str) -> Path:
+    """
+    The manifest lives next to the MCP config file, e.g. mcp.json -> mcp.manifest.json.
+    """
+    path = Path(config_file)
+    return path.with_name(f"{path.stem}.manifest.json")
+
+
+class ToolManifest:
+    """
+    Persisted description of what each MCP server exposes.
+
+    For every server it keeps the tool definitions (name, description, input
+    schema, annotations), the server name and version, and the hash of the
+    config they were read with, plus a tool -> servers reverse index. Entries
+    are only trusted while the config hash matches, so tools can be listed,
+    filtered and bound to agents without spawning the server. The file is
+    reloaded whenever another process (e.g. mcp_server.py) rewrote it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._servers: dict[str, dict[str, Any]] | None = None
+        self._mtime_ns: int | None = None
+
+    def _file_mtime(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    @property
+    def servers(self) -> dict[str, dict[str, Any]]:
+        mtime = self._file_mtime()
+        if self._servers is None or mtime != self._mtime_ns:
+            self._servers = self._load()
+            self._mtime_ns = mtime
+        return self._servers
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f).get("servers") or {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as err:
+            logger.warning(f"Ignoring unreadable tool manifest {self.path}: {err}")
+            return {}
+
+    def _save(self):
+        data = {"servers": self.servers, "tool_index": self.tool_index()}
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, self.path)
+        self._mtime_ns = self._file_mtime()
+
+    def entry(self, name: str, connection: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Manifest entry of a server, None if missing or recorded for another config.
+        """
+        from tools.pool import config_hash
+
+        entry = self.servers.get(name)
+        if entry is None or entry.get("config_hash") != config_hash(connection):
+            return None
+        return entry
+
+    def tools(self, name: str, connection: dict[str, Any]) -> list["MCPTool"] | None:
+        from mcp.types import Tool
+
+        entry = self.entry(name, connection)
+        if entry is None:
+            return None
+        return [Tool.model_validate(tool) for tool in entry["tools"]]
+
+    def record(
+        self,
+        name: str,
+        connection: dict[str, Any],
+        tools: list["MCPTool"],
+        server_info: "Implementation | None" = None,
+    ) -> bool:
+        """
+        Store what a freshly connected server exposes. Returns True if its tools changed.
+        """
+        from tools.pool import config_hash
+
+        definitions = [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+        previous = self.servers.get(name)
+        changed = previous is None or previous.get("tools") != definitions
+        digest = config_hash(connection)
+        if not changed and previous.get("config_hash") == digest:
+            return False
+
+        self.servers[name] = {
+            "config_hash": digest,
+            "server": server_info.model_dump(mode="json", exclude_none=True) if server_info else None,
+            "tools": definitions,
+            "updated_at": time.time(),
+        }
+        try:
+            self._save()
+        except OSError as err:
+            logger.warning(f"Unable to write tool manifest {self.path}: {err}")
+        return changed
+
+    def remove(self, name: str):
+        if self.servers.pop(name, None) is not None:
+            self._save()
+
+    def tool_index(self) -> dict[str, list[str]]:
+        """
+        Tool name -> names of the servers exposing it.
+        """
+        index: dict[str, list[str]] = {}
+        for name, entry in self.servers.items():
+            for tool in entry["tools"]:
+                index.setdefault(tool["name"], []).append(name)
+        return index
+
+    def tool_names(self, name: str, connection: dict[str, Any]) -> list[str] | None:
+        entry = self.entry(name, connection)
+        if entry is None:
+            return None
+        return [tool["name"] for tool in entry["tools"]]
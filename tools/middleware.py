@@ -0,0 +1,85 @@
+import json
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from langchain_core.tools import BaseTool
+
+from config import settings
+from utilities.deadline import within_deadline
+from utilities.logger import get_logger
+from utilities.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+tool_calls = SingleFlight("tool_calls")
+
+# async def middleware(tool, arguments, call_next) -> result
+ToolMiddleware = Callable[[BaseTool, dict, Callable[[dict], Awaitable[Any]]], Awaitable[Any]]
+
+
+def default_middleware() -> list[ToolMiddleware]:
+    """
+    Middleware applied to every MCP tool, outermost first.
+    """
+    from tools.artifacts import artifact_middleware
+    from tools.progress import progress_middleware
+    from tools.tenants import tenant_quota_middleware
+
+    return [deadline_middleware, progress_middleware, coalesce_middleware, tenant_quota_middleware, artifact_middleware]
+
+
+async def deadline_middleware(tool: BaseTool, arguments: dict, call_next):
+    """
+    Bound the tool call by the deadline of the request that triggered it.
+    """
+    async with within_deadline():
+        return await call_next(arguments)
+
+
+def _coalescable(tool: BaseTool) -> bool:
+    metadata = tool.metadata or {}
+    return bool(metadata.get("readOnlyHint")) or tool.name in settings.TOOL_COALESCE_EXTRA_TOOLS
+
+
+async def coalesce_middleware(tool: BaseTool, arguments: dict, call_next):
+    """
+    Share one execution between identical concurrent calls of a read-only tool.
+
+    Placed before the tenant quota, so coalesced calls take no slot of their own.
+    """
+    if not settings.TOOL_COALESCE_ENABLED or not _coalescable(tool):
+        return await call_next(arguments)
+
+    from tools.tenants import current_tenant
+
+    key = (
+        current_tenant.get(),
+        (tool.metadata or {}).get("mcp_server"),
+        tool.name,
+        json.dumps(arguments, sort_keys=True, default=str),
+    )
+    return await tool_calls.do(key, lambda: call_next(arguments))
+
+
+def apply_middleware(tool: BaseTool, middleware: list[ToolMiddleware]) -> BaseTool:
+    """
+    Wrap the coroutine of `tool` with `middleware`, in place, and return the tool.
+    """
+    call = tool.coroutine
+
+    async def innermost(arguments: dict):
+        return await call(**arguments)
+
+    call_next = innermost
+    for layer in reversed(middleware):
+        call_next = partial(_call_layer, layer, tool, call_next)
+
+    async def wrapped(**arguments: Any):
+        return await call_next(arguments)
+
+    tool.coroutine = wrapped
+    return tool
+
+
+async def _call_layer(layer: ToolMiddleware, tool: BaseTool, call_next, arguments: dict):
+    return await layer(tool, arguments, call_next)
@@ -1,5 +1,7 @@
 from typing import Any, Dict, List, Literal, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+TENANT_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
 
 class MCPConfig(BaseModel):
     mcpServers: Dict[str, Any]
@@ -8,4 +10,36 @@ class MCPConfig(BaseModel):
 class ManageMCPConfig(BaseModel):
     mcpServers: Dict[str, Any]
     mode: Literal["create", "update", "delete"]
-    allowedTools: Optional[List[str]] = None
\ No newline at end of file
+    allowedTools: Optional[List[str]] = None
+    tenant_id: Optional[str] = Field(default=None, pattern=TENANT_ID_PATTERN)
+
+class DeployMCP(BaseModel):
+    server_name: str = Field(
+        description="Name of the server",
+        examples=["travily-mcp", "web-search"]
+    )
+    server_config: dict = Field(
+        # description="The server configuration json of type {{ command: npx, args: [] }}",
+        examples=[{ "command": "npx", "args": ["mcp-remote", "https://remote.mcp.server/sse"] }]
+    )
+    
+class DeleteMCP(BaseModel):
+    server_name: str = Field(
+        description="Name of the server",
+        examples=["travily-mcp", "web-search"]
+    )
+
+class SearchMCPRegistry(BaseModel):
+    query: str = Field(
+        description="What the server should do or its name",
+        examples=["web search", "postgres database", "github"]
+    )
+    limit: int = Field(default=5, ge=1, le=20, description="Maximum number of servers to return")
+
+class ImportMCPRegistry(BaseModel):
+    servers: List[Dict[str, Any]] = Field(
+        description="Registry entries, each with a name, a config (mcp.json server entry) and optionally a title, description, tags and url",
+        examples=[[{"name": "tavily-mcp", "description": "Web search", "config": {"command": "npx", "args": ["-y", "tavily-mcp"]}}]]
+    )
+    source: Optional[str] = None
+    prune: bool = Field(default=False, description="Remove the entries of the same source missing from this dump")
@@ -0,0 +1,448 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+from config import settings
+from tools.launcher import launch_cache
+from tools.manifest import ToolManifest
+from tools.middleware import apply_middleware, default_middleware
+from tools.progress import ToolCallProgress, current_tool_call, progress_reporter
+from utilities.breaker import CLOSED, OPEN, CircuitBreaker
+from utilities.deadline import remaining
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+
+if TYPE_CHECKING:
+    from mcp import ClientSession
+    from mcp.types import CallToolResult, Implementation, LoggingMessageNotificationParams, Tool as MCPTool
+
+logger = get_logger(__name__)
+
+# Strong references to fire-and-forget tasks (e.g. cancellation notifications).
+_background_tasks: set[asyncio.Task] = set()
+
+
+class ServerQuotaExceeded(Exception):
+    pass
+
+
+def config_hash(server_config: dict) -> str:
+    """
+    Stable hash of a server entry, used to detect configuration changes.
+    """
+    return hashlib.sha256(json.dumps(server_config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _next_request_id(session: "ClientSession") -> int | None:
+    """
+    The id the next request of the session will use, needed to cancel it server side.
+
+    The MCP SDK has no public API for it, this reads the private counter of
+    BaseSession (mcp 1.30, pinned in requirements.txt). None if a release
+    drops it, the call then runs without a cancellation notification.
+    """
+    request_id = getattr(session, "_request_id", None)
+    return request_id if isinstance(request_id, int) else None
+
+
+def convert_call_tool_result(result: "CallToolResult") -> tuple[str | list[str], list | None]:
+    """
+    Convert an MCP CallToolResult into LangChain's (content, artifact) tool output.
+    """
+    from mcp.types import TextContent
+
+    texts = [content.text for content in result.content if isinstance(content, TextContent)]
+    non_texts = [content for content in result.content if not isinstance(content, TextContent)]
+    tool_content: str | list[str] = texts[0] if len(texts) == 1 else (texts or "")
+
+    if result.isError:
+        raise ToolException(tool_content)
+
+    return tool_content, non_texts or None
+
+
+class MCPServer:
+    """
+    A long-lived session to one MCP server.
+
+    The session is opened and closed by a dedicated task because the MCP client
+    transports use anyio cancel scopes, which must be exited by the task that
+    entered them.
+    """
+
+    def __init__(self, name: str, connection: dict[str, Any]):
+        self.name = name
+        self.connection = connection
+        self.config_hash = config_hash(connection)
+        self.session: "ClientSession | None" = None
+        self.tools: list["MCPTool"] = []
+        self.server_info: "Implementation | None" = None
+        self.started_at: float | None = None
+        self.last_used = time.monotonic()
+        self.in_flight = 0
+        # Streamed tool calls running on this server, they receive its log messages.
+        self.calls: set[ToolCallProgress] = set()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._error: BaseException | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done() and not self._closing.is_set()
+
+    async def start(self, timeout: float | None = None):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server:{self.name}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout or settings.MCP_CONNECT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise TimeoutError(f"Timed out connecting to MCP server {self.name}")
+        if self._error is not None:
+            raise self._error
+
+    async def stop(self):
+        self._closing.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=settings.MCP_CONNECT_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+
+    async def call_tool(self, name: str, arguments: dict[str, Any], timeout: float | None = None) -> "CallToolResult":
+        from mcp.shared.exceptions import McpError
+        from mcp.types import CONNECTION_CLOSED
+
+        if not self.alive:
+            raise ConnectionError(f"MCP server {self.name} is not connected")
+        request_id = _next_request_id(self.session)
+        call = current_tool_call.get()
+        if call is not None:
+            self.calls.add(call)
+        self.in_flight += 1
+        self.last_used = time.monotonic()
+        try:
+            return await self.session.call_tool(
+                name,
+                arguments,
+                read_timeout_seconds=timedelta(seconds=timeout) if timeout else None,
+                progress_callback=progress_reporter.get(),
+            )
+        except asyncio.CancelledError:
+            # Tell the server to stop working on it, the client side is already gone.
+            if request_id is not None:
+                task = asyncio.create_task(self._notify_cancelled(request_id, "Request cancelled by client"))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            raise
+        except McpError as err:
+            if err.error.code == CONNECTION_CLOSED:
+                self._closing.set()
+            raise
+        except (ConnectionError, OSError) as err:
+            logger.error(f"MCP server {self.name} connection lost: {err}")
+            self._closing.set()
+            raise
+        finally:
+            self.in_flight -= 1
+            self.calls.discard(call)
+
+    async def _notify_cancelled(self, request_id: int, reason: str):
+        from mcp.types import CancelledNotification, CancelledNotificationParams, ClientNotification
+
+        session = self.session
+        if session is None:
+            return
+        try:
+            await session.send_notification(ClientNotification(
+                CancelledNotification(params=CancelledNotificationParams(requestId=request_id, reason=reason))
+            ))
+        except Exception as err:
+            logger.warning(f"Unable to send cancellation to MCP server {self.name}: {err}")
+
+    async def _on_log(self, params: "LoggingMessageNotificationParams"):
+        """
+        Forward a log message of the server to the streamed calls running on it.
+        """
+        message = params.data if isinstance(params.data, str) else json.dumps(params.data, default=str)
+        for call in list(self.calls):
+            await call.report("log", message, level=params.level, logger=params.logger)
+
+    async def _run(self):
+        from langchain_mcp_adapters.sessions import create_session
+
+        try:
+            # A copy (pinned launch applied), the adapters add defaults (e.g. PATH to `env`) in place,
+            # which would change the config hash. Its pinned package is not evicted while the server runs.
+            with launch_cache.launched(self.connection) as connection:
+                connection["session_kwargs"] = {**(connection.get("session_kwargs") or {}), "logging_callback": self._on_log}
+                async with create_session(connection) as session:
+                    initialized = await session.initialize()
+                    self.server_info = initialized.serverInfo
+                    self.tools = await _list_all_tools(session)
+                    self.session = session
+                    self.started_at = time.time()
+                    self._ready.set()
+                    await self._closing.wait()
+        except BaseException as err:
+            self._error = err
+            if not self._ready.is_set():
+                logger.error(f"Error while connecting MCP server {self.name}: {err}")
+            else:
+                logger.error(f"MCP server {self.name} stopped with error: {err}")
+            if isinstance(err, asyncio.CancelledError):
+                raise
+        finally:
+            self.session = None
+            self._ready.set()
+
+
+async def _list_all_tools(session: "ClientSession") -> list["MCPTool"]:
+    tools, cursor = [], None
+    while True:
+        page = await session.list_tools(cursor=cursor)
+        tools.extend(page.tools)
+        cursor = page.nextCursor
+        if not cursor:
+            return tools
+
+
+class MCPServerPool:
+    """
+    Live MCP servers of one tenant, shared by all of its requests and keyed by server name.
+
+    Servers are started on first use and restarted when their configuration
+    changes or their connection is lost. Each server sits behind a circuit
+    breaker, so a broken one is skipped instead of failing every request.
+    At most `max_servers` run at once, the least recently used idle server
+    is stopped to make room for another.
+    """
+
+    def __init__(self, manifest: ToolManifest, name: str = "default", max_servers: int | None = None):
+        self.name = name
+        self.manifest = manifest
+        self.max_servers = max_servers
+        self.servers: dict[str, MCPServer] = {}
+        # Latest known configuration of each server, followed by tools at call time.
+        self.connections: dict[str, dict[str, Any]] = {}
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._breaker_hashes: dict[str, str] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._tools: dict[str, list[BaseTool]] = {}
+        self._tools_hashes: dict[str, str] = {}
+
+    def breaker(self, name: str, connection: dict[str, Any]) -> CircuitBreaker:
+        """
+        Circuit breaker of a server, reset whenever its configuration changes.
+        """
+        digest = config_hash(connection)
+        breaker = self.breakers.get(name)
+        if breaker is None or self._breaker_hashes.get(name) != digest:
+            breaker = CircuitBreaker(
+                name=f"mcp:{self.name}:{name}",
+                failure_threshold=settings.MCP_BREAKER_FAILURE_THRESHOLD,
+                reset_seconds=settings.MCP_BREAKER_RESET_SECONDS,
+                max_reset_seconds=settings.MCP_BREAKER_MAX_RESET_SECONDS,
+            )
+            self.breakers[name] = breaker
+            self._breaker_hashes[name] = digest
+        return breaker
+
+    async def get_server(self, name: str, connection: dict[str, Any]) -> MCPServer:
+        self.connections[name] = connection
+        server = self.servers.get(name)
+        if server is not None and server.alive and server.config_hash == config_hash(connection):
+            return server
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            server = self.servers.get(name)
+            if server is not None and server.alive and server.config_hash == config_hash(connection):
+                return server
+            if server is not None:
+                logger.info(f"Restarting MCP server {name}")
+                self._tools.pop(name, None)
+                await server.stop()
+            else:
+                await self._make_room()
+
+            server = MCPServer(name, connection)
+            started = time.perf_counter()
+            await server.start()
+            logger.info(f"Connected MCP server {name} with {len(server.tools)} tools in {time.perf_counter() - started:.2f}s")
+            self.servers[name] = server
+            if self.manifest.record(name, connection, server.tools, server.server_info):
+                # The server exposes other tools than the manifest said, rebuild them.
+                self._tools.pop(name, None)
+            return server
+
+    async def get_tools(self, mcp_servers: dict[str, dict]) -> list[BaseTool]:
+        """
+        Return the LangChain tools of every configured server.
+
+        Tools come from the manifest when it is current for the server's config,
+        otherwise the server is connected (concurrently with the others). Servers
+        that fail, or whose breaker is open, contribute no tools.
+        """
+        names = list(mcp_servers)
+        results = await asyncio.gather(*(self._guarded_server_tools(name, mcp_servers[name]) for name in names))
+        return [tool for tools in results for tool in tools]
+
+    async def _guarded_server_tools(self, name: str, connection: dict[str, Any], connect: bool = False) -> list[BaseTool]:
+        breaker = self.breaker(name, connection)
+        if not breaker.allow():
+            logger.warning(f"Skipping MCP server {name}, circuit {breaker.state} (retry in {breaker.retry_in:.0f}s)")
+            metrics.increment("mcp_servers_skipped_total", labels={"server": name})
+            return []
+        try:
+            # A half-open probe has to really connect, the manifest proves nothing about the server.
+            tools = await self._server_tools(name, connection, connect=connect or breaker.state != CLOSED)
+        except asyncio.CancelledError:
+            breaker.abandon_probe()
+            raise
+        except ServerQuotaExceeded as err:
+            # Says nothing about the health of the server.
+            breaker.abandon_probe()
+            logger.warning(f"{err}, continuing without the tools of {name}")
+            return []
+        except Exception as err:
+            logger.error(f"MCP server {name} unavailable, continuing without its tools: {err}")
+            breaker.record_failure(err)
+            return []
+        breaker.record_success()
+        return tools
+
+    async def _server_tools(self, name: str, connection: dict[str, Any], connect: bool = False) -> list[BaseTool]:
+        digest = config_hash(connection)
+        self.connections[name] = connection
+        definitions = None
+        if not connect:
+            tools = self._tools.get(name)
+            if tools is not None and self._tools_hashes.get(name) == digest:
+                return tools
+            definitions = self.manifest.tools(name, connection)
+
+        if definitions is None:
+            server = await self.get_server(name, connection)
+            tools = self._tools.get(name)
+            if tools is not None and self._tools_hashes.get(name) == digest:
+                return tools
+            definitions = server.tools
+
+        middleware = default_middleware()
+        tools = [
+            apply_middleware(self._to_langchain_tool(name, tool), middleware)
+            for tool in definitions
+        ]
+        self._tools[name] = tools
+        self._tools_hashes[name] = digest
+        return tools
+
+    def _to_langchain_tool(self, server_name: str, tool: "MCPTool") -> BaseTool:
+        # The tool resolves its server at call time, so it survives server restarts
+        # and follows configuration changes instead of restarting the old one.
+        async def call_tool(**arguments: Any):
+            connection = self.connections.get(server_name)
+            if connection is None:
+                raise ToolException(f"MCP server {server_name} is no longer configured")
+            breaker = self.breaker(server_name, connection)
+            if breaker.state == OPEN:
+                raise ToolException(f"MCP server {server_name} is temporarily unavailable, retry in {breaker.retry_in:.0f}s")
+            try:
+                server = await self.get_server(server_name, connection)
+            except ServerQuotaExceeded as err:
+                raise ToolException(str(err))
+            except Exception as err:
+                breaker.record_failure(err)
+                raise ToolException(f"MCP server {server_name} is unavailable: {err}")
+            try:
+                result = await server.call_tool(tool.name, arguments, timeout=remaining())
+            except Exception as err:
+                # Only a lost connection counts against the server, not a failing tool.
+                if not server.alive:
+                    breaker.record_failure(err)
+                raise
+            return convert_call_tool_result(result)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+            metadata={"mcp_server": server_name, **(tool.annotations.model_dump() if tool.annotations else {})},
+        )
+
+    async def connect_all(self):
+        """
+        Start every known server that is not running yet, e.g. the ones whose tools came from the manifest.
+        """
+        await asyncio.gather(*(
+            self._guarded_server_tools(name, connection, connect=True)
+            for name, connection in list(self.connections.items())
+            if name not in self.servers or not self.servers[name].alive
+        ))
+
+    async def restart_server(self, name: str, connection: dict[str, Any]):
+        """
+        Apply a new configuration to a live server now rather than on its next use.
+        """
+        if name in self.servers:
+            await self._guarded_server_tools(name, connection, connect=True)
+        else:
+            self.connections[name] = connection
+
+    async def _make_room(self):
+        if not self.max_servers or len(self.servers) < self.max_servers:
+            return
+        idle = [server for server in self.servers.values() if server.in_flight == 0]
+        if not idle:
+            metrics.increment("mcp_server_quota_rejections_total", labels={"tenant": self.name})
+            raise ServerQuotaExceeded(f"Tenant {self.name} already runs {len(self.servers)} MCP servers (quota {self.max_servers})")
+        server = min(idle, key=lambda server: server.last_used)
+        logger.info(f"Stopping idle MCP server {server.name} of tenant {self.name} to stay within its quota")
+        # Its tools are kept, they start it again on their next call.
+        del self.servers[server.name]
+        await server.stop()
+
+    async def stop_server(self, name: str):
+        server = self.servers.pop(name, None)
+        self._tools.pop(name, None)
+        if server is not None:
+            await server.stop()
+
+    async def remove_server(self, name: str):
+        """
+        Stop a server that was removed from the configuration and forget its state.
+        """
+        self.connections.pop(name, None)
+        self.manifest.remove(name)
+        self.breakers.pop(name, None)
+        self._breaker_hashes.pop(name, None)
+        await self.stop_server(name)
+
+    def cache_stats(self) -> dict[str, int]:
+        return {
+            "live_servers": len(self.servers),
+            "cached_tool_lists": len(self._tools),
+            "cached_tools": sum(len(tools) for tools in self._tools.values()),
+            "manifest_servers": len(self.manifest.servers),
+        }
+
+    def breaker_stats(self) -> dict[str, dict]:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+    @property
+    def busy(self) -> bool:
+        return any(server.in_flight for server in self.servers.values())
+
+    async def close(self):
+        # Tools of a closed pool may still be held (e.g. by a cached agent), they must not start servers again.
+        self.connections.clear()
+        await asyncio.gather(*(self.stop_server(name) for name in list(self.servers)), return_exceptions=True)
+
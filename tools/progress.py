@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.tools import BaseTool
+
+from config import settings
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+# async (progress, total, message), the MCP progress callback signature.
+ProgressFn = Callable[[float, float | None, str | None], Awaitable[None]]
+
+
+def _arguments_key(arguments: dict) -> str:
+    return json.dumps(arguments, sort_keys=True, default=str)
+
+
+class ToolCallProgress:
+    """
+    Publishes the progress events of one running tool call.
+    """
+
+    def __init__(self, name: str, tool_call_id: str | None, publish: Callable[[dict[str, Any]], Awaitable[None]]):
+        self.name = name
+        self.tool_call_id = tool_call_id
+        self.publish = publish
+        self.started = time.monotonic()
+        self.fraction: float | None = None
+
+    async def report(self, status: str, message: str | None = None, **extra: Any):
+        try:
+            await self.publish({"type": "tool_progress", "content": {
+                "status": status,
+                "name": self.name,
+                "tool_call_id": self.tool_call_id,
+                "elapsed": round(time.monotonic() - self.started, 3),
+                "progress": self.fraction,
+                "message": message,
+                **extra,
+            }})
+        except Exception as err:
+            # Progress is best effort, it never fails the tool call.
+            logger.warning(f"Unable to publish progress of {self.name}: {err}")
+
+    async def report_progress(self, progress: float, total: float | None = None, message: str | None = None):
+        if total:
+            self.fraction = round(min(max(progress / total, 0.0), 1.0), 4)
+        await self.report("progress", message)
+
+    async def _heartbeat(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.report("heartbeat")
+
+
+class ToolProgress(AsyncCallbackHandler):
+    """
+    Progress events of the tool calls of one streamed agent run.
+
+    Tools do not know the id of the tool call they run, so the model
+    callback registers the tool calls the model asked for (before the tool
+    node starts them) and each call claims its id by tool name and arguments.
+    """
+
+    def __init__(self, publish: Callable[[dict[str, Any]], Awaitable[None]]):
+        self.publish = publish
+        self.pending: list[tuple[str, str, str]] = []
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        for generations in response.generations:
+            for generation in generations:
+                if isinstance(generation, ChatGeneration):
+                    for tool_call in getattr(generation.message, "tool_calls", []):
+                        self.pending.append((tool_call["id"], tool_call["name"], _arguments_key(tool_call["args"])))
+
+    def start(self, name: str, arguments: dict) -> ToolCallProgress:
+        key = _arguments_key(arguments)
+        match = next((call for call in self.pending if call[1] == name and call[2] == key), None)
+        match = match or next((call for call in self.pending if call[1] == name), None)
+        if match is not None:
+            self.pending.remove(match)
+        return ToolCallProgress(name, match[0] if match else None, self.publish)
+
+
+# Set by the streaming path for the duration of a run.
+tool_progress: ContextVar[ToolProgress | None] = ContextVar("tool_progress", default=None)
+# The tool call running in this context, it receives the log messages of its MCP server.
+current_tool_call: ContextVar[ToolCallProgress | None] = ContextVar("current_tool_call", default=None)
+# Where the tool running in this context reports its progress: the stream of the run,
+# or the MCP client when the tool is served by mcp_server.py.
+progress_reporter: ContextVar[ProgressFn | None] = ContextVar("progress_reporter", default=None)
+
+
+async def report_progress(progress: float, total: float | None = None, message: str | None = None):
+    """
+    Report the progress of the tool call running in this context, if anyone listens.
+    """
+    reporter = progress_reporter.get()
+    if reporter is not None:
+        try:
+            await reporter(progress, total, message)
+        except Exception as err:
+            logger.warning(f"Unable to report progress: {err}")
+
+
+async def progress_middleware(tool: BaseTool, arguments: dict, call_next):
+    """
+    Publish start, heartbeat, progress and end events of the tool call to the streamed run, if any.
+    """
+    progress = tool_progress.get()
+    if progress is None:
+        return await call_next(arguments)
+
+    call = progress.start(tool.name, arguments)
+    call_token = current_tool_call.set(call)
+    reporter_token = progress_reporter.set(call.report_progress)
+    await call.report("start")
+    heartbeat = asyncio.create_task(call._heartbeat(settings.TOOL_PROGRESS_HEARTBEAT_SECONDS))
+    status = "error"
+    try:
+        result = await call_next(arguments)
+        status = "end"
+        return result
+    finally:
+        heartbeat.cancel()
+        current_tool_call.reset(call_token)
+        progress_reporter.reset(reporter_token)
+        await call.report(status)
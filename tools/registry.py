@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+from config import settings
+from utilities.logger import get_logger
+from utilities.metrics import metrics
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    name TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    url TEXT,
+    config TEXT NOT NULL,
+    source TEXT,
+    content_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS servers_fts USING fts5(
+    name, title, description, tags,
+    content='servers', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS servers_ai AFTER INSERT ON servers BEGIN
+    INSERT INTO servers_fts (rowid, name, title, description, tags)
+    VALUES (new.rowid, new.name, new.title, new.description, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS servers_ad AFTER DELETE ON servers BEGIN
+    INSERT INTO servers_fts (servers_fts, rowid, name, title, description, tags)
+    VALUES ('delete', old.rowid, old.name, old.title, old.description, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS servers_au AFTER UPDATE ON servers BEGIN
+    INSERT INTO servers_fts (servers_fts, rowid, name, title, description, tags)
+    VALUES ('delete', old.rowid, old.name, old.title, old.description, old.tags);
+    INSERT INTO servers_fts (rowid, name, title, description, tags)
+    VALUES (new.rowid, new.name, new.title, new.description, new.tags);
+END;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _entry_hash(entry: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(entry, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _normalize(entry: dict[str, Any], source: str | None) -> dict[str, Any]:
+    """
+    Validate a dump entry: `name` and `config` (an mcp.json server entry) are required.
+    """
+    name = entry.get("name")
+    config = entry.get("config")
+    if not isinstance(name, str) or not name.strip() or not isinstance(config, dict) or not config:
+        raise ValueError(f"Registry entries need a name and a config, got {str(entry)[:200]}")
+    tags = entry.get("tags") or []
+    return {
+        "name": name.strip(),
+        "title": entry.get("title") or name.strip(),
+        "description": entry.get("description") or "",
+        "tags": " ".join(tags) if isinstance(tags, list) else str(tags),
+        "url": entry.get("url"),
+        "config": config,
+        "source": entry.get("source") or source,
+    }
+
+
+def _match_expression(query: str) -> str | None:
+    """
+    FTS5 expression matching any word of `query` as a prefix, best matches (most words, rarest words) rank first.
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    return " OR ".join(f'"{word}"*' for word in words)
+
+
+def read_dump(path: str) -> list[dict[str, Any]]:
+    """
+    Entries of a registry dump: a JSON list, a {"servers": [...]} object or JSON lines.
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data.get("servers", []) if isinstance(data, dict) else data
+
+
+class MCPRegistry:
+    """
+    Local full-text index of known MCP server configs.
+
+    Lets the agent find a server to deploy with one local query instead of
+    scraping registry web pages. Entries come from importable dumps and are
+    upserted by name, only rewriting the ones whose content changed. The
+    configured dump file is re-imported whenever it changes on disk.
+    """
+
+    def __init__(self, path: str, dump_file: str):
+        self.path = path
+        self.dump_file = dump_file
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def import_entries(self, entries: Iterable[dict[str, Any]], source: str | None = None, prune: bool = False) -> dict[str, int]:
+        """
+        Upsert `entries`. With `prune`, the dump is taken as complete and entries of the same source missing from it are removed.
+        """
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                existing = {
+                    row["name"]: row["content_hash"]
+                    for row in connection.execute("SELECT name, content_hash FROM servers")
+                }
+                seen = set()
+                for raw_entry in entries:
+                    entry = _normalize(raw_entry, source)
+                    content_hash = _entry_hash(entry)
+                    seen.add(entry["name"])
+                    if existing.get(entry["name"]) == content_hash:
+                        counts["unchanged"] += 1
+                        continue
+                    counts["updated" if entry["name"] in existing else "added"] += 1
+                    connection.execute(
+                        "INSERT INTO servers (name, title, description, tags, url, config, source, content_hash, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (name) DO UPDATE SET title = excluded.title, description = excluded.description, "
+                        "tags = excluded.tags, url = excluded.url, config = excluded.config, source = excluded.source, "
+                        "content_hash = excluded.content_hash, updated_at = excluded.updated_at",
+                        (
+                            entry["name"], entry["title"], entry["description"], entry["tags"], entry["url"],
+                            json.dumps(entry["config"]), entry["source"], content_hash, now,
+                        ),
+                    )
+                if prune:
+                    stale = [
+                        row["name"]
+                        for row in connection.execute("SELECT name FROM servers WHERE source IS ?", (source,))
+                        if row["name"] not in seen
+                    ]
+                    connection.executemany("DELETE FROM servers WHERE name = ?", [(name,) for name in stale])
+                    counts["removed"] = len(stale)
+        logger.info(f"Imported MCP registry entries from {source or 'request'}: {counts}")
+        return counts
+
+    def refresh(self, force: bool = False) -> dict[str, int] | None:
+        """
+        Re-import the dump file if it changed since the last import. Returns the import counts, None when nothing was done.
+        """
+        try:
+            stat = os.stat(self.dump_file)
+        except FileNotFoundError:
+            return None
+        version = f"{stat.st_mtime_ns}:{stat.st_size}"
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'dump_version'").fetchone()
+        if not force and row is not None and row["value"] == version:
+            return None
+
+        counts = self.import_entries(read_dump(self.dump_file), source=self.dump_file, prune=True)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dump_version', ?)", (version,))
+        return counts
+
+    def search(self, query: str, limit: int = 5) -> list[dict[str, Any]]:
+        """
+        Best matching servers for `query`, each with the config to pass to deploy-mcp and the env vars it needs.
+        """
+        expression = _match_expression(query)
+        if expression is None:
+            return []
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT s.name, s.title, s.description, s.tags, s.url, s.config FROM servers_fts "
+                "JOIN servers s ON s.rowid = servers_fts.rowid "
+                # Name and title matches weigh more than description and tag matches.
+                "WHERE servers_fts MATCH ? ORDER BY bm25(servers_fts, 10.0, 5.0, 1.0, 2.0) LIMIT ?",
+                (expression, limit),
+            ).fetchall()
+        metrics.observe("mcp_registry_search_seconds", time.perf_counter() - started)
+        metrics.increment("mcp_registry_searches_total", labels={"hit": bool(rows)})
+        results = []
+        for row in rows:
+            config = json.loads(row["config"])
+            results.append({
+                "name": row["name"],
+                "title": row["title"],
+                "description": row["description"],
+                "tags": row["tags"].split(),
+                "url": row["url"],
+                "config": config,
+                # Values the user has to provide before deploying.
+                "required_env": sorted((config.get("env") or {}).keys()),
+            })
+        return results
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            row = self._connect().execute("SELECT COUNT(*) AS servers FROM servers").fetchone()
+        return {"servers": row["servers"]}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+mcp_registry = MCPRegistry(path=settings.MCP_REGISTRY_PATH, dump_file=settings.MCP_REGISTRY_DUMP_FILE)
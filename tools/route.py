@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from tools.service import manage_mcp_config
+from tools.service import import_mcp_registry, manage_mcp_config, mcp_breakers_info, mcp_launch_cache_info, search_mcp_registry
 
 router = APIRouter(
     prefix="/tools",
@@ -8,4 +8,8 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-router.post("/mcp/", responses={403: {"description": "Operation forbidden"}})(manage_mcp_config)
\ No newline at end of file
+router.post("/mcp/", responses={403: {"description": "Operation forbidden"}})(manage_mcp_config)
+router.get("/mcp/breakers")(mcp_breakers_info)
+router.get("/mcp/launch-cache")(mcp_launch_cache_info)
+router.post("/registry/")(import_mcp_registry)
+router.get("/registry/search")(search_mcp_registry)
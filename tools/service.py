@@ -1,44 +1,104 @@
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from config import settings
-from tools.model import MCPConfig, ManageMCPConfig
+from fastapi import HTTPException
+from tools.model import ImportMCPRegistry, MCPConfig, ManageMCPConfig
+from tools.launcher import launch_cache
+from tools.pool import MCPServer, config_hash
+from tools.progress import report_progress
+from tools.registry import mcp_registry
+from tools.tenants import current_tenant, get_tenant, tenants
 from utilities.logger import get_logger
-from utilities.utils import mcp_tools_info_extractor
+from utilities.singleflight import SingleFlight
+import asyncio
 import json
+from functools import cache
 from typing import Dict, Any
 
 logger = get_logger(__name__)
 
+# A burst of requests after a config change connects and lists every server once.
+tool_loads = SingleFlight("tool_loads")
+
+@cache
+def get_read_artifact_tool():
+    from tools.artifacts import build_read_artifact_tool
+
+    return build_read_artifact_tool()
+
+@cache
+def get_management_tools():
+    from tools.management import get_management_tools
+
+    return get_management_tools()
+
 async def load_mcp_tools(config: MCPConfig, options = {}):
     try:
-        logger.info(f"Loading MCP tools with config: {config} and options: {options}")
+        # Server configs carry credentials in `env`, only the names are logged.
+        logger.info("Loading MCP tools for servers: %s with options: %s", list(config.mcpServers), options)
         if config.mcpServers and (config.allowedTools or options.get("all_tools", False)):
-            client = MultiServerMCPClient(config.mcpServers)
-            tools = await client.get_tools()
-            logger.info(f"Retrieved tools from mcp: {tools}")
+            servers = config.mcpServers
+            if not options.get("all_tools", False):
+                servers = _servers_with_allowed_tools(servers, config.allowedTools)
+            tools = await get_tenant().pool.get_tools(servers)
+            logger.debug("Retrieved %d tools from mcp: %s", len(tools), [tool.name for tool in tools])
             if not options.get("all_tools", False):
                 tools = [tool for tool in tools if tool.name in config.allowedTools]
-                logger.info(f"Filtered tools based on allowedTools: {tools}")
+                logger.debug("Filtered tools based on allowedTools: %s", [tool.name for tool in tools])
             return tools
         return []
     except Exception as err:
         logger.error(f"Error while connecting mcp tools: {err}")
         raise err
 
+def _servers_with_allowed_tools(servers: Dict[str, Any], allowed_tools: list[str]) -> Dict[str, Any]:
+    """
+    Drop the servers the manifest says expose none of the allowed tools, so they are never spawned.
+    """
+    manifest = get_tenant().manifest
+    selected = {}
+    for name, connection in servers.items():
+        tool_names = manifest.tool_names(name, connection)
+        if tool_names is None or any(tool_name in allowed_tools for tool_name in tool_names):
+            selected[name] = connection
+    return selected
+
 async def mcp_config_info(config: MCPConfig):
+    """
+    Connect each server once, outside of the pool, and record what it exposes in the tool manifest.
+    """
     try:
-        config.allowedTools = None
-        mcp_tools = await load_mcp_tools(config=config, options={"all_tools": True})
-        if mcp_tools:
-            return mcp_tools_info_extractor(mcp_tools)
-        return mcp_tools
+        tools_info = []
+        for server_name, server_config in config.mcpServers.items():
+            server = MCPServer(server_name, server_config)
+            await server.start()
+            try:
+                get_tenant().manifest.record(server_name, server_config, server.tools, server.server_info)
+            finally:
+                await server.stop()
+            tools_info.extend(
+                {"name": tool.name, "description": tool.description, "args_schema": tool.inputSchema}
+                for tool in server.tools
+            )
+        return tools_info
     except Exception as err:
         logger.error(f"Error while validating mcp config: {err}")
         raise err
     
 async def manage_mcp_config(config: ManageMCPConfig):
+    if config.tenant_id:
+        current_tenant.set(config.tenant_id)
+    # Adding servers provisions the tenant, updating or deleting them needs an existing one.
+    tenant = tenants.get() if config.mode == "create" else tenants.lookup()
+    if tenant is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {current_tenant.get()}")
+    # Read-modify-write of the config file, concurrent callers would lose each other's changes.
+    async with tenant.config_lock:
+        return await _manage_mcp_config(config)
+
+async def _manage_mcp_config(config: ManageMCPConfig):
     try:
+        tenant = get_tenant()
         # Load config file
-        mcp_config_file = settings.MCP_CONFIG_FILE
+        mcp_config_file = tenant.config_file
         with open(mcp_config_file, "r") as f:
             data = json.load(f)
 
@@ -55,15 +115,26 @@ async def manage_mcp_config(config: ManageMCPConfig):
             "removed_servers": [],
         }
 
+        # Stages reported to the caller: resolve and validate each server, save, apply.
+        total = 2 * len(config.mcpServers) + 2
+
         # Process each server
-        for server_name, server_config in config.mcpServers.items():
+        for index, (server_name, server_config) in enumerate(config.mcpServers.items()):
             
             if not server_config.get("transport"):
                 server_config["transport"] = "stdio"
             try:
                 # Fetch tools if not deleting
                 if config.mode != "delete":
-                    
+                    # Resolve `npx <package>` once now, the server is then spawned from the installed package.
+                    await report_progress(2 * index, total, f"Resolving the package of {server_name}")
+                    launch = await launch_cache.resolve(server_config)
+                    if launch is not None:
+                        server_config["launch"] = launch
+                    else:
+                        server_config.pop("launch", None)
+
+                    await report_progress(2 * index + 1, total, f"Starting {server_name} and listing its tools")
                     mcpServer = {}
                     mcpServer[server_name] = server_config
                     tools = await mcp_config_info(
@@ -72,8 +143,18 @@ async def manage_mcp_config(config: ManageMCPConfig):
                             allowedTools=[]
                         )
                     )
-                    logger.info(f"Tools loaded : {tools}")
+                    logger.info("Tools loaded for %s: %s", server_name, [tool.get("name") for tool in tools])
                     _sync_allowed_tools(data, tools, config.mode)
+                else:
+                    # The manifest knows the tools of the server without starting it.
+                    manifest_entry = tenant.manifest.servers.get(server_name) or {}
+                    # Tools another configured server also exposes stay allowed.
+                    shared = {
+                        tool_name for tool_name, servers in tenant.manifest.tool_index().items()
+                        if any(server != server_name and server in data["mcpServers"] for server in servers)
+                    }
+                    _sync_allowed_tools(data, manifest_entry.get("tools", []), config.mode, keep=shared)
+                    tenant.manifest.remove(server_name)
 
             except Exception as e:
                 logger.error(f"Error for server: {server_name} -> {e}")
@@ -90,9 +171,15 @@ async def manage_mcp_config(config: ManageMCPConfig):
             data["allowedTools"] = []
 
         # Save changes
+        await report_progress(total - 2, total, f"Saving {mcp_config_file}")
         with open(mcp_config_file, "w") as f:
             json.dump(data, f, indent=4)
 
+        # Apply the changed servers to the live pool now instead of on the next poll.
+        await report_progress(total - 1, total, "Applying the changes to the running servers")
+        await tenant.watcher.reload()
+        await report_progress(total, total, "Done")
+
         return results
 
     except Exception as e:
@@ -100,9 +187,9 @@ async def manage_mcp_config(config: ManageMCPConfig):
         raise
 
 
-def _sync_allowed_tools(data: Dict[str, Any], tools: list[dict], mode: str):
+def _sync_allowed_tools(data: Dict[str, Any], tools: list[dict], mode: str, keep: set[str] = frozenset()):
     """
-    Ensure tools are added or removed from allowedTools based on mode.
+    Ensure tools are added or removed from allowedTools based on mode. Tools in `keep` are never removed.
     """
     for tool in tools:
         if isinstance(tool, dict):
@@ -112,7 +199,7 @@ def _sync_allowed_tools(data: Dict[str, Any], tools: list[dict], mode: str):
 
             if mode != "delete" and tool_name not in data["allowedTools"]:
                 data["allowedTools"].append(tool_name)
-            elif mode == "delete" and tool_name in data["allowedTools"]:
+            elif mode == "delete" and tool_name in data["allowedTools"] and tool_name not in keep:
                 data["allowedTools"].remove(tool_name)
 
 
@@ -146,7 +233,8 @@ def _process_server(
     
 async def load_tools_from_mcp_json():
     try:
-        mcp_config_file = settings.MCP_CONFIG_FILE
+        tenant = get_tenant()
+        mcp_config_file = tenant.config_file
         data = {}
         with open(mcp_config_file, "r") as f:
             data = json.load(f)
@@ -158,15 +246,78 @@ async def load_tools_from_mcp_json():
         allowedTools = None
         if data.get("allowedTools"):
             allowedTools = data.get("allowedTools")
+
+        management_tools = []
+        management_server = settings.MCP_MANAGEMENT_SERVER_NAME
+        if settings.MCP_MANAGEMENT_IN_PROCESS and management_server in mcpServers:
+            # Served natively instead of through a `python mcp_server.py` subprocess.
+            mcpServers = {name: server for name, server in mcpServers.items() if name != management_server}
+            management_tools = [tool for tool in get_management_tools() if allowedTools and tool.name in allowedTools]
             
         mcp_config = MCPConfig(mcpServers=mcpServers, allowedTools=allowedTools)
-        mcp_tools = await load_mcp_tools(config=mcp_config)
+        mcp_tools = await tool_loads.do(
+            (tenant.id, config_hash(mcp_config.model_dump())),
+            lambda: load_mcp_tools(config=mcp_config)
+        ) + management_tools
+        if mcp_tools and settings.ARTIFACT_STORE_ENABLED:
+            # Lets the model page through outputs that were offloaded to the artifact store.
+            mcp_tools.append(get_read_artifact_tool())
         return mcp_tools
     except Exception as e:
         raise e
     
+async def mcp_breakers_info(tenant_id: str | None = None):
+    """
+    Circuit breaker state of every MCP server the tenant's pool has tried to connect.
+    """
+    tenant = tenants.lookup(tenant_id)
+    if tenant is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant_id}")
+    return tenant.pool.breaker_stats()
+
+async def import_mcp_registry(payload: ImportMCPRegistry):
+    """
+    Add or update entries of the local MCP registry searched by the search-mcp-registry tool.
+    """
+    try:
+        return await asyncio.to_thread(mcp_registry.import_entries, payload.servers, payload.source, payload.prune)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as e:
+        logger.error(f"Error while importing the MCP registry: {e}")
+        raise e
+
+async def search_mcp_registry(query: str, limit: int = 5):
+    """
+    Servers of the local MCP registry matching `query`, refreshed from the dump file first if it changed.
+    """
+    await asyncio.to_thread(mcp_registry.refresh)
+    return await asyncio.to_thread(mcp_registry.search, query, limit)
+
+async def mcp_launch_cache_info():
+    """
+    Pinned launch resolutions (resolved, cached, failed, fallbacks to npx) and the size of the package cache.
+    """
+    await asyncio.to_thread(launch_cache.scan)
+    return launch_cache.stats()
+
 def list_mcp_servers():
-    mcp_config_file = settings.MCP_CONFIG_FILE
+    mcp_config_file = get_tenant().config_file
     with open(mcp_config_file, "r") as f:
         data = json.load(f)
-    return list(data["mcpServers"].keys())
\ No newline at end of file
+    return list(data["mcpServers"].keys())
+
+def list_mcp_server_tools():
+    """
+    Tool names of each configured server, from the manifest. None for servers it does not cover yet.
+    """
+    tenant = get_tenant()
+    with open(tenant.config_file, "r") as f:
+        data = json.load(f)
+    tools = {
+        name: tenant.manifest.tool_names(name, connection)
+        for name, connection in data["mcpServers"].items()
+    }
+    if settings.MCP_MANAGEMENT_SERVER_NAME in tools:
+        tools[settings.MCP_MANAGEMENT_SERVER_NAME] = [tool.name for tool in get_management_tools()]
+    return tools
\ No newline at end of file
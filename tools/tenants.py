@@ -0,0 +1,201 @@
+import asyncio
+import json
+import re
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from langchain_core.tools import BaseTool
+
+from config import settings
+from tools.manifest import ToolManifest, manifest_path
+from tools.model import TENANT_ID_PATTERN
+from tools.pool import MCPServerPool
+from tools.watcher import MCPConfigWatcher
+from utilities.logger import get_logger
+from utilities.ratelimit import FairShareScheduler
+
+logger = get_logger(__name__)
+
+MANAGEMENT_TOOL_NAMES = ["deploy-mcp", "delete-mcp", "list-mcp"]
+
+# Tenant the current request runs for, set by the chat and tools endpoints.
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=settings.DEFAULT_TENANT_ID)
+
+# Tool execution capacity of the process, shared fairly between tenants.
+tool_scheduler = FairShareScheduler("tools", settings.TOOL_MAX_CONCURRENCY)
+
+
+def tenant_quota(tenant_id: str) -> dict[str, float]:
+    quota = {
+        "max_servers": settings.TENANT_MAX_SERVERS,
+        "max_concurrent_tool_calls": settings.TENANT_MAX_CONCURRENT_TOOL_CALLS,
+        "tool_calls_per_second": settings.TENANT_TOOL_CALLS_PER_SECOND,
+        "tool_call_burst": settings.TENANT_TOOL_CALL_BURST,
+        "weight": 1.0,
+    }
+    quota.update(settings.TENANT_QUOTA_OVERRIDES.get(tenant_id, {}))
+    return quota
+
+
+class Tenant:
+    """
+    MCP config, tool manifest, server pool and config watcher of one tenant.
+    """
+
+    def __init__(self, tenant_id: str, config_file: str):
+        self.id = tenant_id
+        self.config_file = config_file
+        self.quota = tenant_quota(tenant_id)
+        self.manifest = ToolManifest(manifest_path(config_file))
+        self.pool = MCPServerPool(self.manifest, name=tenant_id, max_servers=int(self.quota["max_servers"]))
+        self.watcher = MCPConfigWatcher(config_file, self.pool)
+        # Serializes read-modify-write of the config file.
+        self.config_lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self._watch_task: asyncio.Task | None = None
+
+    @property
+    def idle(self) -> bool:
+        return not self.config_lock.locked() and not self.pool.busy
+
+    def watch(self):
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self.watcher.run(), name=f"mcp-config-watcher:{self.id}")
+
+    async def close(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        await self.pool.close()
+
+
+class TenantRegistry:
+    """
+    Tenants of this process.
+
+    The default tenant uses MCP_CONFIG_FILE, any other tenant gets its own
+    config under TENANT_CONFIG_DIR, seeded with the management server only so
+    no server (or credential) of another tenant leaks into it. Tenants are
+    only created by `get`, the provisioning path (adding MCP servers), every
+    other path uses `lookup` so a request naming an unknown tenant cannot
+    create config files, pools and watchers. At most
+    TENANT_MAX_LOADED tenants stay loaded, the least recently used idle ones
+    are unloaded (their config stays on disk) to make room.
+    """
+
+    def __init__(self):
+        self.tenants: dict[str, Tenant] = {}
+        # Strong references to the close() tasks of unloaded tenants.
+        self._closing: set[asyncio.Task] = set()
+
+    def get(self, tenant_id: str | None = None) -> Tenant:
+        """
+        The tenant, created if it does not exist yet.
+        """
+        tenant_id = tenant_id or current_tenant.get()
+        tenant = self.tenants.get(tenant_id)
+        if tenant is not None:
+            tenant.last_used = time.monotonic()
+            return tenant
+
+        if not re.match(TENANT_ID_PATTERN, tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id}")
+        tenant = Tenant(tenant_id, self._config_file(tenant_id))
+        self.tenants[tenant_id] = tenant
+        tool_scheduler.configure(
+            tenant_id,
+            max_concurrency=int(tenant.quota["max_concurrent_tool_calls"]),
+            rate=tenant.quota["tool_calls_per_second"],
+            burst=tenant.quota["tool_call_burst"],
+            weight=tenant.quota["weight"],
+        )
+        if settings.MCP_CONFIG_WATCH:
+            tenant.watch()
+        logger.info(f"Created tenant {tenant_id} with config {tenant.config_file}")
+        self._unload_idle(keep=tenant_id)
+        return tenant
+
+    def lookup(self, tenant_id: str | None = None) -> Tenant | None:
+        """
+        The tenant if it exists (loaded, or configured on disk), None otherwise. Never creates one.
+        """
+        tenant_id = tenant_id or current_tenant.get()
+        if tenant_id in self.tenants:
+            return self.get(tenant_id)
+        if not re.match(TENANT_ID_PATTERN, tenant_id) or not self._config_path(tenant_id).exists():
+            return None
+        return self.get(tenant_id)
+
+    def _unload_idle(self, keep: str):
+        excess = len(self.tenants) - settings.TENANT_MAX_LOADED
+        candidates = sorted(
+            (tenant for tenant in self.tenants.values() if tenant.id not in (keep, settings.DEFAULT_TENANT_ID)),
+            key=lambda tenant: tenant.last_used,
+        )
+        for tenant in candidates:
+            if excess <= 0:
+                return
+            # Busy tenants stay, a scheduler share with running or queued calls is not removed.
+            if not tenant.idle or not tool_scheduler.remove(tenant.id):
+                continue
+            del self.tenants[tenant.id]
+            task = asyncio.create_task(tenant.close(), name=f"tenant-close:{tenant.id}")
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            excess -= 1
+            logger.info(f"Unloaded idle tenant {tenant.id}")
+        if excess > 0:
+            logger.warning(f"{len(self.tenants)} tenants loaded (limit {settings.TENANT_MAX_LOADED}), none of the others is idle")
+
+    def _config_path(self, tenant_id: str) -> Path:
+        if tenant_id == settings.DEFAULT_TENANT_ID:
+            return Path(settings.MCP_CONFIG_FILE)
+        return Path(settings.TENANT_CONFIG_DIR) / tenant_id / "mcp.json"
+
+    def _config_file(self, tenant_id: str) -> str:
+        path = self._config_path(tenant_id)
+        if tenant_id != settings.DEFAULT_TENANT_ID and not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(settings.MCP_CONFIG_FILE, "r") as f:
+                shared = json.load(f)
+            management_server = settings.MCP_MANAGEMENT_SERVER_NAME
+            servers = {
+                name: server for name, server in shared.get("mcpServers", {}).items()
+                if name == management_server
+            }
+            with open(path, "w") as f:
+                json.dump({"mcpServers": servers, "allowedTools": MANAGEMENT_TOOL_NAMES if servers else []}, f, indent=4)
+        return str(path)
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            tenant_id: {
+                "live_servers": len(tenant.pool.servers),
+                "quota": tenant.quota,
+            }
+            for tenant_id, tenant in self.tenants.items()
+        }
+
+    async def close(self):
+        await asyncio.gather(*(tenant.close() for tenant in self.tenants.values()), return_exceptions=True)
+
+
+tenants = TenantRegistry()
+
+
+def get_tenant() -> Tenant:
+    """
+    The tenant of the current request, which must exist.
+    """
+    tenant = tenants.lookup()
+    if tenant is None:
+        raise LookupError(f"Unknown tenant: {current_tenant.get()}")
+    return tenant
+
+
+async def tenant_quota_middleware(tool: BaseTool, arguments: dict, call_next):
+    """
+    Run the tool call within the concurrency, rate and fair share of the current tenant.
+    """
+    async with tool_scheduler.slot(current_tenant.get()):
+        return await call_next(arguments)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+
+from config import settings
+from tools.pool import MCPServerPool, config_hash
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def diff_servers(old: dict[str, dict], new: dict[str, dict]) -> dict[str, list[str]]:
+    """
+    Per-server difference between two `mcpServers` sections.
+    """
+    return {
+        "added": [name for name in new if name not in old],
+        "removed": [name for name in old if name not in new],
+        "changed": [name for name in new if name in old and config_hash(old[name]) != config_hash(new[name])],
+    }
+
+
+class MCPConfigWatcher:
+    """
+    Follows the MCP config file and applies server changes to the live pool.
+
+    Only servers whose entry was added, removed or changed are touched, so
+    requests using the other servers are not affected. The file is polled
+    (its mtime and size) rather than watched, which also covers edits made
+    by hand or by another process. The baseline is the file as it is when
+    the watcher is created, so a change written before the first poll (or
+    with MCP_CONFIG_WATCH off, when only explicit reloads run) is applied.
+    """
+
+    def __init__(self, path: str, pool: MCPServerPool):
+        self.path = path
+        self.pool = pool
+        self.servers: dict[str, dict] = {}
+        self._signature: tuple[int, int] | None = None
+        self._lock = asyncio.Lock()
+        self._baseline()
+
+    def _baseline(self):
+        signature = self._stat()
+        try:
+            self.servers = self._read_servers()
+        except (OSError, json.JSONDecodeError) as err:
+            # The first reload that reads the file applies it whole.
+            logger.warning(f"Unable to read MCP config {self.path}: {err}")
+            return
+        self._signature = signature
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_servers(self) -> dict[str, dict]:
+        with open(self.path, "r") as f:
+            return json.load(f).get("mcpServers") or {}
+
+    async def reload(self) -> dict[str, list[str]] | None:
+        """
+        Apply the config file to the pool if it changed since the last reload. Returns the applied diff.
+        """
+        async with self._lock:
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                return None
+            try:
+                servers = self._read_servers()
+            except (OSError, json.JSONDecodeError) as err:
+                # Most likely caught mid-write, the next poll retries.
+                logger.warning(f"Unable to read MCP config {self.path}: {err}")
+                return None
+            self._signature = signature
+
+            diff = diff_servers(self.servers, servers)
+            self.servers = servers
+            if any(diff.values()):
+                logger.info(f"MCP config changed: {diff}")
+                await self._apply(diff, servers)
+            return diff
+
+    async def _apply(self, diff: dict[str, list[str]], servers: dict[str, dict]):
+        await asyncio.gather(
+            *(self.pool.remove_server(name) for name in diff["removed"]),
+            *(self.pool.restart_server(name, servers[name]) for name in diff["changed"]),
+            return_exceptions=True,
+        )
+        # Added servers are started by the first request that needs them.
+
+    async def run(self):
+        await self.reload()
+        while True:
+            await asyncio.sleep(settings.MCP_CONFIG_POLL_SECONDS)
+            try:
+                await self.reload()
+            except Exception as err:
+                logger.error(f"Error while reloading MCP config: {err}")
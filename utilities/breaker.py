@@ -0,0 +1,102 @@
+import time
+
+from .logger import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the breaker opens and callers
+    are rejected without touching the dependency. Once `reset_seconds` have
+    passed a single probe is let through (half-open): success closes the
+    breaker, failure opens it again with the reset delay doubled, up to
+    `max_reset_seconds`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, max_reset_seconds: float):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.base_reset_seconds = reset_seconds
+        self.max_reset_seconds = max(max_reset_seconds, reset_seconds)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.last_error: str | None = None
+        self._probing = False
+
+    @property
+    def retry_in(self) -> float:
+        if self.state != OPEN or self.opened_at is None:
+            return 0.0
+        return max(self.opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go through now. In half-open state only one probe is admitted at a time.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.retry_in > 0:
+                return False
+            self._set_state(HALF_OPEN)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        self.last_error = None
+        self.reset_seconds = self.base_reset_seconds
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self, error: BaseException | str | None = None):
+        self._probing = False
+        self.failures += 1
+        self.last_error = str(error) if error is not None else None
+        if self.state == HALF_OPEN:
+            # The probe failed, back off further before the next one.
+            self.reset_seconds = min(self.reset_seconds * 2, self.max_reset_seconds)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def abandon_probe(self):
+        """
+        Give back a half-open probe that ended without an outcome (e.g. it was cancelled).
+        """
+        self._probing = False
+
+    def reset(self):
+        self.record_success()
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+        logger.warning(f"Circuit breaker {self.name} opened for {self.reset_seconds:.0f}s: {self.last_error}")
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.set_gauge("circuit_breaker_open", 0 if state == CLOSED else 1, {"breaker": self.name})
+        metrics.increment("circuit_breaker_transitions_total", labels={"breaker": self.name, "state": state})
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in": round(self.retry_in, 3),
+            "reset_seconds": self.reset_seconds,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,66 @@
+import asyncio
+from contextvars import ContextVar
+from typing import AsyncIterator, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+
+# Absolute deadline of the current request, in event loop time. None means no deadline.
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+def resolve_timeout(*timeouts: float | None) -> float | None:
+    """
+    Effective timeout of a request: the smallest one given, else REQUEST_TIMEOUT_SECONDS.
+    """
+    given = [timeout for timeout in timeouts if timeout]
+    if given:
+        return min(given)
+    return settings.REQUEST_TIMEOUT_SECONDS or None
+
+
+def set_deadline(timeout: float | None) -> float | None:
+    """
+    Start the deadline of the current request, `timeout` seconds from now.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout if timeout else None
+    request_deadline.set(deadline)
+    return deadline
+
+
+def remaining() -> float | None:
+    """
+    Seconds left before the current request's deadline, None if it has none.
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - asyncio.get_running_loop().time(), 0.0)
+
+
+def within_deadline():
+    """
+    Async context manager that raises TimeoutError once the request deadline passes.
+    """
+    return asyncio.timeout_at(request_deadline.get())
+
+
+async def iterate_within_deadline(iterator: AsyncIterator[T]) -> AsyncIterator[T]:
+    """
+    Re-yield `iterator`, bounding each step by the request deadline.
+
+    A timeout scope cannot span `yield`, so async generators are bounded step by step.
+    """
+    iterator = aiter(iterator)
+    try:
+        while True:
+            async with within_deadline():
+                try:
+                    item = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
@@ -0,0 +1,14 @@
+from typing import Any, Sequence
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+
+class FakeToolChatModel(FakeListChatModel):
+    """
+    Canned answer model for the "fake" model name, accepts (and ignores) bound tools.
+    """
+
+    responses: list[str] = ["This is a test response from the fake model."]
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self
@@ -1,19 +1,124 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config import settings
 
 LOG_FILE = "/var/log/app_log/app.log"
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(filename)s - %(funcName)s - %(lineno)d - %(message)s"
+TRUNCATION_MARKER = "...[truncated {} chars]"
+
+# 300 MB in bytes
+MAX_LOG_SIZE = 300 * 1024 * 1024
+MAX_DAYS = 7
+
+
+def truncate(value, max_chars: int | None = None) -> str:
+    """
+    Render `value` as text capped at `max_chars`, with a marker saying how much was cut.
+    """
+    max_chars = max_chars or settings.LOG_FIELD_MAX_CHARS
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + TRUNCATION_MARKER.format(len(text) - max_chars)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line. Extra attributes passed with `extra=` are kept as fields.
+    """
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "func": record.funcName,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (int, float, bool, type(None))) else truncate(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records below WARNING for the configured loggers.
+
+    Rates are keyed by logger name (prefix match), e.g. {"tools.service": 0.1}.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so the most specific rate wins.
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return random.random() < rate
+        return True
+
+
+class TruncatingQueueHandler(QueueHandler):
+    """
+    Hands records to a background listener thread instead of writing them inline.
+
+    Arguments are capped before the message is rendered, so large payloads cost
+    at most LOG_FIELD_MAX_CHARS, and a full queue drops records rather than
+    blocking the event loop.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                arg if isinstance(arg, (int, float)) else truncate(arg) for arg in record.args
+            )
+        elif isinstance(record.args, dict):
+            record.args = {
+                key: arg if isinstance(arg, (int, float)) else truncate(arg) for key, arg in record.args.items()
+            }
+        record.msg = truncate(record.getMessage(), settings.LOG_MESSAGE_MAX_CHARS)
+        record.message = record.msg
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            TruncatingQueueHandler.dropped += 1
+
+
+formatter = JSONFormatter() if settings.LOG_JSON else logging.Formatter(LOG_FORMAT)
 
 handlers = [
     # logging.FileHandler(LOG_FILE),  # Log to file
     logging.StreamHandler()  # Log to console
 ]
 
-# 300 MB in bytes
-MAX_LOG_SIZE = 300 * 1024 * 1024
-MAX_DAYS = 7
-
 if not settings.DEVELOPMENT:
     log_rotate_handler = RotatingFileHandler(
         filename=LOG_FILE,
@@ -22,17 +127,23 @@ if not settings.DEVELOPMENT:
         # interval=1,  # Rotate every day
         backupCount=MAX_DAYS  # Keep logs for 1 day
     )
-    formatter = logging.Formatter(LOG_FORMAT)
-    log_rotate_handler.setFormatter(formatter)
-
     handlers.append(log_rotate_handler)
 
-# Configure logging
+for handler in handlers:
+    handler.setFormatter(formatter)
+
+log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+queue_handler = TruncatingQueueHandler(log_queue)
+queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+# Configure logging, the listener thread does the actual I/O
 logging.basicConfig(
-    level=logging.INFO,
-    format=LOG_FORMAT,
-    handlers=handlers
+    level=settings.LOG_LEVEL,
+    handlers=[queue_handler]
 )
+log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 def get_logger(name):
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -0,0 +1,90 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any
+
+# Number of recent observations kept per histogram to compute percentiles.
+HISTOGRAM_WINDOW = 1024
+
+
+def _label_key(labels: dict[str, Any] | None) -> tuple:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window: deque[float] = deque(maxlen=HISTOGRAM_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.window.append(value)
+
+    def summary(self) -> dict[str, float]:
+        recent = list(self.window)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": round(_percentile(recent, 50), 6),
+            "p95": round(_percentile(recent, 95), 6),
+            "p99": round(_percentile(recent, 99), 6),
+        }
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry (counters, gauges and histograms).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = defaultdict(dict)
+        self._gauges: dict[str, dict[tuple, float]] = defaultdict(dict)
+        self._histograms: dict[str, dict[tuple, _Histogram]] = defaultdict(dict)
+
+    def increment(self, name: str, value: float = 1, labels: dict[str, Any] | None = None):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: dict[str, Any] | None = None):
+        with self._lock:
+            self._gauges[name][_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: dict[str, Any] | None = None):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            if key not in series:
+                series[key] = _Histogram()
+            series[key].observe(value)
+
+    def snapshot(self) -> dict[str, Any]:
+        def _series(values: dict[tuple, Any], render) -> list[dict[str, Any]]:
+            return [{"labels": dict(key), "value": render(value)} for key, value in values.items()]
+
+        with self._lock:
+            return {
+                "counters": {name: _series(values, lambda v: v) for name, values in self._counters.items()},
+                "gauges": {name: _series(values, lambda v: v) for name, values in self._gauges.items()},
+                "histograms": {name: _series(values, lambda v: v.summary()) for name, values in self._histograms.items()},
+            }
+
+
+metrics = Metrics()
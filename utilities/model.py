@@ -1,25 +1,167 @@
+import importlib
+import types
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from functools import cache
-from typing import Any
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from enum import StrEnum
+from typing import TYPE_CHECKING, Any, Callable, ClassVar
 
 from agents.model import LLMConfig
 from config import settings
+from .deadline import iterate_within_deadline, within_deadline
+from .metrics import metrics
+from .ratelimit import PriorityGovernor
 from .utils import remove_empty_values_from_object
 from config.llm import (
+    AWSModelName,
+    AnthropicModelName,
+    AzureOpenAIModelName,
+    DeepseekModelName,
+    FakeModelName,
     GoogleModelName,
+    GroqModelName,
+    OllamaModelName,
+    OpenAICompatibleModelName,
     OpenAIModelName,
+    Provider,
     _MODEL_TABLE
 )
 
 from .logger import get_logger
 logger = get_logger(__name__)
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
 ModelT: Any = (
-    ChatOpenAI | ChatGoogleGenerativeAI
+    "BaseChatModel"
 )
 
+# Priority of the LLM calls made by the current request ("interactive" or "batch").
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+
+_governors: dict[str, PriorityGovernor] = {}
+
+def get_governor(provider: str, model_name: str) -> PriorityGovernor:
+    """
+    Return the shared rate limit / concurrency governor for a provider and model.
+    """
+    key = f"{provider.lower()}:{model_name}"
+    governor = _governors.get(key)
+    if governor is None:
+        limits = {
+            "rps": settings.LLM_RATE_LIMIT_RPS,
+            "burst": settings.LLM_RATE_LIMIT_BURST,
+            "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+        }
+        limits.update(settings.LLM_RATE_LIMIT_OVERRIDES.get(provider.lower(), {}))
+        limits.update(settings.LLM_RATE_LIMIT_OVERRIDES.get(key, {}))
+        governor = PriorityGovernor(
+            name=key,
+            rate=limits["rps"],
+            burst=limits["burst"],
+            max_concurrency=int(limits["max_concurrency"])
+        )
+        _governors[key] = governor
+    return governor
+
+def governor_stats() -> dict[str, dict]:
+    return {key: governor.stats() for key, governor in _governors.items()}
+
+def _retry_after_seconds(err: BaseException | None) -> float | None:
+    """
+    Return the provider back-off hint if `err` is a rate limit error, else None.
+    """
+    if err is None:
+        return None
+
+    response = getattr(err, "response", None)
+    status = getattr(err, "status_code", None) or getattr(response, "status_code", None) or getattr(err, "code", None)
+    if status != 429 and type(err).__name__ not in ("RateLimitError", "ResourceExhausted"):
+        return _retry_after_seconds(err.__cause__)
+
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        if getattr(err, "retry_after", None):
+            return float(err.retry_after)
+    except Exception as parse_err:
+        logger.warning(f"Unable to parse Retry-After hint: {parse_err}")
+    return settings.LLM_RETRY_AFTER_DEFAULT
+
+class GovernedChatModel:
+    """
+    Mixin routing async generation through the provider governor.
+
+    Rate limited calls pause the governor for the provider's Retry-After and are
+    re-queued, so a burst turns into queueing delay rather than a retry storm.
+    """
+
+    provider: ClassVar[str] = ""
+
+    def _governor(self) -> PriorityGovernor:
+        model_name = getattr(self, "model_name", None) or getattr(self, "model", "")
+        return get_governor(self.provider, str(model_name).removeprefix("models/"))
+
+    def _on_rate_limited(self, governor: PriorityGovernor, err: Exception, attempt: int) -> bool:
+        retry_after = _retry_after_seconds(err)
+        if retry_after is None or attempt >= settings.LLM_RATE_LIMIT_RETRIES:
+            return False
+        metrics.increment("llm_rate_limited_total", labels={"governor": governor.name})
+        governor.pause(retry_after)
+        return True
+
+    async def _agenerate(self, *args, **kwargs):
+        governor = self._governor()
+        attempt = 0
+        # Queueing, retries and the call itself all count against the request deadline.
+        async with within_deadline():
+            while True:
+                async with governor.slot(llm_priority.get()):
+                    try:
+                        return await super()._agenerate(*args, **kwargs)
+                    except Exception as err:
+                        if not self._on_rate_limited(governor, err, attempt):
+                            raise
+                attempt += 1
+
+    async def _astream(self, *args, **kwargs):
+        governor = self._governor()
+        attempt = 0
+        while True:
+            emitted = False
+            async with within_deadline():
+                await governor.acquire(llm_priority.get())
+            try:
+                async for chunk in iterate_within_deadline(super()._astream(*args, **kwargs)):
+                    emitted = True
+                    yield chunk
+                return
+            except Exception as err:
+                # Chunks already reached the caller, a retry would duplicate them.
+                if emitted or not self._on_rate_limited(governor, err, attempt):
+                    raise
+            finally:
+                governor.release()
+            attempt += 1
+
+@cache
+def _governed_class(model_class: type, provider: str) -> type:
+    def exec_body(namespace: dict):
+        namespace["__module__"] = __name__
+        namespace["__annotations__"] = {"provider": ClassVar[str]}
+        namespace["provider"] = provider
+
+    return types.new_class(f"Governed{model_class.__name__}", (GovernedChatModel, model_class), exec_body=exec_body)
+
 def get_llm_model_name(config: LLMConfig):
     model_name = config.model
     api_model_name = _MODEL_TABLE.get(model_name)
@@ -27,16 +169,124 @@ def get_llm_model_name(config: LLMConfig):
         raise ValueError(f"Unsupported model: {model_name}")
     return api_model_name
 
-def get_llm_provider(model_name: str) -> str:
+# Request parameters only the OpenAI style APIs understand.
+_OPENAI_ONLY_OPTIONS = ("stream", "stream_options", "n", "frequency_penalty", "presence_penalty")
+
+def _without(options: dict, *keys: str) -> dict:
+    return {key: value for key, value in options.items() if key not in keys}
+
+def _with_api_key(options: dict, api_key: str) -> dict:
+    return {**options, "api_key": api_key} if api_key else options
+
+def _azure_options(options: dict) -> dict:
+    return {
+        **_with_api_key(options, settings.AZURE_OPENAI_API_KEY),
+        "azure_endpoint": settings.AZURE_OPENAI_ENDPOINT,
+        "azure_deployment": settings.AZURE_OPENAI_DEPLOYMENT_MAP.get(options["model"], options["model"]),
+        "api_version": settings.AZURE_OPENAI_API_VERSION,
+    }
+
+def _bedrock_options(options: dict) -> dict:
+    options = _without(options, *_OPENAI_ONLY_OPTIONS)
+    return {**options, "region_name": settings.AWS_BEDROCK_REGION} if settings.AWS_BEDROCK_REGION else options
+
+def _compatible_options(options: dict) -> dict:
+    if not settings.COMPATIBLE_BASE_URL or not settings.COMPATIBLE_MODEL:
+        raise ValueError("COMPATIBLE_BASE_URL and COMPATIBLE_MODEL must be set to use the openai-compatible model")
+    return {
+        **options,
+        "model": settings.COMPATIBLE_MODEL,
+        "base_url": settings.COMPATIBLE_BASE_URL,
+        # The OpenAI client requires a key, most self-hosted servers ignore it.
+        "api_key": settings.COMPATIBLE_API_KEY or "not-needed",
+    }
+
+def _ollama_options(options: dict) -> dict:
+    # Ollama serves the OpenAI chat completions API (tool calls and streamed usage included) under /v1.
+    return {
+        **options,
+        "model": settings.OLLAMA_MODEL,
+        "base_url": f"{settings.OLLAMA_BASE_URL.rstrip('/')}/v1",
+        "api_key": "ollama",
+    }
+
+class ProviderSpec:
+    """
+    How to build the chat model of a provider.
+
+    `model_class` is a "module:Class" path, imported on first use so unused
+    provider SDKs stay off the import path. `package` is the pip package
+    providing it and `options` maps the request options to the constructor
+    arguments of the class.
+    """
+
+    def __init__(self, models: type[StrEnum], model_class: str, package: str, options: Callable[[dict], dict]):
+        self.models = models
+        self.model_class = model_class
+        self.package = package
+        self.options = options
+
+PROVIDERS: dict[Provider, ProviderSpec] = {
+    Provider.OPENAI: ProviderSpec(
+        OpenAIModelName, "langchain_openai:ChatOpenAI", "langchain-openai",
+        lambda options: _with_api_key(options, settings.OPENAI_API_KEY),
+    ),
+    Provider.AZURE_OPENAI: ProviderSpec(
+        AzureOpenAIModelName, "langchain_openai:AzureChatOpenAI", "langchain-openai", _azure_options,
+    ),
+    Provider.DEEPSEEK: ProviderSpec(
+        DeepseekModelName, "langchain_openai:ChatOpenAI", "langchain-openai",
+        lambda options: {**_with_api_key(options, settings.DEEPSEEK_API_KEY), "base_url": settings.DEEPSEEK_BASE_URL},
+    ),
+    Provider.ANTHROPIC: ProviderSpec(
+        AnthropicModelName, "langchain_anthropic:ChatAnthropic", "langchain-anthropic",
+        lambda options: _with_api_key(_without(options, *_OPENAI_ONLY_OPTIONS), settings.ANTHROPIC_API_KEY),
+    ),
+    Provider.GOOGLE: ProviderSpec(
+        GoogleModelName, "langchain_google_genai:ChatGoogleGenerativeAI", "langchain-google-genai",
+        lambda options: {**options, "api_key": settings.GOOGLE_API_KEY},
+    ),
+    Provider.GROQ: ProviderSpec(
+        GroqModelName, "langchain_groq:ChatGroq", "langchain-groq",
+        lambda options: _with_api_key(_without(options, "stream", "stream_options"), settings.GROQ_API_KEY),
+    ),
+    Provider.AWS: ProviderSpec(
+        AWSModelName, "langchain_aws:ChatBedrock", "langchain-aws", _bedrock_options,
+    ),
+    Provider.OLLAMA: ProviderSpec(
+        OllamaModelName, "langchain_openai:ChatOpenAI", "langchain-openai", _ollama_options,
+    ),
+    Provider.OPENAI_COMPATIBLE: ProviderSpec(
+        OpenAICompatibleModelName, "langchain_openai:ChatOpenAI", "langchain-openai", _compatible_options,
+    ),
+    Provider.FAKE: ProviderSpec(
+        FakeModelName, "utilities.fake_model:FakeToolChatModel", "langchain-core",
+        lambda options: {},
+    ),
+}
+
+def get_llm_provider(model_name: str) -> Provider:
     """
     Identify the provider based on the model name.
     """
-    if model_name in OpenAIModelName:
-        return "OpenAI"
-    elif model_name in GoogleModelName:
-        return "Google"
-    else:
-        raise ValueError(f"Unsupported model: {model_name}")
+    for provider, spec in PROVIDERS.items():
+        if model_name in spec.models:
+            return provider
+    raise ValueError(f"Unsupported model: {model_name}")
+
+def _load_model_class(provider: Provider) -> type:
+    """
+    Import the provider SDK on first use, so unused providers stay off the import path.
+    """
+    spec = PROVIDERS.get(provider)
+    if spec is None:
+        raise ValueError(f"Unsupported provider: {provider}")
+    module_name, class_name = spec.model_class.split(":")
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as err:
+        raise ImportError(f"The {provider} provider needs the {spec.package} package: pip install {spec.package}") from err
+    return getattr(module, class_name)
 
 @cache
 def get_model(config: LLMConfig, /) -> ModelT:
@@ -44,6 +294,8 @@ def get_model(config: LLMConfig, /) -> ModelT:
     model_name = get_llm_model_name(config)
     config_dict = config.model_dump()
     config_dict["model"] = model_name
+    # The governor owns retries, SDK level retries would bypass the queue.
+    config_dict["max_retries"] = settings.LLM_SDK_MAX_RETRIES
 
     if config.streaming:
         config_dict["stream"] = True
@@ -52,12 +304,10 @@ def get_model(config: LLMConfig, /) -> ModelT:
 
     config_dict = remove_empty_values_from_object(config_dict)
 
-    logger.info(f">>> ### >> Using model: {model_name} with config: {config_dict}")
+    logger.info(">>> ### >> Using model: %s with config: %s", model_name, config_dict)
 
-    model_provider = get_llm_provider(model_name)
+    model_provider = get_llm_provider(config.model)
 
-    if model_provider == "OpenAI":
-        return ChatOpenAI(**config_dict)
+    model_class = _governed_class(_load_model_class(model_provider), model_provider)
 
-    elif model_provider == "Google":
-        return ChatGoogleGenerativeAI(**config_dict, api_key=settings.GOOGLE_API_KEY)
\ No newline at end of file
+    return model_class(**PROVIDERS[model_provider].options(config_dict))
@@ -0,0 +1,307 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from .logger import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+# Lower value is served first.
+PRIORITIES = {
+    "interactive": 0,
+    "batch": 10,
+}
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float | None = None):
+        now = now if now is not None else time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        else:
+            # A non-positive rate disables rate limiting.
+            self.tokens = self.capacity
+        self._updated = now
+
+    def try_take(self, now: float | None = None) -> bool:
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PriorityGovernor:
+    """
+    Token bucket plus max-concurrency gate with a priority wait queue.
+
+    Callers `acquire()` a slot (or use the `slot()` context manager) and are
+    admitted in priority order, FIFO within a priority, once both a token and a
+    concurrency slot are available. `pause()` holds back every waiter, which
+    is how provider `Retry-After` hints are honoured.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int):
+        self.name = name
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.active = 0
+        self.paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_deadline = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    async def acquire(self, priority: str = "interactive") -> float:
+        """
+        Wait for a slot and return the time spent queueing, in seconds.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority, PRIORITIES["batch"]), next(self._sequence), waiter))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just before the cancellation landed.
+                self.release()
+            raise
+
+        waited = time.monotonic() - started
+        metrics.observe("queue_wait_seconds", waited, {"governor": self.name, "priority": priority})
+        return waited
+
+    def release(self):
+        self.active = max(self.active - 1, 0)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive") -> AsyncIterator[float]:
+        waited = await self.acquire(priority)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def pause(self, seconds: float):
+        """
+        Stop admitting waiters for `seconds` (e.g. after a 429 with Retry-After).
+        """
+        until = time.monotonic() + max(seconds, 0)
+        if until > self.paused_until:
+            self.paused_until = until
+            logger.warning(f"Governor {self.name} paused for {seconds:.2f}s")
+            metrics.increment("governor_pauses_total", labels={"governor": self.name})
+
+    def stats(self) -> dict:
+        self.bucket.refill()
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "tokens": round(self.bucket.tokens, 3),
+            "rate": self.bucket.rate,
+            "paused_for": round(max(self.paused_until - time.monotonic(), 0.0), 3),
+        }
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._waiters:
+            _, _, waiter = self._waiters[0]
+            if waiter.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.active >= self.max_concurrency:
+                return
+            if now < self.paused_until:
+                self._schedule(self.paused_until - now)
+                return
+            if not self.bucket.try_take(now):
+                self._schedule(self.bucket.seconds_until_available())
+                return
+            heapq.heappop(self._waiters)
+            self.active += 1
+            waiter.set_result(None)
+
+    def _schedule(self, delay: float):
+        deadline = time.monotonic() + delay
+        if self._timer is not None and not self._timer.cancelled() and self._timer_deadline <= deadline:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+
+class _Share:
+    def __init__(self, max_concurrency: int, rate: float, burst: float, weight: float):
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.weight = max(weight, 0.01)
+        self.active = 0
+        self.last_served = 0.0
+        self.waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self.waiters if not waiter.done())
+
+
+class FairShareScheduler:
+    """
+    Divides `capacity` concurrent slots among keys (e.g. tenants).
+
+    Every key has its own concurrency limit and token bucket. When a slot
+    frees up it goes to the waiting key with the fewest running calls
+    relative to its weight (least recently served on ties), so a key that
+    floods calls only queues behind itself.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(capacity, 1)
+        self.active = 0
+        self._shares: dict[str, _Share] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_deadline = 0.0
+
+    def configure(self, key: str, max_concurrency: int, rate: float, burst: float, weight: float = 1.0):
+        share = self._shares.get(key)
+        updated = _Share(max_concurrency, rate, burst, weight)
+        if share is not None:
+            updated.active, updated.waiters = share.active, share.waiters
+        self._shares[key] = updated
+
+    def remove(self, key: str) -> bool:
+        """
+        Forget the share of `key` if it has no running or queued calls.
+        """
+        share = self._shares.get(key)
+        if share is None or share.active or share.queued:
+            return False
+        del self._shares[key]
+        return True
+
+    async def acquire(self, key: str) -> float:
+        """
+        Wait for a slot for `key` and return the time spent queueing, in seconds.
+        """
+        if key not in self._shares:
+            self.configure(key, max_concurrency=self.capacity, rate=0, burst=1)
+        share = self._shares[key]
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        share.waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(key)
+            raise
+
+        waited = time.monotonic() - started
+        metrics.observe("scheduler_wait_seconds", waited, {"scheduler": self.name, "key": key})
+        return waited
+
+    def release(self, key: str):
+        share = self._shares[key]
+        share.active = max(share.active - 1, 0)
+        self.active = max(self.active - 1, 0)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[float]:
+        waited = await self.acquire(key)
+        try:
+            yield waited
+        finally:
+            self.release(key)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "keys": {
+                key: {
+                    "active": share.active,
+                    "queued": share.queued,
+                    "max_concurrency": share.max_concurrency,
+                    "tokens": round(share.bucket.tokens, 3),
+                    "rate": share.bucket.rate,
+                    "weight": share.weight,
+                }
+                for key, share in self._shares.items()
+            },
+        }
+
+    def _dispatch(self):
+        now = time.monotonic()
+        retry_in: float | None = None
+        while self.active < self.capacity:
+            chosen: _Share | None = None
+            for share in self._shares.values():
+                while share.waiters and share.waiters[0].done():
+                    share.waiters.popleft()
+                if not share.waiters or share.active >= share.max_concurrency:
+                    continue
+                share.bucket.refill(now)
+                if share.bucket.tokens < 1:
+                    wait = share.bucket.seconds_until_available()
+                    retry_in = wait if retry_in is None else min(retry_in, wait)
+                    continue
+                if chosen is None or (share.active / share.weight, share.last_served) < (chosen.active / chosen.weight, chosen.last_served):
+                    chosen = share
+            if chosen is None:
+                break
+            chosen.bucket.tokens -= 1
+            chosen.active += 1
+            chosen.last_served = now
+            self.active += 1
+            chosen.waiters.popleft().set_result(None)
+
+        if retry_in is not None:
+            self._schedule(retry_in)
+
+    def _schedule(self, delay: float):
+        deadline = time.monotonic() + delay
+        if self._timer is not None and not self._timer.cancelled() and self._timer_deadline <= deadline:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from .logger import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight awaitable.
+
+    The first caller of a key starts the work, callers arriving while it runs
+    wait for the same result (or exception) instead of repeating it. The work
+    runs in its own task with the context of the first caller, so a caller
+    giving up only stops waiting; the work is cancelled once every caller
+    has given up. Nothing is cached: the next call after completion starts
+    new work.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            metrics.increment("singleflight_coalesced_total", labels={"group": self.name})
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                # Later callers start over rather than joining the cancelled work.
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "waiters": sum(flight.waiters for flight in self._flights.values()),
+        }
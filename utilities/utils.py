@@ -122,26 +122,6 @@ def remove_tool_calls(content: str | list[str | dict]) -> str | list[str | dict]
         if isinstance(content_item, str) or content_item["type"] != "tool_use"
     ]
     
-def mcp_tools_info_extractor(mcp_tools: list = []):
-    """
-    Extracts MCP tool information from a list of MCP tools.
-    """
-    try:
-        if not mcp_tools:
-            return []
-
-        tools_info = []
-        for tool in mcp_tools:
-            tools_info.append({
-                "name": tool.name,
-                "description": tool.description,
-                "args_schema": tool.args_schema
-            })
-        return tools_info
-    except Exception as err:
-        logger.error(f"Error while extracting MCP tools info: {err}")
-        return []
-    
 def _create_ai_message(parts: dict) -> AIMessage:
     sig = inspect.signature(AIMessage)
     valid_keys = set(sig.parameters)
@@ -154,7 +134,7 @@ def sse_response_example() -> dict[int, Any]:
             "description": "Server Sent Event Response",
             "content": {
                 "text/event-stream": {
-                    "example": "data: {'type': 'token', 'content': 'Hello'}\n\ndata: {'type': 'token', 'content': ' World'}\n\ndata: [DONE]\n\n",
+                    "example": "id: 0\ndata: {'type': 'run', 'content': {'run_id': '...', 'thread_id': '...'}}\n\nid: 1\ndata: {'type': 'token', 'content': 'Hello'}\n\nid: 2\ndata: {'type': 'token', 'content': ' World'}\n\nid: 3\ndata: [DONE]\n\n",
                     "schema": {"type": "string"},
                 }
             },
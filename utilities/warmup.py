@@ -0,0 +1,92 @@
+import time
+from typing import Any, Awaitable, Callable, Literal
+
+from agents.model import BuildAgent, LLMConfig
+from config import settings
+from .logger import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+
+class WarmupState:
+    """
+    Progress of the startup warm-up, reported by the readiness endpoint.
+    """
+
+    def __init__(self):
+        self.status: Literal["pending", "running", "ready"] = "pending"
+        self.components: dict[str, dict[str, Any]] = {}
+        self.duration: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "status": self.status,
+            "duration_s": self.duration,
+            "components": self.components,
+        }
+
+
+warmup_state = WarmupState()
+
+
+async def _warm_component(name: str, step: Callable[[], Awaitable[Any]]) -> Any:
+    started = time.perf_counter()
+    try:
+        result = await step()
+        warmup_state.components[name] = {"status": "ok", "duration_s": round(time.perf_counter() - started, 3)}
+        return result
+    except Exception as err:
+        # A component that cannot warm up is reported, requests will retry it lazily.
+        logger.error(f"Warm-up of {name} failed: {err}")
+        warmup_state.components[name] = {
+            "status": "failed",
+            "duration_s": round(time.perf_counter() - started, 3),
+            "error": str(err),
+        }
+        return None
+    finally:
+        metrics.observe("warmup_seconds", time.perf_counter() - started, {"component": name})
+
+
+async def warmup():
+    """
+    Pre-warm the configured MCP servers, the default model and the default agent.
+    """
+    from agents.service import build_agent
+    from tools.tenants import get_tenant
+    from tools.service import load_tools_from_mcp_json
+    from utilities.model import get_model
+
+    warmup_state.status = "running"
+    started = time.perf_counter()
+    logger.info("Warming up MCP servers, default model and default agent")
+
+    llm_config = LLMConfig(model=settings.DEFAULT_MODEL, temperature=settings.DEFAULT_TEMPERATURE)
+
+    async def warm_model():
+        return get_model(llm_config)
+
+    async def warm_mcp_servers():
+        tools = await load_tools_from_mcp_json()
+        # Tools may come from the manifest alone, start the servers behind them too.
+        await get_tenant().pool.connect_all()
+        return tools
+
+    tools = await _warm_component("mcp_servers", warm_mcp_servers)
+    model = await _warm_component("model", warm_model)
+    if model is not None:
+        # Same key as a default chat request, so the first chat reuses the compiled graph.
+        await _warm_component("agent", lambda: build_agent(BuildAgent(
+            name=settings.DEFAULT_AGENT_NAME,
+            tools=tools or [],
+            llm_config=llm_config
+        )))
+
+    warmup_state.duration = round(time.perf_counter() - started, 3)
+    warmup_state.status = "ready"
+    logger.info(f"Warm-up finished in {warmup_state.duration}s: {warmup_state.components}")